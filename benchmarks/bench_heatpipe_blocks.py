@@ -0,0 +1,125 @@
+"""
+Benchmark of the construction of the HeatPipeline blocks.
+
+Compares the block construction of modules.oemof_heatpipe with the former
+rule based implementation (one rule call per pipe and timestep).
+
+Usage:
+    python -m benchmarks.bench_heatpipe_blocks --pipes 1000 --timesteps 168
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__license__ = "GPLv3"
+
+import argparse
+import time
+import pandas as pd
+import oemof.solph as solph
+from pyomo.core.base.block import SimpleBlock
+from pyomo.environ import Set, NonNegativeReals, Var, Constraint
+
+from modules import oemof_heatpipe as oh
+
+
+class LegacyHeatPipelineInvestBlock(SimpleBlock):
+    """Former implementation of HeatPipelineInvestBlock (reference)."""
+
+    CONSTRAINT_GROUP = True
+
+    def _create(self, group=None):
+        if group is None:
+            return None
+
+        m = self.parent_block()
+
+        self.INVESTHEATPIPES = Set(initialize=[n for n in group])
+
+        self.heat_loss = Var(self.INVESTHEATPIPES, m.TIMESTEPS,
+                             within=NonNegativeReals)
+
+        def _heat_loss_rule(block, n, t):
+            expr = 0
+            expr += - block.heat_loss[n, t]
+            expr += n.heat_loss_factor[t] * n.length * m.InvestmentFlow.invest[
+                n, list(n.outputs.keys())[0]]
+            return expr == 0
+        self.heat_loss_equation = Constraint(self.INVESTHEATPIPES, m.TIMESTEPS,
+                                             rule=_heat_loss_rule)
+
+        def _relation_rule(block, n, t):
+            i = list(n.inputs.keys())[0]
+            o = list(n.outputs.keys())[0]
+
+            expr = 0
+            expr += - m.flow[n, o, t]
+            expr += m.flow[i, n, t] * n.conversion_factors[
+                o][t] / n.conversion_factors[i][t]
+            expr += - block.heat_loss[n, t]
+            return expr == 0
+
+        self.relation = Constraint(self.INVESTHEATPIPES, m.TIMESTEPS,
+                                   rule=_relation_rule)
+
+
+class LegacyHeatPipeline(oh.HeatPipeline):
+
+    def constraint_group(self):
+        return LegacyHeatPipelineInvestBlock
+
+
+def create_energy_system(n_pipes, n_ts, pipe_class):
+    """
+    Star shaped network: one source bus feeding n_pipes demand buses.
+    """
+    esys = solph.EnergySystem(
+        timeindex=pd.date_range('1/1/2018', periods=n_ts, freq='H'))
+
+    b_gen = solph.Bus(label=oh.Label('generation', 'heat', 'bus', 'G0'))
+    nodes = [b_gen,
+             solph.Source(label=oh.Label('generation', 'heat', 'source', 'G0'),
+                          outputs={b_gen: solph.Flow(variable_costs=1)})]
+
+    for k in range(n_pipes):
+        b_house = solph.Bus(label=oh.Label('house', 'heat', 'bus', k))
+        nodes.append(b_house)
+        nodes.append(solph.Sink(
+            label=oh.Label('house', 'heat', 'demand', k),
+            inputs={b_house: solph.Flow(nominal_value=1, fixed=True,
+                                        actual_value=[1] * n_ts)}))
+        nodes.append(pipe_class(
+            label=oh.Label('infrastructure', 'heat', 'heatpipe', k),
+            inputs={b_gen: solph.Flow()},
+            outputs={b_house: solph.Flow(
+                investment=solph.Investment(ep_costs=1, maximum=100))},
+            heat_loss_factor=0.001, length=10))
+
+    esys.add(*nodes)
+    return esys
+
+
+def time_model(n_pipes, n_ts, pipe_class):
+    esys = create_energy_system(n_pipes, n_ts, pipe_class)
+    t0 = time.perf_counter()
+    solph.Model(esys)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--pipes', type=int, nargs='+',
+                        default=[100, 1000, 5000])
+    parser.add_argument('--timesteps', type=int, default=168)
+    args = parser.parse_args()
+
+    print('{:>8} {:>10} {:>12} {:>12} {:>8}'.format(
+        'pipes', 'timesteps', 'legacy [s]', 'bulk [s]', 'speedup'))
+    for n in args.pipes:
+        t_legacy = time_model(n, args.timesteps, LegacyHeatPipeline)
+        t_bulk = time_model(n, args.timesteps, oh.HeatPipeline)
+        print('{:>8} {:>10} {:>12.2f} {:>12.2f} {:>8.2f}'.format(
+            n, args.timesteps, t_legacy, t_bulk, t_legacy / t_bulk))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Scaling benchmark of the build and solve pipeline with synthetic networks.
+
+For each network size, a synthetic network is generated (general data of
+the Hombeer example) and the stages of dhs_example.py are measured with
+modules.instrumentation.Report.
+
+Usage:
+    python -m benchmarks.bench_scaling --houses 10 100 1000 10000 \
+        --timesteps 24 --meshing 0.1 --solve --time-limit 600
+
+With --backend matrix, the model is built by modules.matrix_model (sparse
+matrix without pyomo) and solved with HiGHS.
+
+Each network size is run in a new process, so that the peak memory of the
+process refers to this size only.
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__license__ = "GPLv3"
+
+import argparse
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import oemof.solph as solph
+
+from modules.dhs_nodes import add_nodes_dhs, add_nodes_houses
+from modules.input_data import load_input_data
+from modules.instrumentation import Report
+from modules.matrix_model import MatrixModel
+from modules.pipeline import capacity_bounds
+from modules.solve import run_solver
+from modules.synthetic import synthetic_input_data
+
+
+def run(n_houses, args, template):
+    report = Report(trace_memory=args.trace_memory, houses=n_houses,
+                    timesteps=args.timesteps, meshing=args.meshing)
+
+    with report.stage('generate'):
+        data = synthetic_input_data(template, n_houses, meshing=args.meshing,
+                                    n_timesteps=args.timesteps)
+
+    gd = {'num_ts': args.timesteps,
+          'time_res': 1,
+          'rate': 0.01,
+          'f_invest': args.timesteps / 8760,
+          'bidirectional': args.bidirectional,
+          'infer_direction': args.infer_direction}
+
+    esys = solph.EnergySystem(timeindex=pd.date_range(
+        '1/1/2018', periods=args.timesteps, freq='H'))
+    nodes = []
+    buses = {}
+
+    cap_bounds = None
+    if args.bound_capacity:
+        with report.stage('capacity_bounds'):
+            cap_bounds = capacity_bounds(data, gd)
+
+    with report.stage('add_nodes_dhs'):
+        nodes, buses = add_nodes_dhs(data['qgis_data'], gd, data['gd_infra'],
+                                     nodes, buses, cap_bounds=cap_bounds)
+    with report.stage('add_nodes_houses (house)'):
+        nodes, buses = add_nodes_houses(gd, data['data_houses'], nodes, buses,
+                                        'house')
+    with report.stage('add_nodes_houses (generation)'):
+        nodes, buses = add_nodes_houses(gd, data['data_generation'], nodes,
+                                        buses, 'generation')
+    if args.backend == 'matrix':
+        with report.stage('MatrixModel'):
+            mm = MatrixModel(nodes, args.timesteps)
+        report.model = mm.statistics()
+
+        if args.solve:
+            with report.stage('solve'):
+                info = mm.solve(time_limit=args.time_limit,
+                                mip_gap=args.mip_gap)
+            report.meta['termination'] = info['termination']
+            report.meta['objective'] = info['objective']
+
+        return report.to_dict()
+
+    with report.stage('esys.add'):
+        esys.add(*nodes)
+    with report.stage('solph.Model'):
+        om = solph.Model(esys)
+    report.add_model(om)
+
+    if args.solve:
+        with report.stage('solve'):
+            info = run_solver(om, solver=args.solver,
+                              time_limit=args.time_limit,
+                              mip_gap=args.mip_gap)
+        report.meta['termination'] = info['termination']
+        report.meta['objective'] = info['objective']
+
+    return report.to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--houses', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000])
+    parser.add_argument('--timesteps', type=int, default=24)
+    parser.add_argument('--meshing', type=float, default=0.1)
+    parser.add_argument('--bidirectional', action='store_true')
+    parser.add_argument('--bound-capacity', action='store_true')
+    parser.add_argument('--infer-direction', action='store_true')
+    parser.add_argument('--backend', choices=['pyomo', 'matrix'],
+                        default='pyomo')
+    parser.add_argument('--solve', action='store_true')
+    parser.add_argument('--solver', default=None)
+    parser.add_argument('--time-limit', type=float, default=None)
+    parser.add_argument('--mip-gap', type=float, default=None)
+    parser.add_argument('--trace-memory', action='store_true')
+    parser.add_argument('--output', default='bench_scaling.json')
+    args = parser.parse_args()
+
+    template = load_input_data('data')
+
+    # spawned processes do not share the memory of this process
+    context = multiprocessing.get_context('spawn')
+
+    reports = []
+    rows = []
+    for n in args.houses:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as ex:
+            rep = ex.submit(run, n, args, template).result()
+        reports.append(rep)
+
+        row = {'houses': n,
+               'variables': rep['model']['variables'],
+               'binaries': rep['model']['binaries'],
+               'constraints': rep['model']['constraints'],
+               'max_rss_mb': rep['stages'][-1]['process_max_rss_mb']}
+        row.update({s['stage']: s['wall_time'] for s in rep['stages']})
+        rows.append(row)
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+    with open(args.output, 'w') as f:
+        json.dump(reports, f, indent=2, default=str)
+
+
+if __name__ == '__main__':
+    main()
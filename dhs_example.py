@@ -17,65 +17,47 @@ import oemof.solph as solph
 import oemof.outputlib as outputlib
 import logging
 import pandas as pd
-from simpledbf import Dbf5
+from modules.aggregation import (aggregate_periods, f_invest, f_summed_max,
+                                 disaggregate_results)
 from modules.dhs_nodes import add_nodes_dhs, add_nodes_houses
-
-
-# get data
-# infrastructure data
-
-df_points = Dbf5('data/gis/Points_all_hombeer.dbf').to_dataframe()
-df_lines = Dbf5('data/gis/Lines_all_hombeer.dbf').to_dataframe()
-
-qgis_data = {'points': df_points,
-             'lines': df_lines}
-
-# house data
-# getting general data for houses (same for all houses)
-xls = pd.ExcelFile('data/data_houses.xlsx')
-houses_general = {'bus': xls.parse('Buses'),
-                  'source': xls.parse('Sources'),
-                  'demand': xls.parse('Demand'),
-                  'transformer': xls.parse('Transformer'),
-                  'storages': xls.parse('Storages')}
-
-# individual house data (will be replaced by kataster Daten)
-houses_individual = df_points.loc[df_points['type'] == 'H']
-houses_individual = houses_individual.reset_index(drop=True)
-
-# data for demand series of houses
-xls = pd.ExcelFile('data/Timeseries_houses.xlsx')
-houses_series = {'heat': xls.parse('heat')}
-
-# put all house data together
-data_houses = {'general_data': houses_general,
-               'individual_data': houses_individual,
-               'series_data': houses_series}
-
-# generation data
-
-# getting general data for generation (same for all generation)
-xls = pd.ExcelFile('data/data_generation.xlsx')
-generation_general = {'bus': xls.parse('Buses'),
-                      'source': xls.parse('Sources'),
-                      'demand': xls.parse('Demand'),
-                      'transformer': xls.parse('Transformer'),
-                      'storages': xls.parse('Storages')}
-
-# individual house data
-generation_individual = df_points.loc[df_points['type'] == 'G']
-generation_individual = generation_individual.reset_index(drop=True)
-
-# data for demand series of generation
-generation_series = {}
-
-# put all house data together
-data_generation = {'general_data': generation_general,
-                   'individual_data': generation_individual,
-                   'series_data': generation_series}
-
-xls = pd.ExcelFile('data/data_heatpipes.xlsx')
-gd_infra = {'heatpipe_options': xls.parse('Heatpipes')}
+from modules.dispatch import fixed_capacities, rolling_dispatch
+from modules.input_data import load_input_data
+from modules.instrumentation import Report
+from modules.oemof_heatpipe import add_heat_loss_results
+from modules.pipeline import capacity_bounds
+from modules.results import (extract_results, map_line_results,
+                             add_size_classes, write_line_results,
+                             to_geodataframe, transformer_invest)
+from modules.solve import (run_solver, two_phase_solve, warm_start_solve,
+                           read_invest_solution, write_invest_solution)
+from modules.topology import (reduce_network, expand_line_results,
+                              aggregate_houses, split_house_results,
+                              split_line_results)
+
+
+# wall time, memory and model size of all stages (written to json report)
+report = Report()
+
+# get data (parsed input files are cached in data/.cache)
+with report.stage('input_load'):
+    input_data = load_input_data('data')
+
+qgis_data = input_data['qgis_data']
+df_points = qgis_data['points']
+df_lines = qgis_data['lines']
+
+data_houses = input_data['data_houses']
+data_generation = input_data['data_generation']
+gd_infra = input_data['gd_infra']
+
+# topology reduction (merge serial DL chains, remove dead-end branches)
+reduce_topology = False
+
+if reduce_topology:
+    points_model, lines_model, line_mapping = reduce_network(df_points,
+                                                             df_lines)
+    qgis_data = {'points': points_model,
+                 'lines': lines_model}
 
 # general data
 
@@ -83,13 +65,49 @@ num_ts = 6    # number of timesteps
 time_res = 1    # time resolution: [1/h] (percentage of hour)
                 # => 0.25 is quarter-hour resolution
 
+# time series aggregation into typical days (None: first num_ts timesteps)
+n_typical_days = None
+aggregation = None
+weights = None
+
+# series of the full horizon (for the dispatch with fixed capacities)
+series_horizon = data_houses['series_data']
+
+if n_typical_days:
+    aggregation = aggregate_periods(
+        data_houses['series_data']['heat'], n_typical_days,
+        period_length=int(24 / time_res), n_extreme=1)
+    data_houses['series_data'] = {'heat': aggregation['series']}
+    num_ts = len(aggregation['series'])
+    weights = aggregation['weights']
+
+# aggregation of the houses connected to the same infrastructure point
+aggregate_house_nodes = False
+
+if aggregate_house_nodes:
+    series_houses = data_houses['series_data']['heat']
+    points_houses = qgis_data['points']
+    lines_houses = qgis_data['lines']
+    points_agg, lines_agg, data_houses, house_mapping = aggregate_houses(
+        points_houses, lines_houses, data_houses)
+    qgis_data = {'points': points_agg,
+                 'lines': lines_agg}
+
 gd = {'num_ts': num_ts,
       'time_res': time_res,
       'rate': 0.01,
       'f_invest': num_ts/(8760 / time_res),
       # 'f_invest': 1,
+      'bidirectional': False,    # one shared pipe per DL line
+      'infer_direction': False,  # one pipe for DL lines with forced direction
+      'bound_capacity': False,   # pipe capacities bounded by the demand
       }
 
+if aggregation is not None:
+    gd['f_invest'] = f_invest(aggregation, time_res)
+    # summed_max limits refer to the represented horizon
+    gd['f_summed_max'] = f_summed_max(aggregation)
+
 # defining empty dict for nodes
 nodes = []  # list of all nodes
 buses = {}   # dict of all buses
@@ -104,21 +122,34 @@ esys = solph.EnergySystem(timeindex=date_time_index)
 
 logging.info('Create oemof objects')
 
+# upper bounds of the pipe capacities derived from the demand downstream
+cap_bounds = None
+if gd['bound_capacity']:
+    with report.stage('capacity_bounds'):
+        cap_bounds = capacity_bounds({'qgis_data': qgis_data,
+                                      'data_houses': data_houses,
+                                      'gd_infra': gd_infra}, gd)
+
 # add heating infrastructure
-nodes, buses = add_nodes_dhs(qgis_data, gd, gd_infra, nodes, buses)
+with report.stage('add_nodes_dhs'):
+    nodes, buses = add_nodes_dhs(qgis_data, gd, gd_infra, nodes, buses,
+                                 cap_bounds=cap_bounds)
 logging.info('DHS Nodes appended.')
 
 # # add houses
-nodes, buses = add_nodes_houses(gd, data_houses, nodes, buses, 'house')
+with report.stage('add_nodes_houses (house)'):
+    nodes, buses = add_nodes_houses(gd, data_houses, nodes, buses, 'house')
 logging.info('HOUSE Nodes appended.')
 
 # add generation sites
-nodes, buses = add_nodes_houses(gd, data_generation, nodes, buses,
-                                'generation')
+with report.stage('add_nodes_houses (generation)'):
+    nodes, buses = add_nodes_houses(gd, data_generation, nodes, buses,
+                                    'generation')
 logging.info('GENERATION Nodes appended.')
 
 # add nodes and flows to energy system
-esys.add(*nodes)
+with report.stage('esys.add'):
+    esys.add(*nodes)
 
 logging.info('Energysystem has been created')
 print("*********************************************************")
@@ -130,10 +161,64 @@ for n in esys.nodes:
 print("*********************************************************")
 
 logging.info('Build the operational model')
-om = solph.Model(esys)
+with report.stage('solph.Model'):
+    if weights is not None:
+        om = solph.Model(esys, objective_weighting=weights)
+    else:
+        om = solph.Model(esys)
+report.add_model(om)
 
 logging.info('Solve the optimization problem')
-om.solve(solver='gurobi', solve_kwargs={'tee': True})
+# two-phase solve: LP relaxation first, then MILP without unused pipes
+two_phase = False
+
+# initial solution, e.g. of a previous run (None: cold start)
+initial_solution = None
+# initial_solution = read_invest_solution('data/invest_solution.csv')
+
+# solver settings (solver None: first available of gurobi, highs, cbc, glpk)
+solver_settings = {'solver': None,
+                   'threads': None,
+                   'mip_gap': None,
+                   'time_limit': None,
+                   'node_limit': None,
+                   'solve_kwargs': {'tee': True}}
+
+report.start('solve')
+if two_phase:
+    solve_report = two_phase_solve(om, **solver_settings)
+elif initial_solution is not None:
+    solve_info = warm_start_solve(om, initial_solution, **solver_settings)
+else:
+    solve_info = run_solver(om, **solver_settings)
+report.stop()
+
+# investments of this run as initial solution of following runs
+save_invest_solution = False
+
+if save_invest_solution:
+    write_invest_solution(om, 'data/invest_solution.csv')
+
+# dispatch of the full horizon with the invested capacities (rolling horizon)
+dispatch_horizon = False
+save_dispatch = False   # write the dispatch to data/dispatch_*.csv
+
+if dispatch_horizon:
+    data_horizon = dict(data_houses, series_data=series_horizon)
+    if aggregate_house_nodes:
+        data_horizon = aggregate_houses(points_houses, lines_houses,
+                                        data_horizon)[2]
+
+    with report.stage('dispatch'):
+        dispatch = rolling_dispatch(
+            {'qgis_data': qgis_data, 'data_houses': data_horizon,
+             'data_generation': data_generation, 'gd_infra': gd_infra},
+            gd, fixed_capacities(om), window=int(168 / time_res),
+            overlap=int(24 / time_res), **solver_settings)
+
+    if save_dispatch:
+        dispatch['flows'].to_csv('data/dispatch_flows.csv')
+        dispatch['components'].to_csv('data/dispatch_components.csv')
 
 # # plot the Energy System
 # try:
@@ -149,62 +234,48 @@ om.solve(solver='gurobi', solve_kwargs={'tee': True})
 # except ImportError:
 #     logging.info('Module pygraphviz not found: Graph was not plotted.')
 
-esys.results['main'] = outputlib.processing.results(om)
+with report.stage('processing.results'):
+    esys.results['main'] = outputlib.processing.results(om)
+    add_heat_loss_results(om, esys.results['main'])
 results = esys.results['main']
 
+if aggregation is not None:
+    # sequences of the typical days mapped onto the full horizon
+    esys.results['horizon'] = disaggregate_results(
+        results, aggregation, index=series_horizon['heat'].index)
+
+report.start('post-processing')
+
 # Add results to dataframe of line layer
-l_heatpipes = []
-l_hp_invest = []
+with report.stage('extract_results'):
+    results_df = extract_results(results)
+    if aggregate_house_nodes:
+        results_df = split_house_results(results_df, house_mapping,
+                                         series_houses)
 
-for n in esys.nodes:
-    type_name =\
-        str(type(n)).replace("<class 'modules.oemof_heatpipe.", "").replace(
-            "'>", "")
-    if type_name == "HeatPipeline":
-        l_heatpipes.append(str(n.label).split('heatpipe_x_')[1])
-        # p_invest = outputlib.views.node(results, n.label)['scalars'][0]
-        # print(p_invest)
-        l_hp_invest.append(outputlib.views.node(
-            results, str(n.label))['scalars'][0])
-
-d_heatpipes_results = {'dir_1': l_heatpipes,
-                       'size_1': l_hp_invest}
-
-df_hp_result = pd.DataFrame(d_heatpipes_results)
-
-# preparing the results (maximum installed capacity of bi-directional trafos)
-df_lines['dir_1'] = df_lines['id_start'] + '-' + df_lines['id_end']
-df_lines = df_lines.merge(df_hp_result, on='dir_1', how='left')
-df_hp_result = df_hp_result.rename(
-    index=str, columns={"dir_1": "dir_2", "size_1": "size_2"})
-df_lines['dir_2'] = df_lines['id_end'] + '-' + df_lines['id_start']
-df_lines = df_lines.merge(df_hp_result, on='dir_2', how='left')
-df_lines['size_1'].fillna(0, inplace=True)
-df_lines['size_2'].fillna(0, inplace=True)
-df_lines['size'] = round(df_lines['size_1'] + df_lines['size_2'])
-
-# look-up table for size classes - example for given pressure loss and delta T
-df_lookup = pd.DataFrame(data=[[0, 0.1, '0'],
-                               [0.1, 20, 'DN 20'],
-                               [20.1, 30, 'DN 25'],
-                               [30.1, 54, 'DN 32'],
-                               [54.1, 90, 'DN 40'],
-                               [90.1, 156, 'DN 50'],
-                               [156.1, 300, 'DN 65'],
-                               [300.1, 507, 'DN 80'],
-                               [507.1, 900, 'DN 100'],
-                               [900.1, 1630, 'DN 125'],
-                               [1630.1, 2660, 'DN 150'],
-                               [2660.1, 5850, 'DN 200']],
-                         columns=['min', 'max', 'DN'])
-
-df_lines['size_class'] = pd.cut(
-    df_lines['size'],
-    bins=[0] + df_lookup[['min','max']].stack()[1::2].tolist(),
-    labels=df_lookup['DN'].tolist())
-
-# export results
-df_lines.to_csv('data/gis/results_grid_hombeer.csv')
+# invested capacity of both directions of all lines
+df_lines_model = map_line_results(qgis_data['lines'], results_df['invest'])
+
+if aggregate_house_nodes:
+    # split service lines of aggregated houses
+    df_lines_model = split_line_results(df_lines_model[['size_1', 'size_2']],
+                                        house_mapping, lines_houses)
+
+if reduce_topology:
+    # map sizes of merged lines back onto the original segments
+    df_lines = expand_line_results(df_lines_model[['size_1', 'size_2']],
+                                   line_mapping, df_lines)
+    df_lines[['size_1', 'size_2']] = df_lines[['size_1', 'size_2']].fillna(0)
+else:
+    df_lines = df_lines_model
+
+df_lines = add_size_classes(df_lines)
+
+# export results (.csv, .parquet or .gpkg)
+write_line_results(df_lines, 'data/gis/results_grid_hombeer.csv')
+
+report.stop()
+report.write('data/report.json')
 
 # ################ geoplot ################################################
 
@@ -213,16 +284,8 @@ try:
     import geopandas as gpd
     from matplotlib import pyplot as plt
 
-    # read existing line layer, which was input for oemof
-    gdf_lines = gpd.read_file('data/gis/Lines_all_hombeer.shp')
-    gdf_lines['id'] = gdf_lines['id_start'] + gdf_lines['id_end']
-
-    # read oemof results for heatpipelines invest
-    df_results = pd.read_csv('data/gis/results_grid_hombeer.csv', index_col=0)
-    df_results['id'] = df_results['id_start'] + df_results['id_end']
-
-    gdf_lines = gdf_lines.merge(df_results[['id', 'size', 'size_class']],
-                                on='id')
+    # line layer with results and geometry of the line shapefile
+    gdf_lines = to_geodataframe(df_lines, 'data/gis/Lines_all_hombeer.shp')
 
     gdf_points = gpd.read_file('data/gis/Points_all_hombeer.shp')
 
@@ -262,22 +325,9 @@ except ImportError:
     logging.info('Module geopandas not found: Geo-plot was not plotted.')
 
 # plot installed transformer capacity
-flows = [x for x in results.keys() if x[1] is not None]
-flows_invest = [x for x in flows if hasattr(
-    results[x]['scalars'], 'invest')]
-flows_invest_boiler = [x for x in flows_invest if 'boiler' in x[0].label[2]]
-flows_invest_boiler_generation = [x for x in flows_invest_boiler
-                                  if 'generation' in x[0].label[0]]
-flows_invest_boiler_houses = [x for x in flows_invest_boiler
-                              if 'house' in x[0].label[0]]
-
-p_gen_invest = 0
-p_house_invest = 0
-
-for h in flows_invest_boiler_houses:
-    p_house_invest += results[h]['scalars']['invest']
-for g in flows_invest_boiler_generation:
-    p_gen_invest += results[g]['scalars']['invest']
+p_boiler_invest = transformer_invest(results_df['invest'], 'boiler')
+p_gen_invest = p_boiler_invest.get('generation', 0)
+p_house_invest = p_boiler_invest.get('house', 0)
 
 df_invest = pd.DataFrame([p_gen_invest, p_house_invest],
                          index=['zentral', 'dezentral'],
@@ -12,9 +12,11 @@ SPDX-License-Identifier: GPL-3.0-or-later
 __copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
 __license__ = "GPLv3"
 
+import numpy as np
 import oemof.solph as solph
 from oemof.tools import economics
 from modules import oemof_heatpipe as oh
+from modules.profiles import DemandProfiles
 
 
 def add_buses(it, labels, nodes, busd):
@@ -98,9 +100,23 @@ def add_demand(it, labels, gd, series, nodes, busd):
             labels['l_2'] = de['label_2']
             # set static inflow values
             inflow_args = {'nominal_value': de['scalingfactor'],
-                           'fixed': de['fixed'],
-                           'actual_value': series[
-                               labels['l_2']][labels['l_4']]}
+                           'fixed': de['fixed']}
+
+            if isinstance(series, DemandProfiles):
+                # view of the shared normalized profile, the scale factor
+                # is part of the nominal value (only for fixed flows, the
+                # nominal value is the upper bound otherwise)
+                profile, scale = series.get(labels['l_2'], labels['l_4'])
+                if de['fixed']:
+                    inflow_args['actual_value'] = profile
+                    inflow_args['nominal_value'] *= scale
+                else:
+                    inflow_args['actual_value'] = profile * scale
+                    scale = 1
+            else:
+                inflow_args['actual_value'] = series[
+                    labels['l_2']][labels['l_4']]
+                scale = 1
 
             # create
             nodes.append(
@@ -109,6 +125,7 @@ def add_demand(it, labels, gd, series, nodes, busd):
                            inputs={
                                busd[(labels['l_1'], labels['l_2'], 'bus',
                                      labels['l_4'])]: solph.Flow(
+                                        profile_scale=scale,
                                         **inflow_args)}))
 
     return nodes, busd
@@ -146,7 +163,8 @@ def add_transformer(it, labels, gd, nodes, busd):
                             inputs={b_in_1: solph.Flow()},
                             outputs={b_out_1: solph.Flow(
                                 variable_costs=t['variable_costs'],
-                                summed_max=t['in_1_sum_max'],
+                                summed_max=t['in_1_sum_max'] *
+                                gd.get('f_summed_max', 1),
                                 investment=solph.Investment(
                                     ep_costs=epc_t +
                                              t['service'] * gd['f_invest'],
@@ -171,7 +189,8 @@ def add_transformer(it, labels, gd, nodes, busd):
                             inputs={b_in_1: solph.Flow()},
                             outputs={b_out_1: solph.Flow(
                                 nominal_value=t['installed'],
-                                summed_max=t['in_1_sum_max'],
+                                summed_max=t['in_1_sum_max'] *
+                                gd.get('f_summed_max', 1),
                                 variable_costs=t['variable_costs'])},
                             conversion_factors={b_out_1: t['eff_out_1']}))
 
@@ -223,55 +242,174 @@ def add_storage(it, labels, gd, nodes, busd):
     return nodes, busd
 
 
-def add_heatpipes(it, labels, gd, q, b_in, b_out, nodes, busd):
+def heatpipe_costs(it, gd):
+    """
+    Calculates the annualised costs of all active heatpipe options once, so
+    that they do not have to be recalculated for every line.
+
+    :param it: pd.Dataframe containing tabular information of the heatpipe
+               options
+    :param gd: general data
+    :return: pd.Dataframe of the active heatpipe options with the additional
+             columns 'epc' (costs per capacity) and 'epc_fix' (fix costs per
+             length unit)
+    """
+    it = it[it['active'].astype(bool)].reset_index(drop=True)
 
-    for i, t in it.iterrows():
+    # the annuity is linear in capex, so the factor is calculated per option
+    f_annuity = np.array([
+        economics.annuity(capex=1, n=n, wacc=gd['rate']) for n in it['n_pipes']
+    ]) * gd['f_invest']
 
-        if t['active']:
+    it['epc'] = it['capex_pipes'].values * f_annuity
+    it['epc_fix'] = it['fix_costs'].values * f_annuity
 
-            # definition of tag3 of label -> type of pipe
-            labels['l_3'] = t['label_3']
+    return it
 
-            epc_p = float(economics.annuity(
-                capex=it['capex_pipes'].values,# * q['length'],
-                n=it['n_pipes'].values, wacc=gd['rate'])) * gd['f_invest']
 
-            # Heatpipe with binary variable
-            if t['nonconvex']:
+def heatpipe_cap_max(t, q):
+    """
+    Maximum capacity of a heatpipe option, tightened by the upper bound of
+    the capacity of the line (q['cap_max'], e.g. derived from the demand).
+    Nonconvex options keep at least their minimum capacity, so that a line
+    with a small bound can still be built. The capacities of the option are
+    multiplied by the number of merged lines (q['n_lines']).
+
+    :param t: heatpipe option
+    :param q: line data
+    :return: maximum capacity
+    """
+    n = q.get('n_lines', 1)
+    bound = q.get('cap_max', np.inf)
+    if bound <= 0:
+        return 0
+    if t['nonconvex']:
+        bound = max(bound, t['cap_min'] * n)
+    return min(t['cap_max'] * n, bound)
 
-                epc_fix = float(economics.annuity(
-                    capex=it['fix_costs'].values * q['length'],
-                    n=it['n_pipes'].values, wacc=gd['rate']) * gd['f_invest'])
 
-                nodes.append(oh.HeatPipeline(
-                    label=oh.Label(labels['l_1'], labels['l_2'],
-                                     labels['l_3'], labels['l_4']),
-                    inputs={b_in: solph.Flow()},
-                    outputs={b_out: solph.Flow(
-                        nominal_value=None, investment=solph.Investment(
-                            ep_costs=epc_p,
-                            maximum=t['cap_max'],
-                            minimum=t['cap_min'],
-                            nonconvex=True,
-                            offset=epc_fix,
-                        ))},
-                    heat_loss_factor=t['l_factor'],
-                    length=q['length']))
+def add_heatpipes(it, labels, gd, q, b_in, b_out, nodes, busd, epc_fix=None):
+    """
+    :param it: pd.Dataframe of heatpipe options (preferably the result of
+               heatpipe_costs), optional column 'compact' for the compact
+               formulation of the heat loss
+    :param labels: dict of label strings
+    :param gd: general data
+    :param q: line data (at least 'length', optional 'line' - id of line,
+              'reverse' - pipe from id_end to id_start, 'cap_max' - upper
+              bound of the capacity and 'n_lines' - number of merged lines)
+    :param epc_fix: array of the fix costs of each active heatpipe option for
+                    this line (length-dependent part of heatpipe_costs)
+    :return:
+    """
 
-            else:
+    if 'epc' not in it.columns:
+        it = heatpipe_costs(it, gd)
+
+    if epc_fix is None:
+        epc_fix = it['epc_fix'].values * q['length']
+
+    for t, epc_p, epc_f in zip(it.to_dict('records'), it['epc'], epc_fix):
+
+        # definition of tag3 of label -> type of pipe
+        labels['l_3'] = t['label_3']
+
+        # Heatpipe with binary variable
+        if t['nonconvex']:
+
+            nodes.append(oh.HeatPipeline(
+                label=oh.Label(labels['l_1'], labels['l_2'],
+                               labels['l_3'], labels['l_4']),
+                inputs={b_in: solph.Flow()},
+                outputs={b_out: solph.Flow(
+                    nominal_value=None, investment=solph.Investment(
+                        ep_costs=epc_p,
+                        maximum=heatpipe_cap_max(t, q),
+                        minimum=t['cap_min'] * q.get('n_lines', 1),
+                        nonconvex=True,
+                        offset=epc_f,
+                    ))},
+                heat_loss_factor=t['l_factor'],
+                length=q['length'],
+                compact=bool(t.get('compact') == 1),
+                line=q.get('line'),
+                reverse=q.get('reverse', False)))
+
+        else:
+
+            nodes.append(oh.HeatPipeline(
+                label=oh.Label(labels['l_1'], labels['l_2'],
+                               labels['l_3'], labels['l_4']),
+                inputs={b_in: solph.Flow()},
+                outputs={b_out: solph.Flow(
+                    nominal_value=None, investment=solph.Investment(
+                        ep_costs=epc_p,
+                        maximum=heatpipe_cap_max(t, q),
+                        minimum=0,
+                        nonconvex=False,
+                    ))},
+                heat_loss_factor=t['l_factor'],
+                length=q['length'],
+                compact=bool(t.get('compact') == 1),
+                line=q.get('line'),
+                reverse=q.get('reverse', False)))
 
-                nodes.append(oh.HeatPipeline(
-                    label=oh.Label(labels['l_1'], labels['l_2'],
-                                     labels['l_3'], labels['l_4']),
-                    inputs={b_in: solph.Flow()},
-                    outputs={b_out: solph.Flow(
-                        nominal_value=None, investment=solph.Investment(
-                            ep_costs=epc_p,
-                            maximum=t['cap_max'],
-                            minimum=0,
-                            nonconvex=False,
-                        ))},
-                    heat_loss_factor=t['l_factor'],
-                    length=q['length']))
+    return nodes, busd
+
+
+def add_bidirectional_heatpipes(it, labels, gd, q, b_a, b_b, nodes, busd,
+                                epc_fix=None):
+    """
+    Adds one BidirectionalHeatPipeline for each active heatpipe option
+    between two buses (instead of two HeatPipelines, one for each direction).
+
+    :param it: pd.Dataframe of heatpipe options (preferably the result of
+               heatpipe_costs)
+    :param labels: dict of label strings
+    :param gd: general data
+    :param q: line data (at least 'length', optional 'line' - id of line,
+              'cap_max' - upper bound of the capacity and 'n_lines' -
+              number of merged lines)
+    :param b_a: first bus of pipe
+    :param b_b: second bus of pipe
+    :param epc_fix: array of the fix costs of each active heatpipe option for
+                    this line (length-dependent part of heatpipe_costs)
+    :return:
+    """
+
+    if 'epc' not in it.columns:
+        it = heatpipe_costs(it, gd)
+
+    if epc_fix is None:
+        epc_fix = it['epc_fix'].values * q['length']
+
+    for t, epc_p, epc_f in zip(it.to_dict('records'), it['epc'], epc_fix):
+
+        labels['l_3'] = t['label_3']
+
+        if t['nonconvex']:
+            investment = solph.Investment(
+                ep_costs=epc_p,
+                maximum=heatpipe_cap_max(t, q),
+                minimum=t['cap_min'] * q.get('n_lines', 1),
+                nonconvex=True,
+                offset=epc_f)
+
+        else:
+            investment = solph.Investment(
+                ep_costs=epc_p,
+                maximum=heatpipe_cap_max(t, q),
+                minimum=0,
+                nonconvex=False)
+
+        nodes.append(oh.BidirectionalHeatPipeline(
+            label=oh.Label(labels['l_1'], labels['l_2'],
+                           labels['l_3'], labels['l_4']),
+            inputs={b_a: solph.Flow(), b_b: solph.Flow()},
+            outputs={b_a: solph.Flow(), b_b: solph.Flow()},
+            investment=investment,
+            heat_loss_factor=t['l_factor'],
+            length=q['length'],
+            line=q.get('line')))
 
     return nodes, busd
@@ -0,0 +1,204 @@
+"""
+oemof application for research project quarree100.
+
+Aggregation of the demand time series into typical periods (e.g. typical
+days), so that the network can be sized against a representative year with a
+fraction of the timesteps.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import logging
+import numpy as np
+import pandas as pd
+
+
+def _sq_distances(x, centers):
+    """Squared euclidean distances between all rows of x and centers."""
+    d = (x ** 2).sum(axis=1)[:, None] - 2 * x.dot(centers.T) + \
+        (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(d, 0)
+
+
+def _kmeans(x, k, n_iter=100, seed=0):
+    """
+    Simple k-means clustering with k-means++ initialisation.
+
+    :param x: np.array (n_samples, n_features)
+    :param k: number of clusters
+    :return: labels (cluster of each sample), centers
+    """
+    rng = np.random.RandomState(seed)
+
+    centers = x[[rng.randint(len(x))]]
+    for _ in range(1, k):
+        d = _sq_distances(x, centers).min(axis=1)
+        p = d / d.sum() if d.sum() > 0 else None
+        centers = np.vstack([centers, x[rng.choice(len(x), p=p)]])
+
+    labels = np.zeros(len(x), dtype=int)
+    for _ in range(n_iter):
+        labels = _sq_distances(x, centers).argmin(axis=1)
+        new = np.array([x[labels == j].mean(axis=0) if (labels == j).any()
+                        else centers[j] for j in range(k)])
+        if np.allclose(new, centers):
+            break
+        centers = new
+
+    return labels, centers
+
+
+def aggregate_periods(series, n_periods, period_length=24, n_extreme=1,
+                      seed=0):
+    """
+    Clusters the periods of demand time series into typical periods.
+
+    Each typical period is represented by the original period closest to the
+    cluster center (medoid), so that the profiles stay realistic. The periods
+    with the highest peak of the summed demand are kept as extreme periods
+    (weight 1), so that the peak load, which determines the pipe sizes, is
+    preserved.
+
+    Note: storages are not linked between the typical periods.
+
+    :param series: pd.DataFrame of demand time series (one column per house,
+                   e.g. houses_series['heat']), non-numeric columns are kept
+                   from the representative periods
+    :param n_periods: number of typical periods (including extreme periods)
+    :param period_length: number of timesteps per period (24 / time_res for
+                          typical days)
+    :param n_extreme: number of peak periods, which are added as individual
+                      typical periods
+    :param seed: seed of clustering
+    :return: dict with 'series' (aggregated time series with RangeIndex),
+             'weights' (number of represented timesteps for each timestep of
+             the aggregated series), 'period_weights', 'order' (typical period
+             of each original period) and 'period_length'
+    """
+    n_total = len(series) // period_length
+
+    if n_total * period_length < len(series):
+        logging.warning('The last %s timesteps do not form a full period and '
+                        'are not considered in the aggregation.',
+                        len(series) - n_total * period_length)
+
+    if n_periods >= n_total:
+        raise ValueError('Number of typical periods ({}) has to be smaller '
+                         'than the number of periods ({}).'.format(
+                             n_periods, n_total))
+
+    n_extreme = min(n_extreme, n_periods)
+
+    values = series.select_dtypes(include=[np.number]).values[
+        :n_total * period_length].astype(float)
+    x = values.reshape(n_total, -1)
+
+    # extreme periods: highest peak of the summed demand
+    peak = values.sum(axis=1).reshape(n_total, period_length).max(axis=1)
+    extreme = np.argsort(-peak, kind='mergesort')[:n_extreme]
+    normal = np.setdiff1d(np.arange(n_total), extreme)
+
+    order = np.empty(n_total, dtype=int)
+    representatives = list(extreme)
+    order[extreme] = np.arange(n_extreme)
+
+    k = n_periods - n_extreme
+    if k > 0:
+        labels, centers = _kmeans(x[normal], k, seed=seed)
+        for j in range(k):
+            members = normal[labels == j]
+            if len(members) == 0:
+                continue
+            d = _sq_distances(x[members], centers[[j]])[:, 0]
+            order[members] = len(representatives)
+            representatives.append(members[d.argmin()])
+    elif len(normal) > 0:
+        # no typical periods left: assign all periods to the closest extreme
+        d = _sq_distances(x[normal], x[extreme])
+        order[normal] = d.argmin(axis=1)
+
+    representatives = np.asarray(representatives)
+    period_weights = np.bincount(order, minlength=len(representatives))
+
+    rows = (representatives[:, None] * period_length +
+            np.arange(period_length)).ravel()
+    agg_series = series.iloc[rows].reset_index(drop=True)
+
+    return {'series': agg_series,
+            'weights': np.repeat(period_weights, period_length).astype(float),
+            'period_weights': period_weights,
+            'representatives': representatives,
+            'order': order,
+            'period_length': period_length}
+
+
+def f_invest(aggregation, time_res):
+    """
+    Share of the year, which is represented by the aggregated time series
+    (replaces num_ts/(8760 / time_res) of the general data).
+    """
+    return aggregation['weights'].sum() / (8760 / time_res)
+
+
+def f_summed_max(aggregation):
+    """
+    Factor of the summed_max limits of the flows for the aggregated time
+    series: oemof sums the flows of the timesteps without weights, so the
+    limit of the represented horizon is scaled by the number of timesteps
+    of the aggregated series divided by the number of represented timesteps
+    (exact for flows, which are proportional over the periods, an
+    approximation otherwise).
+    """
+    return len(aggregation['weights']) / aggregation['weights'].sum()
+
+
+def disaggregate(df, aggregation, index=None):
+    """
+    Maps a time series of the aggregated timeline (one row per timestep of
+    the aggregated series) back onto the original timeline.
+
+    :param df: pd.DataFrame or pd.Series of the aggregated timeline
+    :param aggregation: result of aggregate_periods
+    :param index: index of the original timeline (default: RangeIndex)
+    :return: pd.DataFrame or pd.Series of the original timeline
+    """
+    length = aggregation['period_length']
+    rows = (aggregation['order'][:, None] * length +
+            np.arange(length)).ravel()
+
+    result = df.iloc[rows]
+    if index is None:
+        index = pd.RangeIndex(len(rows))
+    result.index = index[:len(rows)]
+
+    return result
+
+
+def disaggregate_results(results, aggregation, index=None):
+    """
+    Maps the sequences of processed oemof results onto the original
+    timeline.
+
+    :param results: results of oemof.outputlib.processing.results
+    :param aggregation: result of aggregate_periods
+    :param index: index of the original timeline (default: RangeIndex)
+    :return: dict of results with disaggregated sequences
+    """
+    length = len(aggregation['weights'])
+    disaggregated = {}
+
+    for k, v in results.items():
+        entry = dict(v)
+        seq = v.get('sequences')
+        if seq is not None and len(seq) >= length:
+            # the sequences might contain an additional (last) timestep
+            entry['sequences'] = disaggregate(
+                seq.iloc[:length], aggregation, index=index)
+        disaggregated[k] = entry
+
+    return disaggregated
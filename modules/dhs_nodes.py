@@ -12,119 +12,177 @@ SPDX-License-Identifier: GPL-3.0-or-later
 __copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
 __license__ = "GPLv3"
 
+import logging
+import numpy as np
+import pandas as pd
 import oemof.solph as solph
 from modules import oemof_heatpipe as oh, add_components as ac
+from modules.profiles import DemandProfiles
+from modules.topology import line_orientation, scale_house_data
 
 
-def add_nodes_dhs(geo_data, gd, gd_infra, nodes, busd):
+# label tag1 of the buses of each point type of the point layer
+POINT_TYPES = {'H': 'house',
+               'K': 'infrastructure',
+               'G': 'generation'}
+
+
+def _oriented_pipes(lines, bidirectional=False, orientation=None):
+    """
+    Determines the orientation of the heatpipes of all lines at once.
+
+    House connections (HL) always point from the infrastructure to the house,
+    generation connections (GL) from the generation site to the
+    infrastructure. Lines between two knots (DL) get a heatpipe in each
+    direction, since the flow direction is unknown - or a single
+    bidirectional heatpipe. DL lines with a flow direction, which is forced
+    by the topology, get only the heatpipe in this direction.
+
+    :param lines: line layer with 'type', 'id_start', 'id_end', 'length'
+    :param bidirectional: one bidirectional heatpipe for each DL line
+    :param orientation: forced flow direction of the lines (see
+                        topology.line_orientation)
+    :return: pd.DataFrame with one row per heatpipe and the columns 'line'
+             (index of line layer), 'direction', 'reverse' (pipe from
+             id_end to id_start), 'start', 'end', 'l_1_in', 'l_1_out',
+             'length', 'bidirectional' and 'label' (tag4 of heatpipe label)
     """
-    :param geo_data: geometry data (points and line layer from qgis)
-    :param gd: general data
+    first = lines['id_start'].str[:1]
+
+    hl = lines['type'] == 'HL'
+    gl = lines['type'] == 'GL'
+    dl = lines['type'] == 'DL'
+
+    # DL lines with forced flow direction
+    if orientation is None:
+        orientation = pd.Series(0, index=lines.index)
+    fixed = dl & (orientation != 0)
+
+    # the house is the end, the generation site the start of the pipe
+    flip = (hl & (first == 'H')) | (gl & (first != 'G')) | \
+        (fixed & (orientation < 0))
+    start = lines['id_start'].where(~flip, lines['id_end'])
+    end = lines['id_end'].where(~flip, lines['id_start'])
+
+    l_1_in = pd.Series('infrastructure', index=lines.index)
+    l_1_in[gl] = 'generation'
+    l_1_out = pd.Series('infrastructure', index=lines.index)
+    l_1_out[hl] = 'house'
+
+    forward = pd.DataFrame({'line': lines.index, 'direction': 0,
+                            'reverse': flip,
+                            'start': start, 'end': end,
+                            'l_1_in': l_1_in, 'l_1_out': l_1_out,
+                            'length': lines['length'],
+                            'bidirectional': dl & ~fixed & bidirectional}
+                           )[hl | gl | dl]
+
+    if bidirectional:
+        backward = forward.iloc[:0]
+    else:
+        backward = forward[(dl & ~fixed)[forward.index]].rename(
+            columns={'start': 'end', 'end': 'start'})
+        backward['direction'] = 1
+        backward['reverse'] = ~backward['reverse']
+
+    pipes = pd.concat([forward, backward], sort=False)
+    pipes = pipes.sort_values(['line', 'direction'], kind='mergesort')
+    pipes = pipes.reset_index(drop=True)
+    pipes['label'] = pipes['start'] + '-' + pipes['end']
+
+    return pipes
+
+
+def add_nodes_dhs(geo_data, gd, gd_infra, nodes, busd, cap_bounds=None):
+    """
+    :param geo_data: geometry data (points and line layer from qgis, optional
+                     column 'length_fix' of the lines for the fix costs)
+    :param gd: general data ('bidirectional': one BidirectionalHeatPipeline
+               per DL line instead of a HeatPipeline in each direction,
+               'infer_direction': only one heatpipe for DL lines with a flow
+               direction forced by the topology)
     :param gd_infra: general data for infrastructure nodes
     :param nodes: list of nodes for oemof
     :param busd: dict of buses for building nodes
+    :param cap_bounds: upper bounds of the capacity of the heatpipes of each
+                       line (see topology.pipe_capacity_bounds)
     :return:    nodes - updated list of nodes
                 busd - updated list of buses
     """
 
-    d_labels = {}
-
-    # add heat buses for all nodes
-    for n, o in geo_data['points'].iterrows():
-
-        d_labels['l_2'] = 'heat'
-        d_labels['l_3'] = 'bus'
-        d_labels['l_4'] = o['id']
-
-        if o['type'] == 'H':
-            d_labels['l_1'] = 'house'
+    points = geo_data['points']
+    l_1 = points['type'].map(POINT_TYPES)
 
-        if o['type'] == 'K':
-            d_labels['l_1'] = 'infrastructure'
+    if l_1.isnull().any():
+        logging.warning('Points of unknown type are skipped: %s',
+                        list(points.loc[l_1.isnull(), 'id']))
 
-        if o['type'] == 'G':
-            d_labels['l_1'] = 'generation'
-
-        l_bus = oh.Label(d_labels['l_1'], d_labels['l_2'], d_labels['l_3'],
-                         d_labels['l_4'])
+    # add heat buses for all nodes
+    for tag1, tag4 in zip(l_1[l_1.notnull()],
+                          points.loc[l_1.notnull(), 'id']):
+        l_bus = oh.Label(tag1, 'heat', 'bus', tag4)
         bus = solph.Bus(label=l_bus)
         nodes.append(bus)
-
         busd[l_bus] = bus
 
     # add heatpipes for all lines
-    for p, q in geo_data['lines'].iterrows():
-
-        d_labels['l_1'] = 'infrastructure'
-        d_labels['l_2'] = 'heat'
-
-        # connection of houses
-        if q['type'] == "HL":
-
-            if q['id_start'][:1] == "H":
-                start = q['id_end']
-                end = q['id_start']
-                b_in = busd[(d_labels['l_1'], d_labels['l_2'], 'bus', start)]
-                b_out = busd[('house', d_labels['l_2'], 'bus', end)]
-
-            else:
-                start = q['id_start']
-                end = q['id_end']
-                b_in = busd[(d_labels['l_1'], d_labels['l_2'], 'bus', start)]
-                b_out = busd[('house', d_labels['l_2'], 'bus', end)]
-
-            d_labels['l_4'] = start + '-' + end
-
+    orientation = None
+    if gd.get('infer_direction', False):
+        orientation = line_orientation(points, geo_data['lines'])
+
+    pipes = _oriented_pipes(geo_data['lines'],
+                            bidirectional=gd.get('bidirectional', False),
+                            orientation=orientation)
+
+    # annualised costs of the heatpipe options and fix costs of all pipes
+    hp_costs = ac.heatpipe_costs(gd_infra['heatpipe_options'], gd)
+    lines = geo_data['lines']
+    if 'length_fix' in lines.columns:
+        length_fix = lines['length_fix'].loc[pipes['line']].values
+    else:
+        length_fix = pipes['length'].values
+    epc_fix = np.outer(length_fix, hp_costs['epc_fix'].values)
+
+    # number of merged service lines (see topology.aggregate_houses)
+    if 'n_lines' in lines.columns:
+        n_lines = lines['n_lines'].loc[pipes['line']].fillna(1).values
+    else:
+        n_lines = np.ones(len(pipes))
+
+    # upper bound of the capacity of each heatpipe
+    if cap_bounds is not None:
+        bounds = cap_bounds.reindex(pipes['line']).fillna(np.inf).values
+        cap_max = np.where(pipes['bidirectional'], bounds.max(axis=1),
+                           bounds[np.arange(len(pipes)),
+                                  pipes['reverse'].astype(int)])
+    else:
+        cap_max = np.full(len(pipes), np.inf)
+
+    d_labels = {'l_1': 'infrastructure', 'l_2': 'heat'}
+
+    for l_in, start, l_out, end, tag4, line, reverse, length, bidirect, \
+            epc_f, cap, n in zip(pipes['l_1_in'], pipes['start'],
+                                 pipes['l_1_out'], pipes['end'],
+                                 pipes['label'], pipes['line'],
+                                 pipes['reverse'], pipes['length'],
+                                 pipes['bidirectional'], epc_fix, cap_max,
+                                 n_lines):
+
+        b_in = busd[(l_in, 'heat', 'bus', start)]
+        b_out = busd[(l_out, 'heat', 'bus', end)]
+
+        d_labels['l_4'] = tag4
+        q = {'length': length, 'line': line, 'reverse': reverse,
+             'cap_max': cap, 'n_lines': n}
+
+        if bidirect:
+            nodes, busd = ac.add_bidirectional_heatpipes(
+                hp_costs, d_labels, gd, q, b_in, b_out,
+                nodes, busd, epc_fix=epc_f)
+        else:
             nodes, busd = ac.add_heatpipes(
-                gd_infra['heatpipe_options'], d_labels, gd, q, b_in, b_out,
-                nodes, busd)
-
-        # connection energy generation site
-        if q['type'] == "GL":
-
-            if q['id_start'][:1] == "G":
-                start = q['id_start']
-                end = q['id_end']
-                b_in = busd[('generation', d_labels['l_2'], 'bus', start)]
-                b_out = busd[(d_labels['l_1'], d_labels['l_2'], 'bus', end)]
-
-            else:
-                start = q['id_end']
-                end = q['id_start']
-                b_in = busd[('generation', d_labels['l_2'], 'bus', start)]
-                b_out = busd[(d_labels['l_1'], d_labels['l_2'], 'bus', end)]
-
-            d_labels['l_4'] = start + '-' + end
-
-            nodes, busd = ac.add_heatpipes(
-                gd_infra['heatpipe_options'], d_labels, gd, q, b_in, b_out,
-                nodes, busd)
-
-        # connection of knots with 2 pipes in each direction since flow
-        # direction is unknown
-        if q['type'] == "DL":
-
-            start = q['id_start']
-            end = q['id_end']
-            b_in = busd[(d_labels['l_1'], d_labels['l_2'], 'bus', start)]
-            b_out = busd[(d_labels['l_1'], d_labels['l_2'], 'bus', end)]
-
-            d_labels['l_4'] = start + '-' + end
-
-            nodes, busd = ac.add_heatpipes(
-                gd_infra['heatpipe_options'], d_labels, gd, q, b_in, b_out,
-                nodes, busd)
-
-            start = q['id_end']
-            end = q['id_start']
-            b_in = busd[(d_labels['l_1'], d_labels['l_2'], 'bus', start)]
-            b_out = busd[(d_labels['l_1'], d_labels['l_2'], 'bus', end)]
-
-            d_labels['l_4'] = start + '-' + end
-
-            nodes, busd = ac.add_heatpipes(
-                gd_infra['heatpipe_options'], d_labels, gd, q, b_in, b_out,
-                nodes, busd)
+                hp_costs, d_labels, gd, q, b_in, b_out,
+                nodes, busd, epc_fix=epc_f)
 
     return nodes, busd
 
@@ -132,7 +190,8 @@ def add_nodes_dhs(geo_data, gd, gd_infra, nodes, busd):
 def add_nodes_houses(gd, data_objects, nodes, busd, label_1):
 
     ind_data = data_objects['individual_data']
-    series = data_objects['series_data']
+    # one shared array of the demand profiles for all houses
+    series = DemandProfiles(data_objects['series_data'])
     d_labels = {}
 
     for r, c in ind_data.iterrows():
@@ -140,11 +199,17 @@ def add_nodes_houses(gd, data_objects, nodes, busd, label_1):
         d_labels['l_1'] = label_1
         d_labels['l_4'] = c['id']
 
+        # aggregated houses (see topology.aggregate_houses)
+        general_data = data_objects['general_data']
+        n_houses = c.get('n_houses', 1)
+        if pd.notnull(n_houses) and n_houses != 1:
+            general_data = scale_house_data(general_data, n_houses)
+
         # add buses first, because other classes need to have them already
-        nodes, busd = ac.add_buses(data_objects['general_data']['bus'],
+        nodes, busd = ac.add_buses(general_data['bus'],
                                    d_labels, nodes, busd)
 
-        for key, item in data_objects['general_data'].items():
+        for key, item in general_data.items():
 
             # if key == 'bus':
             #     nodes, busd = ac.add_buses(item, d_labels, nodes, busd)
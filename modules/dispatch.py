@@ -0,0 +1,299 @@
+"""
+oemof application for research project quarree100.
+
+Dispatch of the district heating system with fixed capacities (e.g. the
+investments of a model of a short or aggregated horizon) over a long
+horizon, solved in overlapping windows (rolling horizon).
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import logging
+import numpy as np
+import pandas as pd
+import oemof.solph as solph
+import oemof.outputlib as outputlib
+from oemof.solph.components import GenericStorage
+
+from modules import oemof_heatpipe as oh
+from modules.pipeline import create_nodes
+from modules.results import extract_results
+from modules.solve import run_solver
+
+# blocks with investments of components (not of flows)
+COMPONENT_INVEST_BLOCKS = ['GenericInvestmentStorageBlock',
+                           'BidirectionalHeatPipelineBlock']
+
+# name of the storage level in the results of the storages (oemof 0.3: the
+# variable is indexed by the timesteps and is the level at the end of the
+# timestep)
+STORAGE_LEVEL = 'capacity'
+
+# names of the attributes of the storages (differ between the versions of
+# oemof)
+STORAGE_NOMINAL = ['nominal_storage_capacity', 'nominal_capacity']
+STORAGE_INITIAL = ['initial_storage_level', 'initial_capacity']
+
+
+def _storage_attr(n, names):
+    """Name of the first existing attribute of a storage."""
+    return next((a for a in names if hasattr(n, a)), names[-1])
+
+
+def fixed_capacities(om):
+    """
+    Capacities of a solved investment model, which can be used to fix the
+    capacities of a rebuilt energy system (see fix_investments).
+
+    :param om: solved solph.Model
+    :return: dict with 'flows' {(label string of input, label string of
+             output): capacity} and 'components' {label string: capacity}
+    """
+    flows = {}
+    # the block exists without variables, if there are no investment flows
+    if hasattr(getattr(om, 'InvestmentFlow', None), 'invest'):
+        for i, o in om.InvestmentFlow.invest:
+            flows[str(i.label), str(o.label)] = \
+                om.InvestmentFlow.invest[i, o].value or 0
+
+    components = {}
+    for name in COMPONENT_INVEST_BLOCKS:
+        block = getattr(om, name, None)
+        if block is None:
+            continue
+        for n in block.invest:
+            components[str(n.label)] = block.invest[n].value or 0
+
+    return {'flows': flows, 'components': components}
+
+
+def fix_investments(nodes, capacities, threshold=1e-6):
+    """
+    Replaces the investments of the nodes by the fixed capacities, so that
+    the heatpipes are modelled by the HeatPipelineBlock and the transformers
+    and storages by their blocks without investment.
+
+    :param nodes: list of nodes (before they are added to the energy system)
+    :param capacities: capacities of fixed_capacities
+    :param threshold: capacities below the threshold are set to zero
+    """
+    def cap(x):
+        return x if x > threshold else 0
+
+    for n in nodes:
+        label = str(n.label)
+
+        for flows, key in [(n.outputs, lambda o: (label, str(o.label))),
+                           (n.inputs, lambda i: (str(i.label), label))]:
+            for x, flow in flows.items():
+                if flow.investment is None:
+                    continue
+                flow.nominal_value = cap(capacities['flows'].get(key(x), 0))
+                flow.investment = None
+
+        if isinstance(n, oh.HeatPipeline):
+            n._invest_group = False
+            n._check_flows()
+            # input flow of pipes, which are not built
+            if all(f.nominal_value == 0 for f in n.outputs.values()):
+                for f in n.inputs.values():
+                    f.nominal_value = 0
+
+        elif isinstance(n, oh.BidirectionalHeatPipeline):
+            p = cap(capacities['components'].get(label, 0))
+            n.investment = solph.Investment(ep_costs=0, maximum=p, minimum=p)
+
+        elif isinstance(n, GenericStorage) and n.investment is not None:
+            setattr(n, _storage_attr(n, STORAGE_NOMINAL),
+                    cap(capacities['components'].get(label, 0)))
+            n.investment = None
+            n._invest_group = False
+
+
+def _window_data(input_data, start, length):
+    """Input data with the series of the timesteps of a window."""
+    data = dict(input_data)
+    for key in ['data_houses', 'data_generation']:
+        d = dict(input_data[key])
+        d['series_data'] = {
+            k: s.iloc[start:start + length].reset_index(drop=True)
+            for k, s in input_data[key]['series_data'].items()}
+        data[key] = d
+    return data
+
+
+def _storage_levels(results, nodes, t):
+    """Storage levels (as fraction of the capacity) at the start of
+    timestep t (t > 0)."""
+    levels = {}
+    for n in nodes:
+        nominal = getattr(n, _storage_attr(n, STORAGE_NOMINAL), None) \
+            if isinstance(n, GenericStorage) else None
+        if not nominal:
+            continue
+        seq = results[(n, None)]['sequences']
+        if STORAGE_LEVEL not in seq.columns:
+            raise ValueError(
+                'No storage level {!r} in the results of {}: the dispatch '
+                'supports the storages of oemof 0.3.'.format(STORAGE_LEVEL,
+                                                            n.label))
+        # level at the end of the timestep before t
+        levels[str(n.label)] = seq[STORAGE_LEVEL].iloc[t - 1] / nominal
+    return levels
+
+
+def _summed_max_flows(nodes):
+    """Flows with a limit of the summed flow {(input, output): flow}."""
+    flows = {}
+    for n in nodes:
+        for o, flow in n.outputs.items():
+            summed_max = getattr(flow, 'summed_max', None)
+            if summed_max is not None and np.isfinite(summed_max) and \
+                    flow.nominal_value:
+                flows[str(n.label), str(o.label)] = flow
+    return flows
+
+
+def _component_sequences(results, n_timesteps):
+    """Sequences of the components (e.g. storage level, heat loss)."""
+    columns = {}
+    for (a, b), res in results.items():
+        seq = res.get('sequences')
+        if b is not None or seq is None:
+            continue
+        for c in seq.columns:
+            columns[(str(a.label), c)] = seq[c].values[:n_timesteps]
+    return pd.DataFrame(columns)
+
+
+def rolling_dispatch(input_data, gd, capacities, window=168, overlap=24,
+                     n_timesteps=None, start='1/1/2018', initial_storage=0,
+                     split_summed_max='remaining', solver=None,
+                     solve_kwargs=None, **settings):
+    """
+    Solves the dispatch with fixed capacities in overlapping windows.
+
+    For each window, the energy system is rebuilt with the series of the
+    window and the fixed capacities and solved. Only the first window -
+    overlap timesteps are kept, the storage levels at the end of the kept
+    timesteps are the initial levels of the next window. Memory and solve
+    time per window are independent of the length of the horizon.
+
+    The summed_max limits of the flows hold for the whole horizon: the
+    energy of the kept timesteps is subtracted after each window, and each
+    window is limited by the remaining energy (or the share of its
+    timesteps, see split_summed_max).
+
+    :param input_data: input data of the full horizon (see
+                       input_data.load_input_data), same network as the
+                       investment model
+    :param gd: general data of the investment model
+    :param capacities: capacities of fixed_capacities
+    :param window: number of timesteps of each window
+    :param overlap: number of timesteps, which are solved again with the
+                    next window
+    :param n_timesteps: number of timesteps of the horizon (None: length of
+                        the heat demand series of the houses)
+    :param initial_storage: storage level of the first window (fraction)
+    :param split_summed_max: limit of the summed flow of each window:
+                             'remaining' - the remaining energy of the
+                             horizon, 'pro_rata' - the remaining energy
+                             split pro rata over the remaining timesteps
+                             (spreads the energy evenly, but can leave
+                             energy unused)
+    :param solver: name of solver (see solve.run_solver)
+    :param settings: uniform solver settings of run_solver
+    :return: dict with 'flows' (flow sequences, see
+             results.extract_results), 'components' (sequences of the
+             components, e.g. storage level and heat loss) and 'windows'
+             (solver info of each window)
+    """
+    if not 0 <= overlap < window:
+        raise ValueError('The overlap has to be smaller than the window.')
+
+    if split_summed_max not in ['remaining', 'pro_rata']:
+        raise ValueError('Unknown split of summed_max: {}'.format(
+            split_summed_max))
+
+    if n_timesteps is None:
+        n_timesteps = len(input_data['data_houses']['series_data']['heat'])
+
+    time_res = gd.get('time_res', 1)
+    freq = '{}min'.format(int(60 * time_res))
+    timeindex = pd.date_range(start, periods=n_timesteps, freq=freq)
+
+    flows = []
+    components = []
+    windows = []
+    storage = {}
+    # remaining energy of the flows with summed_max over the horizon
+    remaining = None
+
+    t0 = 0
+    while t0 < n_timesteps:
+        length = min(window, n_timesteps - t0)
+        last = t0 + length >= n_timesteps
+        keep = length if last else window - overlap
+
+        logging.info('Dispatch window %s - %s', t0, t0 + length)
+
+        # summed_max refers to the horizon of the dispatch, not to the
+        # (aggregated) horizon of the investment model
+        gd_w = dict(gd, num_ts=length, bound_capacity=False,
+                    f_summed_max=1)
+        nodes, busd = create_nodes(_window_data(input_data, t0, length),
+                                   gd_w)
+        fix_investments(nodes, capacities)
+
+        for n in nodes:
+            if isinstance(n, GenericStorage):
+                setattr(n, _storage_attr(n, STORAGE_INITIAL),
+                        storage.get(str(n.label), initial_storage))
+                n.balanced = False
+
+        # summed_max: remaining energy (share of the window)
+        limited = _summed_max_flows(nodes)
+        if remaining is None:
+            remaining = {k: f.summed_max * f.nominal_value
+                         for k, f in limited.items()}
+        share = 1 if split_summed_max == 'remaining' else \
+            length / (n_timesteps - t0)
+        for k, f in limited.items():
+            f.summed_max = max(remaining[k], 0) * share / f.nominal_value
+
+        esys = solph.EnergySystem(timeindex=timeindex[t0:t0 + length])
+        esys.add(*nodes)
+        om = solph.Model(esys)
+
+        info = run_solver(om, solver=solver, solve_kwargs=solve_kwargs,
+                          **settings)
+        info.pop('results', None)
+        info.update({'start': t0, 'timesteps': length})
+        windows.append(info)
+
+        results = outputlib.processing.results(om)
+        oh.add_heat_loss_results(om, results)
+
+        flows.append(extract_results(results)['flows'].iloc[:keep])
+        components.append(_component_sequences(results, keep).set_index(
+            timeindex[t0:t0 + keep]))
+        if not last:
+            storage = _storage_levels(results, nodes, keep)
+
+        for (i, o), res in results.items():
+            key = (str(i.label), None if o is None else str(o.label))
+            if key in limited:
+                remaining[key] -= \
+                    res['sequences']['flow'].iloc[:keep].sum() * time_res
+
+        del om, esys, results, nodes, busd
+        t0 += keep
+
+    return {'flows': pd.concat(flows),
+            'components': pd.concat(components, sort=False),
+            'windows': pd.DataFrame(windows)}
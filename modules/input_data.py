@@ -0,0 +1,272 @@
+"""
+oemof application for research project quarree100.
+
+Loading of the input data (qgis layers and excel workbooks) with a binary
+cache, so that unchanged sources are not parsed again on every run.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import hashlib
+import json
+import logging
+import os
+import uuid
+import pandas as pd
+
+try:
+    from simpledbf import Dbf5
+except ImportError:
+    Dbf5 = None
+    logging.info('Module simpledbf not found: qgis layers cannot be read.')
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+    feather = None
+    logging.info('Module pyarrow not found: Input cache falls back to pickle.')
+
+
+CACHE_DIR = os.path.join('data', '.cache')
+
+# sheets of the house and generation workbooks, which are used as general data
+GENERAL_SHEETS = {'bus': 'Buses',
+                  'source': 'Sources',
+                  'demand': 'Demand',
+                  'transformer': 'Transformer',
+                  'storages': 'Storages'}
+
+
+def _file_hash(path, blocksize=2**20):
+    """Returns the sha256 hex digest of the content of a file."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _source_key(path):
+    """Returns the cache key of a source file (based on its absolute path)."""
+    return hashlib.sha1(
+        os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+
+
+def _write_table(df, path):
+    """
+    Writes a DataFrame as uncompressed feather file, which can be memory
+    mapped on reading. Tables which can not be converted to arrow (e.g. mixed
+    types within one column) are pickled instead.
+
+    :return: file name of the written table
+    """
+    if feather is not None:
+        try:
+            feather.write_feather(df.reset_index(drop=True), path + '.feather',
+                                  compression='uncompressed')
+            return os.path.basename(path) + '.feather'
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            logging.debug('Feather cache not possible for %s: %s', path, e)
+
+    df.to_pickle(path + '.pkl')
+    return os.path.basename(path) + '.pkl'
+
+
+def _read_table(path):
+    """
+    Reads a table of _write_table. Feather files are memory mapped, so that
+    no read buffer is allocated, but the conversion to pandas still copies
+    the columns.
+    """
+    if path.endswith('.feather'):
+        return feather.read_table(path, memory_map=True).to_pandas()
+    return pd.read_pickle(path)
+
+
+def _write_json(obj, path):
+    """Writes a json file atomically (temporary file and rename), so that
+    parallel runs never read a partly written file."""
+    tmp = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+    with open(tmp, 'w') as f:
+        json.dump(obj, f, default=str)
+    os.replace(tmp, path)
+
+
+def _cached(path, parse, cache_dir):
+    """
+    Returns the tables of a source file either from the cache or by parsing
+    the file.
+
+    The cache entry of a source is identified by its path. It is valid, if
+    modification time and size of the source did not change, or - if they
+    changed - if the content hash is still the same.
+
+    :param path: path of source file
+    :param parse: function, which parses the source and returns a dict of
+                  DataFrames
+    :param cache_dir: directory of the cache
+    :return: dict of DataFrames
+    """
+    if cache_dir is None:
+        return parse()
+
+    os.makedirs(cache_dir, exist_ok=True)
+    key = _source_key(path)
+    path_meta = os.path.join(cache_dir, key + '.json')
+    stat = os.stat(path)
+
+    meta = None
+    if os.path.isfile(path_meta):
+        with open(path_meta) as f:
+            meta = json.load(f)
+
+    if meta is not None:
+        files_ok = all(os.path.isfile(os.path.join(cache_dir, x))
+                       for x in meta['tables'].values())
+        unchanged = (meta['mtime'] == stat.st_mtime and
+                     meta['size'] == stat.st_size)
+
+        if files_ok and not unchanged:
+            # file has been touched, check if the content has changed
+            if _file_hash(path) == meta['sha256']:
+                meta['mtime'] = stat.st_mtime
+                meta['size'] = stat.st_size
+                _write_json(meta, path_meta)
+                unchanged = True
+
+        if files_ok and unchanged:
+            logging.debug('Input cache hit: %s', path)
+            return {name: _read_table(os.path.join(cache_dir, x))
+                    for name, x in meta['tables'].items()}
+
+    logging.info('Parse input file: %s', path)
+    tables = parse()
+
+    meta = {'path': os.path.abspath(path),
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'sha256': _file_hash(path),
+            'tables': {}}
+
+    for i, (name, df) in enumerate(tables.items()):
+        meta['tables'][name] = _write_table(
+            df, os.path.join(cache_dir, key + '_' + str(i)))
+
+    _write_json(meta, path_meta)
+
+    return tables
+
+
+def _cached_reset(path, parse, cache_dir):
+    """Drops the cache entry of a source and parses it again."""
+    os.remove(os.path.join(cache_dir, _source_key(path) + '.json'))
+    return _cached(path, parse, cache_dir)
+
+
+def read_dbf(path, cache_dir=CACHE_DIR):
+    """
+    :param path: path of .dbf file (e.g. attribute table of a qgis layer)
+    :param cache_dir: directory of the cache (None: no caching)
+    :return: pd.DataFrame of attribute table
+    """
+    if Dbf5 is None:
+        raise ImportError('Module simpledbf is needed to read {}.'.format(
+            path))
+    return _cached(
+        path, lambda: {'table': Dbf5(path).to_dataframe()}, cache_dir)['table']
+
+
+def read_excel(path, sheets, cache_dir=CACHE_DIR):
+    """
+    :param path: path of excel workbook
+    :param sheets: list of sheet names
+    :param cache_dir: directory of the cache (None: no caching)
+    :return: dict of pd.DataFrame for each sheet
+    """
+    def parse():
+        xls = pd.ExcelFile(path)
+        return {s: xls.parse(s) for s in sheets}
+
+    tables = _cached(path, parse, cache_dir)
+
+    # the sheets might have been extended since the file has been cached
+    if not set(sheets).issubset(tables):
+        tables = _cached_reset(path, parse, cache_dir)
+
+    return {s: tables[s] for s in sheets}
+
+
+def clear_cache(cache_dir=CACHE_DIR):
+    """Removes all files of the input cache."""
+    if not os.path.isdir(cache_dir):
+        return
+    for f in os.listdir(cache_dir):
+        os.remove(os.path.join(cache_dir, f))
+
+
+def load_input_data(data_dir='data', cache_dir=CACHE_DIR,
+                    points='gis/Points_all_hombeer.dbf',
+                    lines='gis/Lines_all_hombeer.dbf',
+                    houses='data_houses.xlsx',
+                    timeseries='Timeseries_houses.xlsx',
+                    generation='data_generation.xlsx',
+                    heatpipes='data_heatpipes.xlsx'):
+    """
+    Loads all input data of the district heating optimization.
+
+    :param data_dir: base directory of the input files
+    :param cache_dir: directory of the cache (None: no caching)
+    :return: dict with 'qgis_data', 'data_houses', 'data_generation' and
+             'gd_infra', which are the inputs of add_nodes_dhs and
+             add_nodes_houses
+    """
+    def p(x):
+        return os.path.join(data_dir, x)
+
+    # infrastructure data
+    df_points = read_dbf(p(points), cache_dir=cache_dir)
+    df_lines = read_dbf(p(lines), cache_dir=cache_dir)
+
+    qgis_data = {'points': df_points,
+                 'lines': df_lines}
+
+    # house data
+    sheets = read_excel(p(houses), list(GENERAL_SHEETS.values()),
+                        cache_dir=cache_dir)
+    houses_general = {k: sheets[v] for k, v in GENERAL_SHEETS.items()}
+
+    houses_individual = df_points.loc[df_points['type'] == 'H']
+    houses_individual = houses_individual.reset_index(drop=True)
+
+    houses_series = read_excel(p(timeseries), ['heat'], cache_dir=cache_dir)
+
+    data_houses = {'general_data': houses_general,
+                   'individual_data': houses_individual,
+                   'series_data': houses_series}
+
+    # generation data
+    sheets = read_excel(p(generation), list(GENERAL_SHEETS.values()),
+                        cache_dir=cache_dir)
+    generation_general = {k: sheets[v] for k, v in GENERAL_SHEETS.items()}
+
+    generation_individual = df_points.loc[df_points['type'] == 'G']
+    generation_individual = generation_individual.reset_index(drop=True)
+
+    data_generation = {'general_data': generation_general,
+                       'individual_data': generation_individual,
+                       'series_data': {}}
+
+    gd_infra = {'heatpipe_options': read_excel(
+        p(heatpipes), ['Heatpipes'], cache_dir=cache_dir)['Heatpipes']}
+
+    return {'qgis_data': qgis_data,
+            'data_houses': data_houses,
+            'data_generation': data_generation,
+            'gd_infra': gd_infra}
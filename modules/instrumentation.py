@@ -0,0 +1,189 @@
+"""
+oemof application for research project quarree100.
+
+Instrumentation of the optimization pipeline: wall time and peak memory of
+each stage and the size of the optimization model, written as json report.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pyomo.environ import Block, Constraint, Var
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def _max_rss():
+    """Peak resident memory of the process [MB] (None if not available)."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux: kB, macOS: bytes
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def _reset_peak():
+    """Resets the peak of tracemalloc. Before python 3.9, the traces are
+    cleared instead, so that the peak is measured relative to the memory
+    allocated before the stage."""
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.clear_traces()
+
+
+def _count_block(block):
+    """Counts variables, binaries and constraints of a pyomo block."""
+    n_vars = 0
+    n_bin = 0
+    for v in block.component_data_objects(Var, active=True):
+        n_vars += 1
+        if v.is_binary():
+            n_bin += 1
+
+    n_cons = sum(1 for _ in block.component_data_objects(Constraint,
+                                                         active=True))
+
+    return {'variables': n_vars, 'binaries': n_bin, 'constraints': n_cons}
+
+
+def model_statistics(om):
+    """
+    Size of an oemof model.
+
+    :param om: solph.Model
+    :return: dict with the number of nodes (per type), flows, variables,
+             binaries and constraints (in total and per block)
+    """
+    nodes = Counter(type(n).__name__ for n in om.es.nodes)
+
+    stats = {'nodes': sum(nodes.values()),
+             'nodes_per_type': dict(nodes),
+             'flows': len(om.flows),
+             'timesteps': len(om.TIMESTEPS)}
+
+    stats.update(_count_block(om))
+
+    stats['blocks'] = {}
+    for block in om.component_objects(Block, descend_into=False):
+        stats['blocks'][block.local_name] = _count_block(block)
+
+    return stats
+
+
+class Report:
+    r"""Collects timing, memory and model size of the stages of a run.
+
+    Examples
+    --------
+    >>> report = Report()
+    >>> with report.stage('solph.Model'):
+    ...     om = solph.Model(esys)
+    >>> report.add_model(om)
+    >>> report.write('report.json')
+
+    Parameters
+    ----------
+    trace_memory : bool
+        Measure the peak memory of each stage with tracemalloc (slows down
+        the run). Otherwise, only the peak memory of the process (over its
+        lifetime, 'process_max_rss_mb') and its increase during the stage
+        ('max_rss_increase_mb') are recorded.
+    """
+
+    def __init__(self, trace_memory=False, **meta):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.model = None
+        self._running = []
+        self.meta = {'created': datetime.now().isoformat(),
+                     'python': platform.python_version(),
+                     'platform': platform.platform()}
+        self.meta.update(meta)
+
+    def start(self, name, **info):
+        """Starts the measurement of a stage (see also stage). Stages can be
+        nested, their entries record the enclosing stage ('parent') and the
+        nesting level ('depth', 0 for top-level stages)."""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if self._running:
+                # keep the peak of the enclosing stage before the reset
+                outer = self._running[-1]
+                outer['peak'] = max(outer['peak'],
+                                    tracemalloc.get_traced_memory()[1])
+            _reset_peak()
+
+        parent = self._running[-1]['name'] if self._running else None
+        self._running.append({'name': name, 'info': info,
+                              'parent': parent, 'depth': len(self._running),
+                              't0': time.perf_counter(),
+                              'max_rss': _max_rss(), 'peak': 0})
+
+    def stop(self):
+        """Stops the measurement of the current (innermost) stage."""
+        current = self._running.pop()
+        max_rss = _max_rss()
+
+        entry = {'stage': current['name'],
+                 'parent': current['parent'],
+                 'depth': current['depth'],
+                 'wall_time': time.perf_counter() - current['t0'],
+                 'process_max_rss_mb': max_rss,
+                 'max_rss_increase_mb': None if max_rss is None else
+                 max_rss - current['max_rss']}
+
+        if self.trace_memory:
+            peak = max(current['peak'], tracemalloc.get_traced_memory()[1])
+            if self._running:
+                outer = self._running[-1]
+                outer['peak'] = max(outer['peak'], peak)
+            entry['peak_traced_mb'] = peak / 1024 ** 2
+
+        entry.update(current['info'])
+        self.stages.append(entry)
+
+        logging.info('Stage %s: %.2f s', current['name'], entry['wall_time'])
+
+    @contextmanager
+    def stage(self, name, **info):
+        """Measures wall time and memory of the enclosed code."""
+        self.start(name, **info)
+        try:
+            yield
+        finally:
+            self.stop()
+
+    def add_model(self, om):
+        """Adds the size of the model to the report."""
+        self.model = model_statistics(om)
+
+    def to_dict(self):
+        # the time of nested stages is part of their enclosing stage
+        return {'meta': self.meta,
+                'stages': self.stages,
+                'total_time': sum(s['wall_time'] for s in self.stages
+                                  if s['depth'] == 0),
+                'model': self.model}
+
+    def write(self, path):
+        """Writes the report as json file."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
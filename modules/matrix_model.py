@@ -0,0 +1,594 @@
+"""
+oemof application for research project quarree100.
+
+Alternative back end, which builds the linear program of the node list
+directly as sparse matrix (without pyomo expressions). The problem can be
+written as MPS file or solved in-process with HiGHS (via scipy).
+
+Supported are the components and flow attributes, which are created by
+add_components: Bus, Source, Sink, Transformer, GenericStorage,
+HeatPipeline and BidirectionalHeatPipeline; flows with nominal_value, min,
+max, fixed/actual_value, summed_max, variable_costs and investment
+(including nonconvex investments with offset).
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import logging
+import time
+import numpy as np
+import pandas as pd
+from oemof.solph.network import Bus, Sink, Source, Transformer
+from oemof.solph.components import GenericStorage
+from oemof.solph.plumbing import _Sequence
+
+from modules import oemof_heatpipe as oh
+from modules.results import LABEL_FIELDS, _label_fields, label_index
+
+try:
+    import scipy.sparse as sp
+    from scipy.optimize import Bounds, LinearConstraint, milp
+except ImportError:
+    sp = None
+    logging.info('Module scipy not found: MatrixModel not available.')
+
+
+def _values(seq, n):
+    """Values of an oemof sequence (or scalar) for n timesteps (nan for
+    None)."""
+    if isinstance(seq, _Sequence):
+        seq = seq.default
+    if seq is None:
+        return np.full(n, np.nan)
+    if np.isscalar(seq):
+        return np.full(n, float(seq))
+    return np.asarray(seq, dtype=float)[:n]
+
+
+def _scalar(x):
+    """Scalar parameter, None for None, nan and inf."""
+    if x is None:
+        return None
+    x = float(x)
+    return None if np.isnan(x) or np.isinf(x) else x
+
+
+def _attr(n, names, default=None):
+    """First existing attribute of a node (names differ between the versions
+    of oemof)."""
+    for name in names:
+        if hasattr(n, name):
+            return getattr(n, name)
+    return default
+
+
+def _names(prefix, index):
+    """Names of rows or columns (prefix and index) as string array."""
+    return np.char.add(prefix, np.asarray(index).astype(str))
+
+
+def _numbers(values):
+    """Numbers as string array (round trip precision)."""
+    return np.char.mod('%.17g', np.asarray(values, dtype=float))
+
+
+def _lines(*parts):
+    """Concatenates strings and string arrays element-wise."""
+    parts = [p if isinstance(p, str) else np.asarray(p, dtype=str)
+             for p in parts]
+    line = parts[0]
+    for p in parts[1:]:
+        line = np.char.add(line, p)
+    return np.atleast_1d(line)
+
+
+def _write(f, lines):
+    """Writes a string array as lines."""
+    if len(lines):
+        f.write('\n'.join(lines.tolist()))
+        f.write('\n')
+
+
+def _check_flow(a, b, f, n):
+    """Raises NotImplementedError for flow attributes, which are not part of
+    the matrix model (instead of silently dropping their constraints)."""
+    unsupported = []
+    if getattr(f, 'nonconvex', None) is not None:
+        unsupported.append('nonconvex')
+    if getattr(f, 'integer', None):
+        unsupported.append('integer')
+    if _scalar(getattr(f, 'summed_min', None)):
+        unsupported.append('summed_min')
+    for name in ['positive_gradient', 'negative_gradient']:
+        gradient = getattr(f, name, None) or {}
+        if not np.isnan(_values(gradient.get('ub'), n)).all():
+            unsupported.append(name)
+    if f.investment is not None:
+        if _scalar(getattr(f.investment, 'existing', 0)):
+            unsupported.append('investment.existing')
+        if np.nan_to_num(_values(f.min, n)).any():
+            unsupported.append('min of an investment flow')
+    if unsupported:
+        raise NotImplementedError(
+            'Flow {} -> {}: {} not supported by the matrix model.'.format(
+                a.label, b.label, ', '.join(unsupported)))
+
+
+class MatrixModel:
+    r"""Linear program of an oemof node list as sparse matrix.
+
+    Examples
+    --------
+    >>> nodes, busd = pipeline.create_nodes(input_data, gd)
+    >>> mm = MatrixModel(nodes, gd['num_ts'])
+    >>> mm.write_mps('model.mps')
+    >>> info = mm.solve(time_limit=600)
+    >>> res = mm.results()
+
+    Parameters
+    ----------
+    nodes : list
+        Nodes of the energy system.
+    n_timesteps : int
+        Number of timesteps.
+    objective_weighting : array
+        Weights of the timesteps in the objective (default: 1).
+    timeincrement : float
+        Length of the timesteps [h] (summed_max, storages).
+    """
+
+    def __init__(self, nodes, n_timesteps, objective_weighting=None,
+                 timeincrement=1):
+        if sp is None:
+            raise ImportError('MatrixModel needs scipy.')
+
+        self.nodes = list(nodes)
+        self.T = n_timesteps
+        self.weights = np.ones(n_timesteps) if objective_weighting is None \
+            else np.asarray(objective_weighting, dtype=float)[:n_timesteps]
+        self.dt = timeincrement
+
+        # columns
+        self._lb, self._ub, self._cost, self._int = [], [], [], []
+        self.n_cols = 0
+        # rows (coordinate format)
+        self._r, self._c, self._v, self._lo, self._up = [], [], [], [], []
+        self.n_rows = 0
+
+        self.flows = {}     # (a, b): first column
+        self.invest = {}    # (a, b) or (n, None): column of investment
+        self.status = {}    # (a, b) or (n, None): column of binary
+        self.levels = {}    # storage: first column of storage level
+        self.x = None
+
+        t0 = time.perf_counter()
+        self._build()
+        self.A = sp.csr_matrix(
+            (np.concatenate(self._v), (np.concatenate(self._r),
+                                       np.concatenate(self._c))),
+            shape=(self.n_rows, self.n_cols))
+        self.lb = np.concatenate(self._lb)
+        self.ub = np.concatenate(self._ub)
+        self.c = np.concatenate(self._cost)
+        self.integrality = np.concatenate(self._int)
+        self.row_lo = np.concatenate(self._lo)
+        self.row_up = np.concatenate(self._up)
+        del self._r, self._c, self._v
+
+        logging.info('Matrix model: %s columns, %s rows, %s nonzeros '
+                     '(%.2f s)', self.n_cols, self.n_rows, self.A.nnz,
+                     time.perf_counter() - t0)
+
+    # ------------------------------------------------------------------
+    # building blocks
+
+    def _add_cols(self, n, lb=0, ub=np.inf, cost=0, integer=False):
+        """Adds n columns and returns the index of the first column."""
+        self._lb.append(np.broadcast_to(np.asarray(lb, float), n).copy())
+        self._ub.append(np.broadcast_to(np.asarray(ub, float), n).copy())
+        self._cost.append(np.broadcast_to(np.asarray(cost, float), n).copy())
+        self._int.append(np.full(n, int(integer)))
+        first = self.n_cols
+        self.n_cols += n
+        return first
+
+    def _add_rows(self, terms, lo, up, n=None):
+        """
+        Adds n rows (default: one row per timestep).
+
+        :param terms: list of (columns, coefficients) - arrays of length n
+                      (or scalars, which are broadcast)
+        :param lo: lower bounds of the rows
+        :param up: upper bounds of the rows
+        :return: index of the first row
+        """
+        n = self.T if n is None else n
+        rows = self.n_rows + np.arange(n)
+        for cols, coefs in terms:
+            self._r.append(rows)
+            self._c.append(np.broadcast_to(np.asarray(cols), n).astype(int))
+            self._v.append(np.broadcast_to(np.asarray(coefs, float), n)
+                           .copy())
+        self._lo.append(np.broadcast_to(np.asarray(lo, float), n).copy())
+        self._up.append(np.broadcast_to(np.asarray(up, float), n).copy())
+        first = self.n_rows
+        self.n_rows += n
+        return first
+
+    def _col(self, a, b):
+        """Columns of a flow for all timesteps."""
+        return self.flows[a, b] + np.arange(self.T)
+
+    def _add_investment(self, key, inv):
+        """Investment (and binary) variable and their constraints."""
+        maximum = _scalar(inv.maximum)
+        minimum = _scalar(inv.minimum) or 0
+        nonconvex = getattr(inv, 'nonconvex', False)
+
+        if nonconvex:
+            if maximum is None:
+                raise ValueError('Nonconvex investment of {} needs a '
+                                 'maximum.'.format(key))
+            v = self._add_cols(1, 0, maximum, inv.ep_costs)
+            y = self._add_cols(1, 0, 1, getattr(inv, 'offset', 0) or 0,
+                               integer=True)
+            self._add_rows([(v, 1), (y, -maximum)], -np.inf, 0, n=1)
+            self._add_rows([(v, 1), (y, -minimum)], 0, np.inf, n=1)
+            self.status[key] = y
+        else:
+            v = self._add_cols(1, minimum,
+                               np.inf if maximum is None else maximum,
+                               inv.ep_costs)
+
+        self.invest[key] = v
+        return v
+
+    # ------------------------------------------------------------------
+    # model
+
+    def _build(self):
+        T = self.T
+
+        # flow variables
+        for a in self.nodes:
+            for b, f in a.outputs.items():
+                _check_flow(a, b, f, T)
+
+                cost = np.nan_to_num(_values(f.variable_costs, T)) * \
+                    self.weights
+                lb, ub = 0, np.inf
+                nominal = _scalar(f.nominal_value)
+                fixed = getattr(f, 'fixed', False)
+                actual = _values(f.actual_value, T)
+                f_max = np.nan_to_num(_values(f.max, T), nan=1)
+                f_min = np.nan_to_num(_values(f.min, T))
+
+                if f.investment is None and nominal is not None:
+                    if fixed:
+                        lb = ub = actual * nominal
+                    else:
+                        lb, ub = f_min * nominal, f_max * nominal
+
+                self.flows[a, b] = self._add_cols(T, lb, ub, cost)
+                col = self._col(a, b)
+
+                summed_max = _scalar(getattr(f, 'summed_max', None))
+
+                if f.investment is not None:
+                    v = self._add_investment((a, b), f.investment)
+                    if fixed:
+                        self._add_rows([(col, 1), (v, -actual)], 0, 0)
+                    else:
+                        self._add_rows([(col, 1), (v, -f_max)], -np.inf, 0)
+                    if summed_max is not None:
+                        self._sum_row(col, self.dt, [(v, -summed_max)],
+                                      -np.inf, 0)
+                elif summed_max is not None and nominal is not None:
+                    self._sum_row(col, self.dt, [], -np.inf,
+                                  summed_max * nominal)
+
+        for n in self.nodes:
+            if isinstance(n, Bus):
+                self._bus(n)
+            elif isinstance(n, oh.HeatPipeline):
+                self._heatpipe(n)
+            elif isinstance(n, oh.BidirectionalHeatPipeline):
+                self._bidirectional_heatpipe(n)
+            elif isinstance(n, GenericStorage):
+                self._storage(n)
+            elif isinstance(n, Transformer):
+                self._transformer(n)
+            elif not isinstance(n, (Source, Sink)):
+                raise NotImplementedError(
+                    'Component {} is not supported.'.format(type(n).__name__))
+
+    def _sum_row(self, cols, coef, terms, lo, up):
+        """One row with the sum of the columns times coef plus terms."""
+        row = self.n_rows
+        self._r.append(np.full(len(cols) + len(terms), row))
+        self._c.append(np.concatenate([cols, [c for c, v in terms]])
+                       .astype(int))
+        self._v.append(np.concatenate([np.full(len(cols), coef),
+                                       [v for c, v in terms]]))
+        self._lo.append(np.array([lo], float))
+        self._up.append(np.array([up], float))
+        self.n_rows += 1
+
+    def _bus(self, n):
+        terms = [(self._col(i, n), 1) for i in n.inputs] + \
+                [(self._col(n, o), -1) for o in n.outputs]
+        self._add_rows(terms, 0, 0)
+
+    def _transformer(self, n):
+        for o in n.outputs:
+            for i in n.inputs:
+                c_o = _values(n.conversion_factors[o], self.T)
+                c_i = _values(n.conversion_factors[i], self.T)
+                self._add_rows([(self._col(i, n), c_o),
+                                (self._col(n, o), -c_i)], 0, 0)
+
+    def _heatpipe(self, n):
+        data = oh._pipe_data([n], range(self.T))
+        i, o, ratio, loss = data[n]
+        ratio, loss = np.asarray(ratio), np.asarray(loss)
+        terms = [(self._col(i, n), ratio), (self._col(n, o), -1)]
+
+        if (n, o) in self.invest:
+            terms.append((np.full(self.T, self.invest[n, o]), -loss))
+            self._add_rows(terms, 0, 0)
+        else:
+            rhs = loss * n.outputs[o].nominal_value
+            self._add_rows(terms, rhs, rhs)
+
+    def _bidirectional_heatpipe(self, n):
+        a, b = n.buses
+        v = self._add_investment((n, None), n.investment)
+        loss = _values(n.heat_loss_factor, self.T) * n.length
+        vv = np.full(self.T, v)
+
+        self._add_rows([(self._col(a, n), 1), (self._col(b, n), 1),
+                        (self._col(n, a), -1), (self._col(n, b), -1),
+                        (vv, -loss)], 0, 0)
+        self._add_rows([(self._col(n, a), 1), (self._col(n, b), 1),
+                        (vv, -1)], -np.inf, 0)
+
+    def _storage(self, n):
+        T = self.T
+        i = next(iter(n.inputs))
+        o = next(iter(n.outputs))
+
+        loss = np.nan_to_num(_values(
+            _attr(n, ['loss_rate', 'capacity_loss'], 0), T))
+        eta_in = _values(n.inflow_conversion_factor, T)
+        eta_out = _values(n.outflow_conversion_factor, T)
+        s_min = np.nan_to_num(_values(
+            _attr(n, ['min_storage_level', 'capacity_min'], 0), T))
+        s_max = np.nan_to_num(_values(
+            _attr(n, ['max_storage_level', 'capacity_max'], 1), T), nan=1)
+        initial = _scalar(_attr(n, ['initial_storage_level',
+                                    'initial_capacity']))
+        balanced = getattr(n, 'balanced', True)
+
+        invest = getattr(n, 'investment', None)
+        if invest is not None:
+            level = self._add_cols(T)
+            v = self._add_investment((n, None), invest)
+            vv = np.full(T, v)
+            cols = level + np.arange(T)
+            self._add_rows([(cols, 1), (vv, -s_max)], -np.inf, 0)
+            self._add_rows([(cols, 1), (vv, -s_min)], 0, np.inf)
+
+            # investment of the flows relative to the storage capacity
+            for key, rel in [((i, n), n.invest_relation_input_capacity),
+                             ((n, o), n.invest_relation_output_capacity)]:
+                rel = _scalar(rel)
+                if rel is not None and key in self.invest:
+                    self._add_rows([(self.invest[key], 1), (v, -rel)], 0, 0,
+                                   n=1)
+            # initial level: initial * invest
+            s0 = None if initial is None else [(v, -initial)]
+        else:
+            nominal = _scalar(_attr(n, ['nominal_storage_capacity',
+                                        'nominal_capacity'])) or 0
+            level = self._add_cols(T, s_min * nominal, s_max * nominal)
+            cols = level + np.arange(T)
+            # initial level as constant
+            s0 = None if initial is None else initial * nominal
+
+        self.levels[n] = level
+
+        # balance: s(t) - (1 - loss) s(t-1) - eta_in dt in + dt / eta_out out
+        flow_terms = [(self._col(i, n), -eta_in * self.dt),
+                      (self._col(n, o), self.dt / eta_out)]
+        if T > 1:
+            self._add_rows([(cols[1:], 1), (cols[:-1], -(1 - loss[1:]))] +
+                           [(c[1:], f[1:]) for c, f in flow_terms],
+                           0, 0, n=T - 1)
+
+        # first timestep: from the initial level or the last level (cyclic)
+        first = [(c[0], f[0]) for c, f in flow_terms] + [(cols[0], 1)]
+        if s0 is None:
+            self._add_rows(first + [(cols[-1], -(1 - loss[0]))], 0, 0, n=1)
+        elif invest is not None:
+            self._add_rows(first + [(c, k * (1 - loss[0])) for c, k in s0],
+                           0, 0, n=1)
+            if balanced:
+                self._add_rows([(cols[-1], 1)] + s0, 0, 0, n=1)
+        else:
+            self._add_rows(first, s0 * (1 - loss[0]), s0 * (1 - loss[0]),
+                           n=1)
+            if balanced:
+                self._add_rows([(cols[-1], 1)], s0, s0, n=1)
+
+    # ------------------------------------------------------------------
+    # solve and output
+
+    def statistics(self):
+        """Size of the model (see instrumentation.model_statistics)."""
+        return {'nodes': len(self.nodes),
+                'flows': len(self.flows),
+                'timesteps': self.T,
+                'variables': self.n_cols,
+                'binaries': int(self.integrality.sum()),
+                'constraints': self.n_rows,
+                'nonzeros': int(self.A.nnz)}
+
+    def solve(self, time_limit=None, mip_gap=None, node_limit=None,
+              disp=False):
+        """
+        Solves the problem with HiGHS (scipy.optimize.milp).
+
+        :return: dict with 'status', 'termination', 'objective', 'bound'
+                 and 'wall_time'
+        """
+        options = {'disp': disp}
+        if time_limit is not None:
+            options['time_limit'] = time_limit
+        if mip_gap is not None:
+            options['mip_rel_gap'] = mip_gap
+        if node_limit is not None:
+            options['node_limit'] = node_limit
+
+        t0 = time.perf_counter()
+        res = milp(self.c, integrality=self.integrality,
+                   bounds=Bounds(self.lb, self.ub),
+                   constraints=LinearConstraint(self.A, self.row_lo,
+                                                self.row_up),
+                   options=options)
+        wall_time = time.perf_counter() - t0
+
+        self.x = res.x
+        if res.status != 0:
+            logging.warning('Matrix model: %s', res.message)
+
+        return {'solver': 'highs',
+                'status': int(res.status),
+                'termination': res.message,
+                'objective': None if res.x is None else float(res.fun),
+                'bound': getattr(res, 'mip_dual_bound', None),
+                'wall_time': wall_time}
+
+    def write_mps(self, path):
+        """
+        Writes the problem as free MPS file. The lines are formatted with
+        vectorised string operations, the integer columns are written in
+        one marker block after the continuous columns.
+        """
+        A = self.A.tocsc()
+        lo, up = self.row_lo, self.row_up
+        integer = self.integrality.astype(bool)
+
+        row_type = np.where(lo == up, 'E',
+                            np.where(np.isinf(lo), 'L',
+                                     np.where(np.isinf(up), 'G', 'R')))
+
+        # columns: objective and matrix entries, grouped by column
+        obj = np.flatnonzero(self.c)
+        cols = np.concatenate([
+            obj, np.repeat(np.arange(self.n_cols), np.diff(A.indptr))])
+        rows = np.concatenate([
+            np.full(len(obj), 'obj'), _names('r', A.indices)])
+        values = np.concatenate([self.c[obj], A.data])
+        order = np.lexsort((cols, integer[cols]))
+        n_cont = int((~integer[cols]).sum())
+        entries = _lines(' ', _names('x', cols[order]), ' ', rows[order],
+                         ' ', _numbers(values[order]))
+
+        rhs = np.where(row_type == 'L', up, lo)
+        k_rhs = np.flatnonzero(rhs)
+        ranged = np.flatnonzero(row_type == 'R')
+
+        lb, ub = self.lb, self.ub
+        binary = integer & (lb == 0) & (ub == 1)
+        fixed = ~binary & (lb == ub)
+        other = ~binary & ~fixed
+        k_lo = np.flatnonzero(other & (lb != 0) & np.isfinite(lb))
+        k_mi = np.flatnonzero(other & np.isneginf(lb))
+        k_up = np.flatnonzero(other & np.isfinite(ub))
+        k_bv = np.flatnonzero(binary)
+        k_fx = np.flatnonzero(fixed)
+
+        with open(path, 'w') as f:
+            f.write('NAME oemof\nROWS\n N obj\n')
+            _write(f, _lines(' ', np.where(row_type == 'R', 'G', row_type),
+                             ' ', _names('r', np.arange(self.n_rows))))
+
+            f.write('COLUMNS\n')
+            _write(f, entries[:n_cont])
+            if n_cont < len(entries):
+                f.write(" MARKER 'MARKER' 'INTORG'\n")
+                _write(f, entries[n_cont:])
+                f.write(" MARKER 'MARKER' 'INTEND'\n")
+
+            f.write('RHS\n')
+            _write(f, _lines(' rhs ', _names('r', k_rhs), ' ',
+                             _numbers(rhs[k_rhs])))
+
+            if len(ranged):
+                f.write('RANGES\n')
+                _write(f, _lines(' rng ', _names('r', ranged), ' ',
+                                 _numbers(up[ranged] - lo[ranged])))
+
+            f.write('BOUNDS\n')
+            _write(f, _lines(' BV bnd ', _names('x', k_bv)))
+            _write(f, _lines(' FX bnd ', _names('x', k_fx), ' ',
+                             _numbers(lb[k_fx])))
+            _write(f, _lines(' LO bnd ', _names('x', k_lo), ' ',
+                             _numbers(lb[k_lo])))
+            _write(f, _lines(' MI bnd ', _names('x', k_mi)))
+            _write(f, _lines(' UP bnd ', _names('x', k_up), ' ',
+                             _numbers(ub[k_up])))
+            f.write('ENDATA\n')
+
+    def results(self, timeindex=None):
+        """
+        Solution mapped to the labels of the nodes, in the structure of
+        results.extract_results.
+
+        :param timeindex: index of the flow sequences (default: RangeIndex)
+        :return: dict with 'invest' and 'flows'
+        """
+        if self.x is None:
+            raise ValueError('The model has not been solved.')
+
+        invest_index, invest_rows = [], []
+        for (a, b), v in self.invest.items():
+            if b is None:
+                component, bus = a, None
+            elif isinstance(a, Bus):
+                component, bus = b, a
+            else:
+                component, bus = a, b
+            invest_index.append(_label_fields(component))
+            invest_rows.append((float(self.x[v]), type(component).__name__,
+                                None if bus is None else str(bus.label),
+                                getattr(component, 'line', None),
+                                getattr(component, 'reverse', None),
+                                getattr(component.label, 'id', -1)))
+
+        invest = pd.DataFrame(
+            invest_rows, columns=['invest', 'type', 'bus', 'line', 'reverse',
+                                  'id'],
+            index=label_index(invest_index))
+
+        columns = []
+        first = []
+        for (a, b), col in self.flows.items():
+            if isinstance(a, Bus):
+                columns.append(_label_fields(b) + ('in', str(a.label)))
+            else:
+                columns.append(_label_fields(a) + ('out', str(b.label)))
+            first.append(col)
+
+        # all flows have T consecutive columns
+        cols = np.asarray(first)[None, :] + np.arange(self.T)[:, None]
+        flows = pd.DataFrame(self.x[cols], index=timeindex)
+        flows.columns = pd.MultiIndex.from_tuples(
+            columns, names=LABEL_FIELDS + ['direction', 'bus'])
+
+        return {'invest': invest, 'flows': flows}
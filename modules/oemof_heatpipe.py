@@ -11,22 +11,205 @@ __copyright__ = "oemof developer group"
 __license__ = "GPLv3"
 
 from pyomo.core.base.block import SimpleBlock
+from pyomo.core.expr.numeric_expr import LinearExpression
 from pyomo.environ import (Binary, Set, NonNegativeReals, Var, Constraint,
-                           Expression, BuildAction)
+                           Expression, BuildAction, Param)
+import functools
+import itertools
 import logging
+import weakref
+import numpy as np
+import pandas as pd
 
 from oemof.solph.network import Bus, Transformer
-from oemof.solph.plumbing import sequence
+from oemof.solph.plumbing import sequence, _Sequence
 from oemof.solph import Investment
-from collections import namedtuple
 
 
-class Label(namedtuple('solph_label', ['tag1', 'tag2', 'tag3', 'tag4'])):
-    __slots__ = ()
+class LabelRegistry:
+    r"""Registry of the interned labels.
+
+    Each label exists once as long as it is referenced (e.g. by the nodes of
+    an energy system). It keeps its string and its hash and gets an integer
+    id, which is unique within the process. The registry holds weak
+    references only, so that the labels of finished models (e.g. in
+    scenario workers) are freed.
+
+    Examples
+    --------
+    >>> label = Label('house', 'heat', 'bus', 'H1')
+    >>> LABELS[label.id] is label
+    True
+    """
+
+    def __init__(self):
+        self._index = weakref.WeakValueDictionary()
+        self._ids = weakref.WeakValueDictionary()
+        self._count = itertools.count()
+
+    def get(self, key):
+        """Returns the interned label of a tuple of tags (or None)."""
+        return self._index.get(key)
+
+    def add(self, label):
+        """Adds a label and returns its id."""
+        i = next(self._count)
+        self._index[tuple(label)] = label
+        self._ids[i] = label
+        return i
+
+    def ids(self, labels):
+        """Returns the ids of the given labels as array."""
+        return np.fromiter((self._index[tuple(l)].id for l in labels),
+                           dtype=int)
+
+    def strings(self, ids=None):
+        """Returns the label strings (of the given ids) as array."""
+        labels = self._ids.values() if ids is None else \
+            [self._ids[i] for i in ids]
+        return np.array([str(l) for l in labels], dtype=object)
+
+    def clear(self):
+        """Removes all labels from the registry. The ids stay unique, but
+        labels created afterwards are not the same objects as equal labels
+        created before (they are still equal)."""
+        self._index.clear()
+        self._ids.clear()
+
+    def __getitem__(self, i):
+        return self._ids[i]
+
+    def __len__(self):
+        return len(self._index)
+
+
+LABELS = LabelRegistry()
+
+
+@functools.total_ordering
+class Label:
+    """Label of the oemof nodes.
+
+    The labels are interned in LABELS: equal labels are the same object,
+    the string (used by solph as ID) and the hash are computed once and
+    each label has an integer id. Labels compare and hash like tuples of
+    the four tags, so that e.g. the bus dict can be accessed with tuples.
+    """
+
+    __slots__ = ('tag1', 'tag2', 'tag3', 'tag4', '_hash', '_str', 'id',
+                 '__weakref__')
+    _fields = ('tag1', 'tag2', 'tag3', 'tag4')
+
+    def __new__(cls, tag1, tag2, tag3, tag4):
+        key = (tag1, tag2, tag3, tag4)
+        label = LABELS.get(key)
+        if label is None:
+            label = super().__new__(cls)
+            for name, value in zip(cls._fields, key):
+                object.__setattr__(label, name, value)
+            object.__setattr__(label, '_hash', hash(key))
+            object.__setattr__(label, '_str', '_'.join(map(str, key)))
+            object.__setattr__(label, 'id', LABELS.add(label))
+        return label
+
+    @classmethod
+    def _make(cls, iterable):
+        return cls(*iterable)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Labels are immutable.')
+
+    def __reduce__(self):
+        # interned again on unpickling (e.g. in worker processes)
+        return self.__class__, tuple(self)
+
+    def __iter__(self):
+        return iter((self.tag1, self.tag2, self.tag3, self.tag4))
+
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self)[i]
+        return getattr(self, self._fields[i])
+
+    def __eq__(self, other):
+        if other is self:
+            return True
+        if isinstance(other, (Label, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, (Label, tuple)):
+            return tuple(self) < tuple(other)
+        return NotImplemented
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return 'Label(tag1={!r}, tag2={!r}, tag3={!r}, tag4={!r})'.format(
+            *self)
 
     def __str__(self):
         """The string is used within solph as an ID, so it hast to be unique"""
-        return '_'.join(map(str, self._asdict().values()))
+        return self._str
+
+
+def _values(seq, timesteps):
+    """Returns the values of an oemof sequence for all timesteps as list."""
+    if isinstance(seq, _Sequence):
+        return [seq.default] * len(timesteps)
+    return np.asarray(seq, dtype=float)[np.asarray(timesteps)].tolist()
+
+
+def _pipe_data(group, timesteps):
+    """
+    Collects input node, output node, ratio of the conversion factors and
+    heat loss factor times length of all heatpipes of a group once, so that
+    the constraint rules do not have to look them up per timestep.
+
+    Returns
+    -------
+    dict : {heatpipe: (input node, output node, ratio list, loss list)}
+    """
+    timesteps = list(timesteps)
+    data = {}
+    for n in group:
+        i = next(iter(n.inputs))
+        o = next(iter(n.outputs))
+        ratio = (np.asarray(_values(n.conversion_factors[o], timesteps)) /
+                 np.asarray(_values(n.conversion_factors[i], timesteps)))
+        loss = np.asarray(_values(n.heat_loss_factor, timesteps)) * n.length
+        data[n] = (i, o, ratio.tolist(), loss.tolist())
+    return data
+
+
+def _mutable_loss(block, group, m):
+    """
+    Creates the heat loss factors of the heatpipes with constant factor as
+    mutable parameter `heat_loss_factor` of the block, if the model has been
+    built with `mutable_parameters` (see persistent.ParametricModel). The
+    factors can then be changed without rebuilding the constraints.
+
+    Returns
+    -------
+    dict : {heatpipe: heat loss factor times length for all timesteps}
+    """
+    if not getattr(m, 'mutable_parameters', False):
+        return {}
+
+    pipes = [n for n in group if isinstance(n.heat_loss_factor, _Sequence)]
+    block.MUTABLELOSSPIPES = Set(initialize=pipes)
+    block.heat_loss_factor = Param(
+        block.MUTABLELOSSPIPES, mutable=True,
+        initialize={n: n.heat_loss_factor.default for n in pipes})
+
+    n_timesteps = len(m.TIMESTEPS)
+    return {n: [block.heat_loss_factor[n] * n.length] * n_timesteps
+            for n in pipes}
 
 
 class HeatPipeline(Transformer):
@@ -43,6 +226,16 @@ class HeatPipeline(Transformer):
     heat_loss_factor : float
         Heat loss per length unit as fraction of the nominal power. Can also be
         defined by a series.
+    compact : bool
+        If True, no heat loss variable and equation are created. The heat
+        loss is inserted into the relation of input and output flow instead.
+        Use :py:func:`add_heat_loss_results` to obtain the heat loss in the
+        processed results. Default: False.
+    line : int
+        Id of the line of the line layer, which is represented by the
+        HeatPipeline (used to map the results onto the line layer).
+    reverse : bool
+        The HeatPipeline is orientated from id_end to id_start of the line.
 
     See also :py:class:`~oemof.solph.network.Transformer`.
 
@@ -68,6 +261,9 @@ class HeatPipeline(Transformer):
 
         self.length = kwargs.get('length')
         self.heat_loss_factor = sequence(kwargs.get('heat_loss_factor'))
+        self.compact = kwargs.get('compact', False)
+        self.line = kwargs.get('line')
+        self.reverse = kwargs.get('reverse', False)
 
         self._invest_group = False
 
@@ -143,6 +339,8 @@ class HeatPipelineBlock(SimpleBlock):
         heat loss factor for pipeline"
         ":math:`l`", ":py:obj:`length`", "P", "Length of heating pipeline"
 
+    For heatpipes with `compact=True`, (2) is inserted into (1), so that no
+    heat loss variable and equation are created for them.
 
     """
 
@@ -166,40 +364,56 @@ class HeatPipelineBlock(SimpleBlock):
         m = self.parent_block()
 
         self.HEATPIPES = Set(initialize=[n for n in group])
+        self.HEATLOSSPIPES = Set(
+            initialize=[n for n in group if not n.compact])
+
+        pipe_data = _pipe_data(group, m.TIMESTEPS)
+        for n, loss in _mutable_loss(self, group, m).items():
+            pipe_data[n] = pipe_data[n][:3] + (loss,)
 
         # Defining Variables
-        self.heat_loss = Var(self.HEATPIPES, m.TIMESTEPS,
+        self.heat_loss = Var(self.HEATLOSSPIPES, m.TIMESTEPS,
                              within=NonNegativeReals)
 
-        def _heat_loss_rule(block, n, t):
+        def _heat_loss_rule(block):
             """Rule definition for constraint to connect the installed capacity
             and the heat loss
             """
-            o = list(n.outputs.keys())[0]
-
-            expr = 0
-            expr += - block.heat_loss[n, t]
-            expr +=\
-                n.heat_loss_factor[t] * n.length * m.flows[n, o].nominal_value
-            return expr == 0
-
-        self.heat_loss_equation = Constraint(self.HEATPIPES, m.TIMESTEPS,
-                                             rule=_heat_loss_rule)
-
-        def _relation_rule(block, n, t):
+            for n in block.HEATLOSSPIPES:
+                i, o, ratio, loss = pipe_data[n]
+                nominal_value = m.flows[n, o].nominal_value
+                for t, f_loss in zip(m.TIMESTEPS, loss):
+                    block.heat_loss_equation.add(
+                        (n, t),
+                        block.heat_loss[n, t] == f_loss * nominal_value)
+
+        self.heat_loss_equation = Constraint(self.HEATLOSSPIPES, m.TIMESTEPS,
+                                             noruleinit=True)
+        self.heat_loss_build = BuildAction(rule=_heat_loss_rule)
+
+        def _relation_rule(block):
             """Link input and output flow and subtract heat loss."""
-            i = list(n.inputs.keys())[0]
-            o = list(n.outputs.keys())[0]
-
-            expr = 0
-            expr += - m.flow[n, o, t]
-            expr += m.flow[i, n, t] * n.conversion_factors[
-                o][t] / n.conversion_factors[i][t]
-            expr += - block.heat_loss[n, t]
-            return expr == 0
+            for n, (i, o, ratio, loss) in pipe_data.items():
+                if n.compact:
+                    nominal_value = m.flows[n, o].nominal_value
+                    for t, r, f_loss in zip(m.TIMESTEPS, ratio, loss):
+                        expr = LinearExpression(
+                            constant=-f_loss * nominal_value,
+                            linear_coefs=[-1, r],
+                            linear_vars=[m.flow[n, o, t], m.flow[i, n, t]])
+                        block.relation.add((n, t), expr == 0)
+                else:
+                    for t, r in zip(m.TIMESTEPS, ratio):
+                        expr = LinearExpression(
+                            constant=0,
+                            linear_coefs=[-1, r, -1],
+                            linear_vars=[m.flow[n, o, t], m.flow[i, n, t],
+                                         block.heat_loss[n, t]])
+                        block.relation.add((n, t), expr == 0)
 
         self.relation = Constraint(self.HEATPIPES, m.TIMESTEPS,
-                                   rule=_relation_rule)
+                                   noruleinit=True)
+        self.relation_build = BuildAction(rule=_relation_rule)
 
 
 class HeatPipelineInvestBlock(SimpleBlock):
@@ -240,6 +454,8 @@ class HeatPipelineInvestBlock(SimpleBlock):
         heat loss factor for pipeline"
         ":math:`l`", ":py:obj:`length`", "P", "Length of heating pipeline"
 
+    For heatpipes with `compact=True`, (2) is inserted into (1), so that no
+    heat loss variable and equation are created for them.
 
     """
 
@@ -264,34 +480,344 @@ class HeatPipelineInvestBlock(SimpleBlock):
 
         # Defining Sets
         self.INVESTHEATPIPES = Set(initialize=[n for n in group])
+        self.INVESTHEATLOSSPIPES = Set(
+            initialize=[n for n in group if not n.compact])
+
+        pipe_data = _pipe_data(group, m.TIMESTEPS)
+        for n, loss in _mutable_loss(self, group, m).items():
+            pipe_data[n] = pipe_data[n][:3] + (loss,)
 
         # Defining Variables
-        self.heat_loss = Var(self.INVESTHEATPIPES, m.TIMESTEPS,
+        self.heat_loss = Var(self.INVESTHEATLOSSPIPES, m.TIMESTEPS,
                              within=NonNegativeReals)
 
-        def _heat_loss_rule(block, n, t):
+        def _heat_loss_rule(block):
             """Rule definition for constraint to connect the installed capacity
             and the heat loss
             """
-            expr = 0
-            expr += - block.heat_loss[n, t]
-            expr += n.heat_loss_factor[t] * n.length * m.InvestmentFlow.invest[
-                n, list(n.outputs.keys())[0]]
-            return expr == 0
-        self.heat_loss_equation = Constraint(self.INVESTHEATPIPES, m.TIMESTEPS,
-                                             rule=_heat_loss_rule)
-
-        def _relation_rule(block, n, t):
+            for n in block.INVESTHEATLOSSPIPES:
+                i, o, ratio, loss = pipe_data[n]
+                invest = m.InvestmentFlow.invest[n, o]
+                for t, f_loss in zip(m.TIMESTEPS, loss):
+                    expr = LinearExpression(
+                        constant=0,
+                        linear_coefs=[-1, f_loss],
+                        linear_vars=[block.heat_loss[n, t], invest])
+                    block.heat_loss_equation.add((n, t), expr == 0)
+
+        self.heat_loss_equation = Constraint(self.INVESTHEATLOSSPIPES,
+                                             m.TIMESTEPS, noruleinit=True)
+        self.heat_loss_build = BuildAction(rule=_heat_loss_rule)
+
+        def _relation_rule(block):
             """Link input and output flow and subtract heat loss."""
-            i = list(n.inputs.keys())[0]
-            o = list(n.outputs.keys())[0]
-
-            expr = 0
-            expr += - m.flow[n, o, t]
-            expr += m.flow[i, n, t] * n.conversion_factors[
-                o][t] / n.conversion_factors[i][t]
-            expr += - block.heat_loss[n, t]
-            return expr == 0
+            for n, (i, o, ratio, loss) in pipe_data.items():
+                if n.compact:
+                    invest = m.InvestmentFlow.invest[n, o]
+                    for t, r, f_loss in zip(m.TIMESTEPS, ratio, loss):
+                        expr = LinearExpression(
+                            constant=0,
+                            linear_coefs=[-1, r, -f_loss],
+                            linear_vars=[m.flow[n, o, t], m.flow[i, n, t],
+                                         invest])
+                        block.relation.add((n, t), expr == 0)
+                else:
+                    for t, r in zip(m.TIMESTEPS, ratio):
+                        expr = LinearExpression(
+                            constant=0,
+                            linear_coefs=[-1, r, -1],
+                            linear_vars=[m.flow[n, o, t], m.flow[i, n, t],
+                                         block.heat_loss[n, t]])
+                        block.relation.add((n, t), expr == 0)
 
         self.relation = Constraint(self.INVESTHEATPIPES, m.TIMESTEPS,
-                                   rule=_relation_rule)
+                                   noruleinit=True)
+        self.relation_build = BuildAction(rule=_relation_rule)
+
+
+class BidirectionalHeatPipeline(Transformer):
+    r"""A BidirectionalHeatPipeline represents a pipeline of a district
+    heating system with unknown flow direction. Instead of two HeatPipelines
+    (one for each direction, each with its own investment), there is only one
+    investment, which is shared by both directions.
+
+    The pipeline connects two buses, which are both input and output of the
+    component. The heat loss is independent of the direction and depends on
+    the invested capacity and the length.
+
+    Parameters
+    ----------
+    length : float
+        Length of BidirectionalHeatPipeline.
+    heat_loss_factor : float
+        Heat loss per length unit as fraction of the invested capacity. Can
+        also be defined by a series.
+    investment : :class:`oemof.solph.options.Investment`
+        Investment of the pipeline (shared by both directions). If
+        `nonconvex` is True, one binary variable is created for the pipeline.
+    line : int
+        Id of the line of the line layer, which is represented by the
+        pipeline (used to map the results onto the line layer).
+
+    Note
+    ----
+    This component is experimental. Use it with care.
+
+    The following sets, variables, constraints and objective parts are created
+     * :py:class:`~BidirectionalHeatPipelineBlock`
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.length = kwargs.get('length')
+        self.heat_loss_factor = sequence(kwargs.get('heat_loss_factor'))
+        self.investment = kwargs.get('investment')
+        self.line = kwargs.get('line')
+        self.reverse = False
+
+        if len(self.inputs) != 2 or set(self.inputs) != set(self.outputs):
+            raise ValueError(
+                "BidirectionalHeatPipeline needs exactly two buses, which are "
+                "input and output at the same time!")
+
+        if not isinstance(self.investment, Investment):
+            raise ValueError(
+                "BidirectionalHeatPipeline needs an `investment` object.")
+
+        for f in list(self.inputs.values()) + list(self.outputs.values()):
+            if f.investment is not None or f.nonconvex is not None:
+                raise ValueError(
+                    "Flows of `BidirectionalHeatPipeline` must not have an "
+                    "investment or nonconvex attribute. Use the `investment` "
+                    "parameter of the component.")
+
+        if getattr(self.investment, 'nonconvex', False) and \
+                self.investment.maximum == float('inf'):
+            raise ValueError(
+                "A nonconvex BidirectionalHeatPipeline needs a finite "
+                "maximum of the investment.")
+
+    @property
+    def buses(self):
+        """The two buses connected by the pipeline."""
+        return tuple(self.inputs)
+
+    def constraint_group(self):
+        return BidirectionalHeatPipelineBlock
+
+
+class BidirectionalHeatPipelineBlock(SimpleBlock):
+    r"""Block representing a bidirectional pipeline of a district heating
+    system :class:`BidirectionalHeatPipeline`
+
+    **The following constraints are created:**
+
+    .. math::
+        &
+        (1) \dot{Q}_{in,a}(t) + \dot{Q}_{in,b}(t) =
+        \dot{Q}_{out,a}(t) + \dot{Q}_{out,b}(t) + \dot{Q}_{loss}(t)\\
+        &
+        (2) \dot{Q}_{loss}(t) = f_{loss}(t) \cdot l \cdot P_{invest}\\
+        &
+        (3) \dot{Q}_{out,a}(t) + \dot{Q}_{out,b}(t) \leq P_{invest}\\
+        &
+        (4) P_{min} \cdot Y \leq P_{invest} \leq P_{max} \cdot Y
+        \quad \text{(only nonconvex)}
+        &
+
+    The symbols used are defined as follows
+    (with Variables (V) and Parameters (P)):
+
+    .. csv-table::
+        :header: "symbol", "attribute", "type", "explanation"
+        :widths: 1, 1, 1, 1
+
+        ":math:`\dot{Q}_{in,a}(t)`", ":py:obj:`flow[a, n, t]`", "V", "Heat
+        input from bus a"
+        ":math:`\dot{Q}_{out,a}(t)`", ":py:obj:`flow[n, a, t]`", "V", "Heat
+        output to bus a"
+        ":math:`\dot{Q}_{loss}(t)`", ":py:obj:`heat_loss[n, t]`", "V", "Heat
+        loss of heat pipeline"
+        ":math:`P_{invest}`", ":py:obj:`invest[n]`", "V", "Invested capacity
+        of heating pipeline (both directions)"
+        ":math:`Y`", ":py:obj:`invest_status[n]`", "V", "Binary build
+        decision of heating pipeline"
+        ":math:`f_{loss}(t)`", ":py:obj:`heat_loss_factor`", "P", "Specific
+        heat loss factor for pipeline"
+        ":math:`l`", ":py:obj:`length`", "P", "Length of heating pipeline"
+
+    **The following parts of the objective function are created:**
+
+    .. math::
+        P_{invest} \cdot c_{invest,var} + Y \cdot c_{invest,fix}
+
+    """
+
+    CONSTRAINT_GROUP = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+    def _create(self, group=None):
+        """ Creates the linear constraint for the
+        class:`BidirectionalHeatPipeline` block.
+
+        Parameters
+        ----------
+        group : list
+
+        """
+        if group is None:
+            return None
+
+        m = self.parent_block()
+
+        # Defining Sets
+        self.BIDIRECTIONALHEATPIPES = Set(initialize=[n for n in group])
+        self.NONCONVEX_BIDIRECTIONALHEATPIPES = Set(initialize=[
+            n for n in group if getattr(n.investment, 'nonconvex', False)])
+
+        timesteps = list(m.TIMESTEPS)
+        loss = {n: (np.asarray(_values(n.heat_loss_factor, timesteps)) *
+                    n.length).tolist() for n in group}
+        loss.update(_mutable_loss(self, group, m))
+
+        # Defining Variables
+        def _invest_bounds(block, n):
+            maximum = n.investment.maximum
+            if maximum == float('inf'):
+                maximum = None
+            if n in block.NONCONVEX_BIDIRECTIONALHEATPIPES:
+                return 0, maximum
+            return n.investment.minimum, maximum
+
+        self.invest = Var(self.BIDIRECTIONALHEATPIPES,
+                          within=NonNegativeReals, bounds=_invest_bounds)
+
+        self.invest_status = Var(self.NONCONVEX_BIDIRECTIONALHEATPIPES,
+                                 within=Binary)
+
+        # the heat loss is a sequence of the pipeline in the results, which
+        # outputlib.processing needs for nodes with scalar variables
+        self.heat_loss = Var(self.BIDIRECTIONALHEATPIPES, m.TIMESTEPS,
+                             within=NonNegativeReals)
+
+        def _heat_loss_rule(block):
+            """Heat loss of the invested capacity."""
+            for n in group:
+                for t, f_loss in zip(m.TIMESTEPS, loss[n]):
+                    expr = LinearExpression(
+                        constant=0,
+                        linear_coefs=[1, -f_loss],
+                        linear_vars=[block.heat_loss[n, t],
+                                     block.invest[n]])
+                    block.heat_loss_equation.add((n, t), expr == 0)
+
+        self.heat_loss_equation = Constraint(self.BIDIRECTIONALHEATPIPES,
+                                             m.TIMESTEPS, noruleinit=True)
+        self.heat_loss_build = BuildAction(rule=_heat_loss_rule)
+
+        def _relation_rule(block):
+            """Heat input of both directions equals heat output of both
+            directions plus heat loss."""
+            for n in group:
+                a, b = n.buses
+                for t in m.TIMESTEPS:
+                    expr = LinearExpression(
+                        constant=0,
+                        linear_coefs=[1, 1, -1, -1, -1],
+                        linear_vars=[m.flow[a, n, t], m.flow[b, n, t],
+                                     m.flow[n, a, t], m.flow[n, b, t],
+                                     block.heat_loss[n, t]])
+                    block.relation.add((n, t), expr == 0)
+
+        self.relation = Constraint(self.BIDIRECTIONALHEATPIPES, m.TIMESTEPS,
+                                   noruleinit=True)
+        self.relation_build = BuildAction(rule=_relation_rule)
+
+        def _capacity_rule(block):
+            """Both directions share the invested capacity."""
+            for n in group:
+                a, b = n.buses
+                for t in m.TIMESTEPS:
+                    expr = LinearExpression(
+                        constant=0,
+                        linear_coefs=[1, 1, -1],
+                        linear_vars=[m.flow[n, a, t], m.flow[n, b, t],
+                                     block.invest[n]])
+                    block.capacity.add((n, t), expr <= 0)
+
+        self.capacity = Constraint(self.BIDIRECTIONALHEATPIPES, m.TIMESTEPS,
+                                   noruleinit=True)
+        self.capacity_build = BuildAction(rule=_capacity_rule)
+
+        def _max_invest_rule(block, n):
+            return block.invest[n] <= \
+                n.investment.maximum * block.invest_status[n]
+
+        self.max_invest = Constraint(self.NONCONVEX_BIDIRECTIONALHEATPIPES,
+                                     rule=_max_invest_rule)
+
+        def _min_invest_rule(block, n):
+            return block.invest[n] >= \
+                n.investment.minimum * block.invest_status[n]
+
+        self.min_invest = Constraint(self.NONCONVEX_BIDIRECTIONALHEATPIPES,
+                                     rule=_min_invest_rule)
+
+    def _objective_expression(self):
+        """Objective expression of the shared investments."""
+        investment_costs = 0
+
+        for n in self.BIDIRECTIONALHEATPIPES:
+            investment_costs += self.invest[n] * n.investment.ep_costs
+
+        for n in self.NONCONVEX_BIDIRECTIONALHEATPIPES:
+            investment_costs += \
+                self.invest_status[n] * getattr(n.investment, 'offset', 0)
+
+        self.investment_costs = Expression(expr=investment_costs)
+
+        return investment_costs
+
+
+def add_heat_loss_results(om, results):
+    """
+    Adds the heat loss of all heatpipes with compact formulation to the
+    processed results, so that it can be evaluated like the heat loss
+    variable of the other heatpipes (key (heatpipe, None), column
+    'heat_loss' of the sequences).
+
+    Parameters
+    ----------
+    om : solph.Model
+        Solved model.
+    results : dict
+        Results of :py:func:`oemof.outputlib.processing.results`.
+
+    Returns
+    -------
+    dict : updated results
+    """
+    pipes = [n for n in om.es.nodes
+             if isinstance(n, HeatPipeline) and n.compact]
+    index = om.es.timeindex[:len(om.TIMESTEPS)]
+    timesteps = list(om.TIMESTEPS)
+
+    heat_loss = {}
+    for n, (i, o, ratio, loss) in _pipe_data(pipes, timesteps).items():
+        if n._invest_group:
+            capacity = om.InvestmentFlow.invest[n, o].value
+        else:
+            capacity = om.flows[n, o].nominal_value
+        heat_loss[n] = np.asarray(loss) * capacity
+
+    for n, values in heat_loss.items():
+        entry = results.setdefault(
+            (n, None), {'scalars': pd.Series(dtype=float),
+                        'sequences': pd.DataFrame(index=index)})
+        entry['sequences']['heat_loss'] = values
+
+    return results
@@ -0,0 +1,299 @@
+"""
+oemof application for research project quarree100.
+
+Investment model with mutable cost, demand and heat loss parameters, which
+can be changed and solved again without rebuilding the model (e.g. for
+what-if studies).
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import logging
+import oemof.solph as solph
+from oemof.solph.network import Sink, Transformer
+from oemof.solph.plumbing import sequence, _Sequence
+from pyomo.environ import Objective, Param, Set, SolverFactory
+
+from modules import oemof_heatpipe as oh
+from modules.profiles import DemandProfiles
+from modules.solve import (SOLVER_PREFERENCE, invest_pipes, run_solver,
+                           select_solver)
+
+# persistent interfaces of pyomo (appsi), which detect changed parameters
+# and fixed variables and only update the solver model
+PERSISTENT_SOLVER = {'gurobi': 'appsi_gurobi',
+                     'highs': 'appsi_highs',
+                     'cplex': 'appsi_cplex'}
+
+# blocks of the heatpipes with mutable heat loss factor
+HEAT_LOSS_BLOCKS = ['HeatPipelineBlock', 'HeatPipelineInvestBlock',
+                    'BidirectionalHeatPipelineBlock']
+
+
+class _MutableModel(solph.Model):
+    """solph.Model, whose heatpipe blocks create the heat loss factors as
+    mutable parameters (see oemof_heatpipe._mutable_loss)."""
+    mutable_parameters = True
+
+
+def _costs(n):
+    """Investment of a heatpipe with investment."""
+    if isinstance(n, oh.BidirectionalHeatPipeline):
+        return n.investment
+    return n.outputs[next(iter(n.outputs))].investment
+
+
+def _select(items, values):
+    """
+    Yields (item, value) for a scalar value (all items) or a dict with
+    label strings as keys.
+    """
+    if isinstance(values, dict):
+        labels = {str(n.label): n for n in items}
+        for label, v in values.items():
+            if label not in labels:
+                raise KeyError('No parameter for {}.'.format(label))
+            yield labels[label], v
+    else:
+        for n in items:
+            yield n, values
+
+
+class ParametricModel:
+    r"""Investment model with mutable parameters.
+
+    The investment costs (ep_costs and offset) of the heatpipes, the
+    variable costs of the transformers and the heat loss factors of the
+    heatpipes are pyomo parameters, the demand is given by fixed flow
+    variables. They are changed in place, so that only the solve has to be
+    repeated. With a persistent solver interface (gurobi, highs), the
+    solver model is only updated as well.
+
+    Examples
+    --------
+    >>> pm = ParametricModel(esys, solver='highs')
+    >>> pm.solve()
+    >>> costs = pm.pipe_costs()['ep_costs']
+    >>> pm.set_pipe_costs(ep_costs={k: 1.2 * v for k, v in costs.items()})
+    >>> pm.set_heat_loss_factor(0.0003)
+    >>> pm.solve()
+
+    Parameters
+    ----------
+    esys : solph.EnergySystem
+        Energy system with all nodes.
+    solver : str
+        Name of solver (default: first available of solve.SOLVER_PREFERENCE)
+    persistent : bool
+        Use the persistent interface of the solver, if there is one.
+    kwargs :
+        Further arguments of solph.Model (e.g. objective_weighting).
+    """
+
+    def __init__(self, esys, solver=None, persistent=True, **kwargs):
+        self.om = _MutableModel(esys, **kwargs)
+
+        self.solver = select_solver(solver, SOLVER_PREFERENCE)
+        self._opt = None
+        if persistent and self.solver in PERSISTENT_SOLVER:
+            opt = SolverFactory(PERSISTENT_SOLVER[self.solver])
+            if opt.available(exception_flag=False):
+                self._opt = opt
+            else:
+                logging.info('Persistent interface of %s is not available.',
+                             self.solver)
+
+        self._add_cost_parameters()
+
+    def _add_cost_parameters(self):
+        """
+        Adds the cost parameters and the difference to the initial costs to
+        the objective of oemof, so that the objective equals the original
+        objective for the initial values.
+        """
+        om = self.om
+        pipes = invest_pipes(om)
+
+        om.PARAMETRIC_PIPES = Set(initialize=list(pipes))
+        om.NONCONVEX_PARAMETRIC_PIPES = Set(
+            initialize=[n for n, (v, y) in pipes.items() if y is not None])
+        om.pipe_ep_costs = Param(
+            om.PARAMETRIC_PIPES, mutable=True,
+            initialize={n: _costs(n).ep_costs for n in pipes})
+        om.pipe_offset = Param(
+            om.NONCONVEX_PARAMETRIC_PIPES, mutable=True,
+            initialize={n: getattr(_costs(n), 'offset', 0)
+                        for n in om.NONCONVEX_PARAMETRIC_PIPES})
+
+        # flows of transformers (not heatpipes) with constant variable costs
+        flows = []
+        for i, o in om.flows:
+            n = o if isinstance(o, Transformer) else i
+            if isinstance(n, (oh.HeatPipeline, oh.BidirectionalHeatPipeline)):
+                continue
+            if isinstance(n, Transformer) and \
+                    isinstance(om.flows[i, o].variable_costs, _Sequence):
+                flows.append((i, o))
+        om.PARAMETRIC_FLOWS = Set(initialize=flows, dimen=2)
+        om.variable_costs = Param(
+            om.PARAMETRIC_FLOWS, mutable=True,
+            initialize={f: om.flows[f].variable_costs.default
+                        for f in flows})
+
+        delta = 0
+        for n, (invest, y) in pipes.items():
+            delta += (om.pipe_ep_costs[n] - _costs(n).ep_costs) * invest
+            if y is not None:
+                delta += (om.pipe_offset[n] -
+                          getattr(_costs(n), 'offset', 0)) * y
+
+        for i, o in flows:
+            vc = om.flows[i, o].variable_costs.default
+            delta += (om.variable_costs[i, o] - vc) * sum(
+                om.flow[i, o, t] * om.objective_weighting[t]
+                for t in om.TIMESTEPS)
+
+        expr = om.objective.expr + delta
+        sense = om.objective.sense
+        om.del_component('objective')
+        om.objective = Objective(expr=expr, sense=sense)
+
+    def pipe_costs(self):
+        """Current investment costs of the heatpipes.
+
+        :return: dict with 'ep_costs' and 'offset' {label string: value}
+        """
+        om = self.om
+        return {'ep_costs': {str(n.label): om.pipe_ep_costs[n].value
+                             for n in om.PARAMETRIC_PIPES},
+                'offset': {str(n.label): om.pipe_offset[n].value
+                           for n in om.NONCONVEX_PARAMETRIC_PIPES}}
+
+    def set_pipe_costs(self, ep_costs=None, offset=None):
+        """
+        Sets the investment costs of the heatpipes.
+
+        :param ep_costs: costs per capacity (scalar for all heatpipes or
+                         dict {label string: value})
+        :param offset: fix costs of the nonconvex heatpipes (scalar or dict)
+        """
+        om = self.om
+        if ep_costs is not None:
+            for n, v in _select(om.PARAMETRIC_PIPES, ep_costs):
+                om.pipe_ep_costs[n] = v
+        if offset is not None:
+            for n, v in _select(om.NONCONVEX_PARAMETRIC_PIPES, offset):
+                om.pipe_offset[n] = v
+
+    def set_variable_costs(self, costs):
+        """
+        Sets the variable costs of the flows of transformers.
+
+        :param costs: dict {label string of transformer: variable costs of
+                      all its flows with variable costs} or {(label string of
+                      input, label string of output): variable costs}
+        """
+        om = self.om
+        for (i, o) in om.PARAMETRIC_FLOWS:
+            n = o if isinstance(o, Transformer) else i
+            for key in [(str(i.label), str(o.label)), str(n.label)]:
+                if key in costs:
+                    om.variable_costs[i, o] = costs[key]
+                    break
+
+    def set_demand(self, series, tag2='heat'):
+        """
+        Sets the demand of the fixed demand sinks. The flows get views of
+        the normalized profiles (see profiles.DemandProfiles) like in
+        add_components.add_demand. Demand sinks, whose flow is not fixed,
+        are not changed (their demand is a bound of the flow).
+
+        :param series: pd.DataFrame with one column per house (tag4 of label)
+                       like the series of the houses (before scaling with
+                       the nominal value of the demand)
+        :param tag2: tag2 of the demand sinks
+        """
+        om = self.om
+        sinks = [n for n in om.es.nodes
+                 if isinstance(n, Sink) and isinstance(n.label, oh.Label) and
+                 n.label.tag3 == 'demand' and n.label.tag2 == tag2 and
+                 n.label.tag4 in series]
+        profiles = DemandProfiles(
+            {tag2: series[[n.label.tag4 for n in sinks]]})
+
+        count = 0
+        skipped = 0
+        for n in sinks:
+            profile, scale = profiles.get(tag2, n.label.tag4)
+            for i, flow in n.inputs.items():
+                if not flow.fixed:
+                    skipped += 1
+                    continue
+                # the scale of the profile is part of the nominal value
+                flow.nominal_value *= scale / getattr(flow, 'profile_scale',
+                                                      1)
+                flow.profile_scale = scale
+                flow.actual_value = sequence(profile)
+                for t in om.TIMESTEPS:
+                    om.flow[i, n, t].fix(profile[t] * flow.nominal_value)
+                count += 1
+
+        if skipped:
+            logging.warning('Demand of %s sinks without fixed flow not '
+                            'changed.', skipped)
+        logging.info('Demand of %s sinks changed.', count)
+
+    def set_heat_loss_factor(self, factor):
+        """
+        Sets the heat loss factors of the heatpipes with constant factor.
+        Heatpipes with a time-dependent factor are part of the constraints
+        and cannot be changed.
+
+        :param factor: scalar for all heatpipes or dict {label string: value}
+        """
+        mutable = {}
+        for name in HEAT_LOSS_BLOCKS:
+            block = getattr(self.om, name, None)
+            if block is None or not hasattr(block, 'MUTABLELOSSPIPES'):
+                continue
+            for n in block.MUTABLELOSSPIPES:
+                mutable[str(n.label)] = (block, n)
+
+        fixed = [str(n.label) for n in self.om.es.nodes
+                 if isinstance(n, (oh.HeatPipeline,
+                                   oh.BidirectionalHeatPipeline)) and
+                 str(n.label) not in mutable]
+
+        if isinstance(factor, dict):
+            unknown = [k for k in factor if k not in mutable]
+            if unknown:
+                raise KeyError('No constant heat loss factor for {}.'.format(
+                    ', '.join(map(str, unknown))))
+            items = [(mutable[k], v) for k, v in factor.items()]
+        else:
+            if fixed:
+                logging.warning('Heat loss factor of %s heatpipes with '
+                                'time-dependent factor not changed.',
+                                len(fixed))
+            items = [(bn, factor) for bn in mutable.values()]
+
+        for (block, n), v in items:
+            block.heat_loss_factor[n] = v
+            # keep the node consistent for add_heat_loss_results
+            n.heat_loss_factor = sequence(v)
+
+    def solve(self, **settings):
+        """
+        Solves the model with the current parameters.
+
+        :param settings: settings of solve.run_solver (e.g. mip_gap,
+                         time_limit, solve_kwargs)
+        :return: solver info of run_solver
+        """
+        return run_solver(self.om, solver=self.solver, opt=self._opt,
+                          **settings)
@@ -0,0 +1,173 @@
+"""
+oemof application for research project quarree100.
+
+Creation of the energy system and summary of the results, so that the steps
+of dhs_example.py can be used programmatically (e.g. for scenario runs).
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import pandas as pd
+import oemof.solph as solph
+import oemof.outputlib as outputlib
+from oemof.solph.network import Bus, Transformer
+from pyomo.environ import value
+
+from modules.dhs_nodes import add_nodes_dhs, add_nodes_houses
+from modules.oemof_heatpipe import add_heat_loss_results
+from modules.result_store import input_hash
+from modules.results import extract_results, map_line_results
+from modules.solve import invest_pipes, run_solver
+from modules.topology import house_demand, pipe_capacity_bounds
+
+
+def capacity_bounds(input_data, gd):
+    """
+    Upper bounds of the heatpipe capacities derived from the heat demand of
+    the houses (see topology.pipe_capacity_bounds).
+
+    :param input_data: input data (see input_data.load_input_data)
+    :param gd: general data
+    :return: pd.DataFrame of bounds per line or None, if the demand of the
+             houses is no bound of their supply
+    """
+    demand = house_demand(input_data['data_houses'],
+                          n_timesteps=gd.get('num_ts'))
+    if demand is None:
+        return None
+
+    options = input_data['gd_infra']['heatpipe_options']
+    active = options[options['active'].astype(bool)]
+    loss_factor = active['l_factor'].max()
+    cap_min = active.loc[active['nonconvex'].astype(bool), 'cap_min'].max()
+
+    return pipe_capacity_bounds(input_data['qgis_data']['points'],
+                                input_data['qgis_data']['lines'], demand,
+                                loss_factor=loss_factor,
+                                cap_min=0.0 if pd.isnull(cap_min) else cap_min)
+
+
+def create_nodes(input_data, gd):
+    """
+    :param input_data: input data (see input_data.load_input_data)
+    :param gd: general data ('bound_capacity': tighten the maximum capacity
+               of the heatpipes with capacity_bounds)
+    :return:    nodes - list of nodes
+                busd - dict of buses
+    """
+    nodes = []
+    busd = {}
+
+    cap_bounds = None
+    if gd.get('bound_capacity', False):
+        cap_bounds = capacity_bounds(input_data, gd)
+
+    nodes, busd = add_nodes_dhs(input_data['qgis_data'], gd,
+                                input_data['gd_infra'], nodes, busd,
+                                cap_bounds=cap_bounds)
+    nodes, busd = add_nodes_houses(gd, input_data['data_houses'], nodes, busd,
+                                   'house')
+    nodes, busd = add_nodes_houses(gd, input_data['data_generation'], nodes,
+                                   busd, 'generation')
+
+    return nodes, busd
+
+
+def create_energy_system(input_data, gd, start='1/1/2018'):
+    """
+    :param input_data: input data (see input_data.load_input_data)
+    :param gd: general data (at least 'num_ts', 'rate', 'f_invest')
+    :return: solph.EnergySystem with all nodes
+    """
+    esys = solph.EnergySystem(
+        timeindex=pd.date_range(start, periods=gd['num_ts'], freq='H'))
+
+    nodes, busd = create_nodes(input_data, gd)
+    esys.add(*nodes)
+
+    return esys
+
+
+def invest_summary(om, threshold=1e-6):
+    """
+    Summary of the investments of a solved model.
+
+    :param om: solved solph.Model
+    :return: dict with 'objective', 'pipes_built', 'pipes_capacity' (sum of
+             invested pipe capacities), 'invest_generation' and
+             'invest_houses' (invested transformer capacities)
+    """
+    pipes = {str(n.label): v.value or 0
+             for n, (v, y) in invest_pipes(om).items()}
+
+    invest_gen = 0
+    invest_houses = 0
+    if hasattr(om, 'InvestmentFlow'):
+        for i, o in om.InvestmentFlow.invest:
+            # the investment belongs to the component, not to the bus
+            n = o if isinstance(i, Bus) else i
+            if not isinstance(n, Transformer) or str(n.label) in pipes:
+                continue
+            v = om.InvestmentFlow.invest[i, o].value or 0
+            if str(n.label).startswith('generation'):
+                invest_gen += v
+            elif str(n.label).startswith('house'):
+                invest_houses += v
+
+    return {'objective': value(om.objective),
+            'pipes_built': sum(p > threshold for p in pipes.values()),
+            'pipes_capacity': sum(pipes.values()),
+            'invest_generation': invest_gen,
+            'invest_houses': invest_houses}
+
+
+def solve_configuration(input_data, gd, store=None, **solver_settings):
+    """
+    Builds and solves a configuration and processes the results. If a result
+    store is given, the results of an identical configuration (same input
+    data, general data and solver settings) are loaded from the store
+    instead, otherwise they are stored.
+
+    :param input_data: input data (see input_data.load_input_data)
+    :param gd: general data
+    :param store: result_store.ResultStore (None: no caching)
+    :param solver_settings: settings of solve.run_solver
+    :return: dict with 'invest' and 'flows' (see results.extract_results),
+             'lines' (line layer with the invested capacities, see
+             results.map_line_results) and 'meta' with 'summary' (see
+             invest_summary), 'solver' (solver info) and 'cached'
+    """
+    key = None
+    if store is not None:
+        key = input_hash(input_data, gd, solver_settings)
+        entry = store.get(key)
+        if entry is not None:
+            entry['meta']['cached'] = True
+            return entry
+
+    esys = create_energy_system(input_data, gd)
+    om = solph.Model(esys)
+
+    info = run_solver(om, **solver_settings)
+    info.pop('results')
+
+    results = outputlib.processing.results(om)
+    add_heat_loss_results(om, results)
+    res = extract_results(results)
+
+    # the label ids are only valid within this process
+    tables = {'invest': res['invest'].drop(columns='id', errors='ignore'),
+              'flows': res['flows'],
+              'lines': map_line_results(input_data['qgis_data']['lines'],
+                                        res['invest'])}
+    meta = {'summary': invest_summary(om), 'solver': info, 'cached': False}
+
+    if store is not None and info['objective'] is not None:
+        store.put(key, tables, meta=meta)
+
+    return dict(tables, meta=meta)
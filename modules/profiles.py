@@ -0,0 +1,110 @@
+"""
+oemof application for research project quarree100.
+
+Shared storage of the demand time series: all profiles are stored once in
+one contiguous float array, normalized to their peak, and identical
+profiles (e.g. standard load profiles of many houses) are stored only
+once. The flows get read-only views of the rows of this array.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import hashlib
+import logging
+import numpy as np
+
+# decimals of the normalized profiles for the detection of identical
+# profiles (removes rounding differences of the normalization)
+DECIMALS = 12
+
+
+def _normalize(df, k):
+    """Column k of a DataFrame divided by its peak and the peak (1 for
+    columns without demand)."""
+    column = df.iloc[:, k].to_numpy(dtype=float, copy=False)
+    peak = np.abs(column).max() if len(column) else 0.
+    scale = peak if peak > 0 else 1.
+    return column / scale, scale
+
+
+class DemandProfiles:
+    r"""De-duplicated, normalized demand profiles.
+
+    Each column of the series is stored as normalized profile (divided by
+    its peak) and a scale factor (the peak). The unique profiles are the
+    rows of one contiguous array, which is read-only, because the rows are
+    shared by several flows.
+
+    Examples
+    --------
+    >>> profiles = DemandProfiles(data_houses['series_data'])
+    >>> profile, scale = profiles.get('heat', 'H0012')
+    >>> np.allclose(profile * scale,
+    ...             data_houses['series_data']['heat']['H0012'])
+    True
+
+    Parameters
+    ----------
+    series : dict
+        {label_2: pd.DataFrame} with one column per house (label_4), e.g.
+        the series_data of the input data.
+    """
+
+    def __init__(self, series):
+        lengths = {len(df) for df in series.values()}
+        if len(lengths) > 1:
+            raise ValueError('All demand series need the same length.')
+        n_timesteps = lengths.pop() if lengths else 0
+
+        # first pass: detection of the unique profiles by a hash of the
+        # rounded profile of each column (only one column in memory)
+        unique = {}
+        first = []
+        self.index = {}
+        for label_2, df in series.items():
+            for k, house in enumerate(df.columns):
+                profile, scale = _normalize(df, k)
+                rounded = np.round(profile, DECIMALS)
+                key = hashlib.sha1(rounded).digest()
+                row = unique.get(key)
+                if row is None or not np.array_equal(
+                        np.round(_normalize(*first[row])[0], DECIMALS),
+                        rounded):
+                    row = unique[key] = len(first)
+                    first.append((df, k))
+                self.index[label_2, house] = (row, scale)
+
+        # second pass: one array of the size of the unique profiles
+        self.data = np.empty((len(first), n_timesteps))
+        for row, (df, k) in enumerate(first):
+            self.data[row] = _normalize(df, k)[0]
+        self.data.flags.writeable = False
+
+        logging.info('Demand profiles: %s series, %s unique profiles '
+                     '(%.1f MB)', len(self.index), len(first),
+                     self.data.nbytes / 2**20)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def get(self, label_2, house):
+        """
+        :param label_2: tag2 of the demand (e.g. 'heat')
+        :param house: column of the series (label_4)
+        :return: (read-only view of the normalized profile, scale factor)
+        """
+        row, scale = self.index[label_2, house]
+        return self.data[row], scale
+
+    def series(self, label_2, house):
+        """Original series (copy) of a house."""
+        profile, scale = self.get(label_2, house)
+        return profile * scale
@@ -0,0 +1,294 @@
+"""
+oemof application for research project quarree100.
+
+Store of the processed results of solved configurations. The entries are
+identified by a hash of the normalized input data, general data and solver
+settings, so that identical configurations are not built and solved again.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+from modules.input_data import _read_table, _write_json, _write_table
+
+STORE_DIR = os.path.join('data', '.results')
+
+# temporary directories of interrupted writes are removed after [s]
+TMP_MAX_AGE = 3600
+
+
+def _code_hash():
+    """Hash of the source of all modules (a change of the source invalidates
+    all entries)."""
+    h = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.py'):
+            continue
+        h.update(name.encode() + b'\x00')
+        with open(os.path.join(directory, name), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _update_hash(h, obj):
+    """Adds a normalized representation of an object to a hash."""
+    if isinstance(obj, pd.DataFrame):
+        # the order of the columns is irrelevant, the order of the rows not
+        obj = obj.reindex(sorted(obj.columns, key=str), axis=1)
+        h.update(json.dumps([[str(c), str(t)] for c, t in
+                             obj.dtypes.items()]).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+
+    elif isinstance(obj, pd.Series):
+        h.update(str(obj.dtype).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=str):
+            h.update(b'\x00' + str(k).encode() + b'\x00')
+            _update_hash(h, obj[k])
+
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'[')
+        for x in obj:
+            _update_hash(h, x)
+        h.update(b']')
+
+    elif isinstance(obj, (bool, np.bool_)):
+        h.update(b'T' if obj else b'F')
+
+    elif isinstance(obj, (int, float, np.integer, np.floating)):
+        h.update(repr(float(obj)).encode())
+
+    else:
+        h.update(repr(obj).encode())
+
+
+def input_hash(input_data, gd, solver_settings=None):
+    """
+    Content hash of a configuration.
+
+    :param input_data: input data (see input_data.load_input_data)
+    :param gd: general data
+    :param solver_settings: settings of solve.run_solver
+    :return: hex digest
+    """
+    h = hashlib.sha256(_code_hash().encode())
+    _update_hash(h, {'input_data': input_data, 'gd': gd,
+                     'solver': solver_settings or {}})
+    return h.hexdigest()
+
+
+def _write_frame(df, path):
+    """
+    Writes a DataFrame as table (see input_data._write_table) and its index
+    and column structure as json.
+    """
+    data = df.copy()
+    data.columns = [str(k) for k in range(df.shape[1])]
+    data.index.names = ['_index_{}'.format(k)
+                        for k in range(df.index.nlevels)]
+    data = data.reset_index()
+
+    structure = {'index_names': list(df.index.names),
+                 'column_names': list(df.columns.names),
+                 'columns': [list(c) if isinstance(c, tuple) else c
+                             for c in df.columns]}
+    with open(path + '.json', 'w') as f:
+        json.dump(structure, f, default=str)
+
+    return _write_table(data, path)
+
+
+def _read_frame(directory, name, table):
+    with open(os.path.join(directory, name + '.json')) as f:
+        structure = json.load(f)
+
+    data = _read_table(os.path.join(directory, table))
+    nlevels = len(structure['index_names'])
+    data = data.set_index(list(data.columns[:nlevels]))
+    data.index.names = structure['index_names']
+
+    if len(structure['column_names']) > 1:
+        data.columns = pd.MultiIndex.from_tuples(
+            [tuple(c) for c in structure['columns']],
+            names=structure['column_names'])
+    else:
+        data.columns = pd.Index(structure['columns'],
+                                name=structure['column_names'][0])
+
+    return data
+
+
+def _dir_size(directory):
+    size = 0
+    for f in os.listdir(directory):
+        try:
+            size += os.path.getsize(os.path.join(directory, f))
+        except OSError:
+            # e.g. temporary file of entry.json renamed in the meantime
+            pass
+    return size
+
+
+class ResultStore:
+    r"""On-disk store of processed results with LRU eviction.
+
+    Each entry is a directory with the tables (feather, pickle as fallback)
+    and an entry.json with metadata and time of last access. Entries are
+    written to a temporary directory and renamed, so that parallel runs
+    (e.g. scenario workers) can share a store.
+
+    Examples
+    --------
+    >>> store = ResultStore(max_bytes=2 * 1024 ** 3)
+    >>> key = input_hash(input_data, gd, solver_settings)
+    >>> entry = store.get(key)
+    >>> if entry is None:
+    ...     store.put(key, {'invest': invest, 'lines': lines}, meta=info)
+
+    Parameters
+    ----------
+    directory : str
+        Directory of the store.
+    max_bytes : int
+        Maximal size of the store. The least recently used entries are
+        removed, if the size is exceeded (None: no limit).
+    """
+
+    def __init__(self, directory=STORE_DIR, max_bytes=1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key):
+        return os.path.isfile(os.path.join(self._path(key), 'entry.json'))
+
+    def get(self, key):
+        """
+        :param key: hash of the configuration (see input_hash)
+        :return: dict of the stored DataFrames and 'meta' or None
+        """
+        path = self._path(key)
+        path_entry = os.path.join(path, 'entry.json')
+        try:
+            with open(path_entry) as f:
+                entry = json.load(f)
+            tables = {name: _read_frame(path, name, table)
+                      for name, table in entry['tables'].items()}
+        except (OSError, ValueError, KeyError):
+            return None
+
+        entry['last_access'] = time.time()
+        _write_json(entry, path_entry)
+
+        logging.info('Result store hit: %s', key)
+        tables['meta'] = entry['meta']
+        return tables
+
+    def put(self, key, tables, meta=None):
+        """
+        Stores the results of a configuration.
+
+        :param key: hash of the configuration (see input_hash)
+        :param tables: dict {name: pd.DataFrame}
+        :param meta: json serializable metadata (e.g. solver info)
+        """
+        tmp = self._path('.tmp_' + uuid.uuid4().hex)
+        os.makedirs(tmp)
+
+        entry = {'key': key, 'created': time.time(),
+                 'last_access': time.time(), 'meta': meta or {},
+                 'tables': {}}
+        for name, df in tables.items():
+            entry['tables'][name] = _write_frame(df, os.path.join(tmp, name))
+
+        with open(os.path.join(tmp, 'entry.json'), 'w') as f:
+            json.dump(entry, f, default=str)
+
+        self.invalidate(key)
+        try:
+            os.rename(tmp, self._path(key))
+        except OSError:
+            # stored by a parallel run in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self.evict()
+
+    def entries(self):
+        """
+        :return: pd.DataFrame of the entries with 'key', 'created',
+                 'last_access' and 'size' [bytes]
+        """
+        rows = []
+        for key in os.listdir(self.directory):
+            path = self._path(key)
+            if key.startswith('.') or not os.path.isdir(path):
+                continue
+            try:
+                with open(os.path.join(path, 'entry.json')) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            rows.append({'key': key, 'created': entry['created'],
+                         'last_access': entry['last_access'],
+                         'size': _dir_size(path)})
+        return pd.DataFrame(rows, columns=['key', 'created', 'last_access',
+                                           'size'])
+
+    def clean_tmp(self, max_age=TMP_MAX_AGE):
+        """Removes temporary directories of interrupted writes, which are
+        older than max_age [s] (younger ones might be written by a parallel
+        run)."""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = self._path(name)
+            if not name.startswith('.tmp_'):
+                continue
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+    def evict(self):
+        """Removes the least recently used entries, until the size of the
+        store is below max_bytes, and old temporary directories."""
+        self.clean_tmp()
+        if self.max_bytes is None:
+            return
+
+        entries = self.entries().sort_values('last_access')
+        total = entries['size'].sum()
+        for key, size in zip(entries['key'], entries['size']):
+            if total <= self.max_bytes:
+                break
+            logging.info('Result store: evict %s', key)
+            self.invalidate(key)
+            total -= size
+
+    def invalidate(self, key=None):
+        """Removes an entry (None: all entries)."""
+        if key is None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+        else:
+            shutil.rmtree(self._path(key), ignore_errors=True)
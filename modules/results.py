@@ -0,0 +1,233 @@
+"""
+oemof application for research project quarree100.
+
+Extraction of the processed oemof results into columnar DataFrames, which
+are indexed by the fields of the node labels.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import logging
+import numpy as np
+import pandas as pd
+from oemof.solph.network import Bus
+from modules.oemof_heatpipe import Label
+
+LABEL_FIELDS = ['tag1', 'tag2', 'tag3', 'tag4']
+
+# look-up table for size classes - example for given pressure loss and delta T
+DN_LOOKUP = pd.DataFrame(data=[[0, 0.1, '0'],
+                               [0.1, 20, 'DN 20'],
+                               [20.1, 30, 'DN 25'],
+                               [30.1, 54, 'DN 32'],
+                               [54.1, 90, 'DN 40'],
+                               [90.1, 156, 'DN 50'],
+                               [156.1, 300, 'DN 65'],
+                               [300.1, 507, 'DN 80'],
+                               [507.1, 900, 'DN 100'],
+                               [900.1, 1630, 'DN 125'],
+                               [1630.1, 2660, 'DN 150'],
+                               [2660.1, 5850, 'DN 200']],
+                         columns=['min', 'max', 'DN'])
+
+
+def _label_fields(node):
+    """Returns the label of a node as tuple of the four label fields."""
+    label = node.label
+    if isinstance(label, (Label, tuple)) and len(label) == 4:
+        return tuple(label)
+    return str(label), None, None, None
+
+
+def label_index(fields):
+    """MultiIndex of the label fields (also for an empty list)."""
+    if not fields:
+        return pd.MultiIndex.from_arrays([[]] * len(LABEL_FIELDS),
+                                         names=LABEL_FIELDS)
+    return pd.MultiIndex.from_tuples(fields, names=LABEL_FIELDS)
+
+
+def extract_results(results):
+    """
+    Walks the processed results once and collects the investments and the
+    flow time series.
+
+    :param results: results of oemof.outputlib.processing.results
+    :return: dict with
+             'invest' - pd.DataFrame of the investments with the index
+             tag1-tag4 of the component and the columns 'invest', 'type'
+             (class name of component), 'bus' (label of connected bus,
+             None for investments of the component itself), 'line' and
+             'reverse' (line of line layer and orientation of heatpipes) and
+             'id' (id of label in oemof_heatpipe.LABELS, -1 for other
+             labels),
+             'flows' - pd.DataFrame of the flow time series with the column
+             levels tag1-tag4 of the component, 'direction' ('in': from bus
+             to component, 'out': from component to bus) and 'bus'
+    """
+    invest_index = []
+    invest_rows = []
+    flow_columns = []
+    flow_values = []
+    index = None
+
+    for (a, b), res in results.items():
+
+        if b is None:
+            # variables of the component itself
+            component, bus, direction = a, None, None
+        elif isinstance(a, Bus):
+            component, bus, direction = b, a, 'in'
+        else:
+            component, bus, direction = a, b, 'out'
+
+        fields = _label_fields(component)
+        bus_label = None if bus is None else str(bus.label)
+
+        scalars = res.get('scalars')
+        if scalars is not None and 'invest' in scalars.index:
+            invest_index.append(fields)
+            invest_rows.append((float(scalars['invest']),
+                                type(component).__name__, bus_label,
+                                getattr(component, 'line', None),
+                                getattr(component, 'reverse', None),
+                                getattr(component.label, 'id', -1)))
+
+        seq = res.get('sequences')
+        if direction is not None and seq is not None and 'flow' in seq:
+            flow_columns.append(fields + (direction, bus_label))
+            flow_values.append(seq['flow'].values)
+            if index is None:
+                index = seq.index
+
+    invest = pd.DataFrame(
+        invest_rows, columns=['invest', 'type', 'bus', 'line', 'reverse',
+                                 'id'],
+        index=label_index(invest_index))
+
+    if flow_values:
+        flows = pd.DataFrame(
+            dict(enumerate(flow_values)), index=index)
+        flows.columns = pd.MultiIndex.from_tuples(
+            flow_columns, names=LABEL_FIELDS + ['direction', 'bus'])
+    else:
+        flows = pd.DataFrame(index=index)
+
+    return {'invest': invest, 'flows': flows}
+
+
+def heatpipe_invest(invest):
+    """
+    :param invest: investments of extract_results
+    :return: pd.DataFrame of the investments of all heatpipes with the
+             columns 'label' (tag4 of label, "<id_start>-<id_end>"), 'tag3'
+             (type of pipe) and 'invest'
+    """
+    pipes = invest[invest['type'].isin(['HeatPipeline',
+                                        'BidirectionalHeatPipeline'])]
+    return pd.DataFrame({
+        'label': pipes.index.get_level_values('tag4'),
+        'tag3': pipes.index.get_level_values('tag3'),
+        'invest': pipes['invest'].values})
+
+
+def transformer_invest(invest, tag3='boiler'):
+    """
+    Sums the investments of transformers (e.g. boilers) per tag1 (house,
+    generation).
+
+    :param invest: investments of extract_results
+    :param tag3: part of tag3 of the transformer labels
+    :return: pd.Series of the invested capacity per tag1
+    """
+    tags = invest.index.get_level_values('tag3').astype(str)
+    selected = invest[tags.str.contains(tag3, regex=False)]
+    return selected['invest'].groupby(level='tag1').sum()
+
+
+def map_line_results(lines, invest):
+    """
+    Attaches the invested capacities of the heatpipes to the line layer in
+    one indexed pass (using the line ids of the heatpipes).
+
+    :param lines: line layer, which was input of add_nodes_dhs
+    :param invest: investments of extract_results
+    :return: copy of line layer with the columns 'size_1' (capacity from
+             id_start to id_end, including bidirectional heatpipes) and
+             'size_2' (capacity from id_end to id_start)
+    """
+    pipes = invest[invest['line'].notnull()]
+
+    pos = lines.index.get_indexer(pipes['line'].values)
+    if (pos < 0).any():
+        logging.warning('%s heatpipes refer to unknown lines.',
+                        (pos < 0).sum())
+    valid = pos >= 0
+
+    size = np.zeros((len(lines), 2))
+    np.add.at(size, (pos[valid],
+                     pipes['reverse'].values[valid].astype(bool).astype(int)),
+              pipes['invest'].values[valid])
+
+    df = lines.copy()
+    df['size_1'] = size[:, 0]
+    df['size_2'] = size[:, 1]
+
+    return df
+
+
+def add_size_classes(lines, lookup=DN_LOOKUP):
+    """
+    Adds the total capacity ('size') and the DN class ('size_class') to a
+    line layer with the columns 'size_1' and 'size_2'.
+    """
+    lines['size'] = np.round(lines['size_1'] + lines['size_2'])
+    lines['size_class'] = pd.cut(
+        lines['size'],
+        bins=[0] + lookup['max'].tolist(),
+        labels=lookup['DN'].tolist())
+
+    return lines
+
+
+def write_line_results(lines, path, shapefile=None):
+    """
+    Writes the line layer with results. The format is chosen by the file
+    extension: .parquet, .gpkg (geometry of the shapefile of the line layer
+    is required) or .csv.
+
+    :param lines: line layer (in the order of the shapefile for .gpkg)
+    :param path: path of output file
+    :param shapefile: shapefile of the line layer (for .gpkg)
+    """
+    if path.endswith('.parquet'):
+        df = lines.copy()
+        df['size_class'] = df['size_class'].astype(str)
+        df.to_parquet(path)
+
+    elif path.endswith('.gpkg'):
+        to_geodataframe(lines, shapefile).to_file(path, driver='GPKG')
+
+    else:
+        lines.to_csv(path)
+
+
+def to_geodataframe(lines, shapefile):
+    """
+    Combines the line layer with results with the geometry of the shapefile
+    of the line layer (the records of .shp and .dbf have the same order).
+    """
+    import geopandas as gpd
+
+    geo = gpd.read_file(shapefile)
+    if len(geo) != len(lines):
+        raise ValueError('Line layer and shapefile {} differ in number of '
+                         'lines.'.format(shapefile))
+
+    return gpd.GeoDataFrame(lines.reset_index(drop=True),
+                            geometry=geo.geometry.values, crs=geo.crs)
@@ -0,0 +1,190 @@
+"""
+oemof application for research project quarree100.
+
+Parallel runs of scenarios, which differ in cost and demand parameters of
+the general data, the heatpipe options and the house/generation sheets.
+
+A scenario is a dict of overrides, whose keys are paths of the parameters:
+
+ * 'gd.<key>' - general data, e.g. 'gd.rate'
+ * 'heatpipe_options.<column>' - column of the heatpipe options, e.g.
+   'heatpipe_options.capex_pipes'
+ * 'houses.<sheet>.<column>' / 'generation.<sheet>.<column>' - column of a
+   sheet of the general house/generation data, e.g.
+   'generation.transformer.capex'
+ * 'houses.series.scale' - scaling factor of the demand series
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import itertools
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+from modules.input_data import load_input_data, CACHE_DIR
+from modules.pipeline import solve_configuration
+from modules.result_store import ResultStore
+
+# input data of a worker process (loaded once per worker)
+_worker_data = {}
+
+
+def scenario_grid(axes):
+    """
+    :param axes: dict {parameter path: list of values}
+    :return: list of scenarios (all combinations of the values)
+    """
+    keys = list(axes)
+    return [dict(zip(keys, values))
+            for values in itertools.product(*[axes[k] for k in keys])]
+
+
+def apply_scenario(input_data, gd, scenario):
+    """
+    Applies the overrides of a scenario to copies of the input data and the
+    general data.
+
+    :param input_data: input data (see input_data.load_input_data)
+    :param gd: general data
+    :param scenario: dict of overrides
+    :return: input_data, gd (copies with overrides)
+    """
+    gd = dict(gd)
+    data = {
+        'qgis_data': input_data['qgis_data'],
+        'gd_infra': {'heatpipe_options':
+                     input_data['gd_infra']['heatpipe_options'].copy()},
+    }
+    for key in ['data_houses', 'data_generation']:
+        data[key] = {
+            'general_data': {k: v.copy() for k, v in
+                             input_data[key]['general_data'].items()},
+            'individual_data': input_data[key]['individual_data'],
+            'series_data': dict(input_data[key]['series_data'])}
+
+    for path, val in scenario.items():
+        parts = path.split('.')
+
+        if parts[0] == 'gd':
+            gd[parts[1]] = val
+
+        elif parts[0] == 'heatpipe_options':
+            data['gd_infra']['heatpipe_options'][parts[1]] = val
+
+        elif parts[0] in ['houses', 'generation'] and parts[1] == 'series':
+            if parts[2] != 'scale':
+                raise ValueError('Unknown scenario parameter: {}'.format(path))
+            series = data['data_' + parts[0]]['series_data']
+            for k, v in series.items():
+                v = v.copy()
+                columns = v.select_dtypes(include='number').columns
+                v[columns] = v[columns] * val
+                series[k] = v
+
+        elif parts[0] in ['houses', 'generation']:
+            data['data_' + parts[0]]['general_data'][parts[1]][parts[2]] = val
+
+        else:
+            raise ValueError('Unknown scenario parameter: {}'.format(path))
+
+    return data, gd
+
+
+def _init_worker(data_dir, cache_dir, threads):
+    """Loads the input data once per worker process."""
+    if threads is not None:
+        os.environ['OMP_NUM_THREADS'] = str(threads)
+    _worker_data['input_data'] = load_input_data(data_dir,
+                                                 cache_dir=cache_dir)
+
+
+def run_scenario(scenario, gd, solver=None, threads=1, solver_options=None,
+                 input_data=None, store_dir=None):
+    """
+    Builds and solves one scenario.
+
+    :param scenario: dict of overrides
+    :param gd: general data of base scenario
+    :param solver: name of solver (None: first available solver)
+    :param threads: number of threads of the solver
+    :param solver_options: further settings of run_solver (mip_gap,
+                           time_limit, node_limit, options)
+    :param input_data: input data (default: input data of worker process)
+    :param store_dir: directory of the result store (None: no result store)
+    :return: dict of scenario parameters and results
+    """
+    if input_data is None:
+        input_data = _worker_data['input_data']
+
+    data, gd_s = apply_scenario(input_data, gd, scenario)
+
+    row = dict(scenario)
+    t0 = time.perf_counter()
+
+    try:
+        store = ResultStore(store_dir) if store_dir is not None else None
+        res = solve_configuration(data, gd_s, store=store, solver=solver,
+                                  threads=threads, **(solver_options or {}))
+
+        info = res['meta']['solver']
+        row['solver'] = info['solver']
+        row['status'] = info['termination']
+        row['bound'] = info['bound']
+        row['solve_time'] = info['wall_time']
+        row['cached'] = res['meta']['cached']
+        row.update(res['meta']['summary'])
+
+    except Exception as e:
+        logging.exception('Scenario %s failed.', scenario)
+        row['status'] = 'error: {}'.format(e)
+
+    row['time'] = time.perf_counter() - t0
+
+    return row
+
+
+def run_scenarios(scenarios, gd, data_dir='data', cache_dir=CACHE_DIR,
+                  workers=None, threads=1, solver=None,
+                  solver_options=None, store_dir=None):
+    """
+    Runs scenarios in a process pool. Each worker loads the input data once
+    and reuses it for all its scenarios.
+
+    :param scenarios: list of scenarios (see scenario_grid)
+    :param gd: general data of base scenario
+    :param data_dir: directory of the input data
+    :param cache_dir: directory of the input cache
+    :param workers: number of worker processes (default: number of CPUs
+                    divided by threads)
+    :param threads: number of threads per solve
+    :param solver: name of solver (None: first available solver)
+    :param solver_options: further settings of run_solver (mip_gap,
+                           time_limit, node_limit, options)
+    :param store_dir: directory of the result store (None: no result store)
+    :return: pd.DataFrame with one row per scenario
+    """
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // (threads or 1))
+
+    # parse the input files once, so that the workers read from the cache
+    if cache_dir is not None:
+        load_input_data(data_dir, cache_dir=cache_dir)
+
+    logging.info('Run %s scenarios with %s workers.', len(scenarios), workers)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(data_dir, cache_dir, threads)) as ex:
+        futures = [ex.submit(run_scenario, s, gd, solver, threads,
+                             solver_options, None, store_dir)
+                   for s in scenarios]
+        rows = [f.result() for f in futures]
+
+    return pd.DataFrame(rows)
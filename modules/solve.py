@@ -0,0 +1,539 @@
+"""
+oemof application for research project quarree100.
+
+Solution strategies for the (mixed integer) investment model of the district
+heating system.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import logging
+import time
+import pandas as pd
+from pyomo.environ import (Constraint, Reals, SolverFactory, Var, minimize,
+                           value)
+
+from oemof.solph.network import Bus
+from modules import oemof_heatpipe as oh
+
+
+# blocks, which contain constraints of the heatpipe investments
+PIPE_BLOCKS = ['InvestmentFlow', 'HeatPipelineInvestBlock',
+               'BidirectionalHeatPipelineBlock']
+
+
+# solvers in order of preference (if solver is not specified)
+SOLVER_PREFERENCE = ['gurobi', 'highs', 'cbc', 'glpk']
+
+# names of the solvers within pyomo
+PYOMO_SOLVER = {'highs': 'appsi_highs'}
+
+# termination conditions of the solvers without a (loaded) solution
+NO_SOLUTION = ['infeasible', 'unbounded', 'infeasibleOrUnbounded',
+               'invalidProblem', 'noSolution', 'solverFailure',
+               'internalSolverError', 'error']
+
+# option names of the solvers for threads, relative mip gap, time limit [s]
+# and node limit (None: not supported)
+SOLVER_OPTIONS = {
+    'gurobi': {'threads': 'Threads', 'mip_gap': 'MIPGap',
+               'time_limit': 'TimeLimit', 'node_limit': 'NodeLimit'},
+    'highs': {'threads': 'threads', 'mip_gap': 'mip_rel_gap',
+              'time_limit': 'time_limit', 'node_limit': 'mip_max_nodes'},
+    'cbc': {'threads': 'threads', 'mip_gap': 'ratioGap',
+            'time_limit': 'sec', 'node_limit': 'maxNodes'},
+    'glpk': {'threads': None, 'mip_gap': 'mipgap',
+             'time_limit': 'tmlim', 'node_limit': None},
+}
+
+
+def _solver_factory(solver):
+    name = PYOMO_SOLVER.get(solver, solver)
+    if name.startswith('appsi_'):
+        return SolverFactory(name)
+    return SolverFactory(name, solver_io='lp')
+
+
+def solver_available(solver):
+    """Checks, whether a solver (and its license) is available."""
+    try:
+        opt = _solver_factory(solver)
+        if not opt.available(exception_flag=False):
+            return False
+        if hasattr(opt, 'license_is_valid'):
+            return bool(opt.license_is_valid())
+        return True
+    except Exception:
+        return False
+
+
+def available_solvers(preference=SOLVER_PREFERENCE):
+    """Returns the available solvers in order of preference."""
+    return [s for s in preference if solver_available(s)]
+
+
+def solver_options(solver, threads=None, mip_gap=None, time_limit=None,
+                   node_limit=None, options=None):
+    """
+    Translates the uniform solver settings into the options of a solver.
+
+    :param solver: name of solver
+    :param threads: number of threads
+    :param mip_gap: relative mip gap
+    :param time_limit: time limit [s]
+    :param node_limit: maximum number of branch-and-bound nodes
+    :param options: further (solver specific) options
+    :return: dict of solver options
+    """
+    names = SOLVER_OPTIONS.get(solver, {})
+    settings = {'threads': threads, 'mip_gap': mip_gap,
+                'time_limit': time_limit, 'node_limit': node_limit}
+
+    opts = {}
+    for key, val in settings.items():
+        if val is None:
+            continue
+        if names.get(key) is None:
+            logging.warning('Option %s is not supported by solver %s.',
+                            key, solver)
+            continue
+        opts[names[key]] = val
+
+    opts.update(options or {})
+
+    return opts
+
+
+def select_solver(solver=None, preference=SOLVER_PREFERENCE):
+    """
+    Returns the given solver, if it is available, otherwise the first
+    available solver of the preference list.
+    """
+    candidates = [solver] if solver is not None else []
+    candidates += [s for s in preference if s not in candidates]
+
+    for name in candidates:
+        if solver_available(name):
+            return name
+        logging.warning('Solver %s is not available.', name)
+
+    raise RuntimeError('None of the solvers {} is available.'.format(
+        candidates))
+
+
+def run_solver(om, solver=None, threads=None, mip_gap=None, time_limit=None,
+               node_limit=None, options=None, solve_kwargs=None,
+               preference=SOLVER_PREFERENCE, opt=None):
+    """
+    Solves the model with a uniform configuration of the solvers. If no
+    solver is given or the given solver is not available, the first
+    available solver of the preference list is used.
+
+    :param om: solph.Model
+    :param solver: name of solver (gurobi, highs, cbc, glpk)
+    :param threads: number of threads
+    :param mip_gap: relative mip gap
+    :param time_limit: time limit [s]
+    :param node_limit: maximum number of branch-and-bound nodes
+    :param options: further (solver specific) options
+    :param solve_kwargs: kwargs of pyomo's solve method (e.g. tee)
+    :param preference: solvers in order of preference
+    :param opt: pyomo solver instance of the given solver (e.g. a persistent
+                solver, which is kept between the solves), which is used
+                instead of a new instance
+    :return: dict with 'solver', 'status', 'termination', 'objective'
+             (incumbent, None without solution), 'bound', 'wall_time' and
+             'results' (pyomo results)
+    """
+    if opt is not None:
+        name = solver
+    else:
+        name = select_solver(solver, preference)
+        opt = _solver_factory(name)
+
+    for key, val in solver_options(name, threads, mip_gap, time_limit,
+                                   node_limit, options).items():
+        opt.options[key] = val
+
+    solve_kwargs = dict(solve_kwargs or {})
+
+    t0 = time.perf_counter()
+    results = opt.solve(om, **solve_kwargs)
+    wall_time = time.perf_counter() - t0
+
+    # same as solph.Model.solve
+    om.es.results = results
+    om.solver_results = results
+
+    status = str(results.solver.status)
+    termination = str(results.solver.termination_condition)
+    if termination != 'optimal':
+        logging.warning('Solver %s terminated with status %s (%s).',
+                        name, status, termination)
+
+    if om.objective.sense == minimize:
+        bound = getattr(results.problem, 'lower_bound', None)
+    else:
+        bound = getattr(results.problem, 'upper_bound', None)
+
+    # the variables keep the values of a previous solve, if there is no
+    # solution
+    if termination in NO_SOLUTION:
+        objective = None
+    else:
+        objective = value(om.objective, exception=False)
+
+    return {'solver': name,
+            'status': status,
+            'termination': termination,
+            'objective': objective,
+            'bound': _number(bound),
+            'wall_time': wall_time,
+            'results': results}
+
+
+def _number(x):
+    try:
+        return float(x.value if hasattr(x, 'value') else x)
+    except (TypeError, ValueError):
+        return None
+
+
+def invest_pipes(om):
+    """
+    Returns the investment variables of all heatpipes with investment.
+
+    :param om: solph.Model
+    :return: dict {heatpipe: (invest variable, binary variable or None)}
+    """
+    status = getattr(om.InvestmentFlow, 'invest_status', None) \
+        if hasattr(om, 'InvestmentFlow') else None
+
+    pipes = {}
+    for n in om.es.nodes:
+        if isinstance(n, oh.HeatPipeline) and n._invest_group:
+            o = next(iter(n.outputs))
+            y = status[n, o] if status is not None and \
+                (n, o) in status else None
+            pipes[n] = (om.InvestmentFlow.invest[n, o], y)
+
+        elif isinstance(n, oh.BidirectionalHeatPipeline):
+            block = om.BidirectionalHeatPipelineBlock
+            y = block.invest_status[n] if n in \
+                block.NONCONVEX_BIDIRECTIONALHEATPIPES else None
+            pipes[n] = (block.invest[n], y)
+
+    return pipes
+
+
+def relax_integrality(om):
+    """
+    Relaxes all binary and integer variables of the model.
+
+    :return: list of (variable, domain, lower bound, upper bound) to restore
+             the integrality with restore_integrality
+    """
+    relaxed = []
+    for v in om.component_data_objects(Var):
+        if v.is_binary() or v.is_integer():
+            lb, ub = v.lb, v.ub
+            relaxed.append((v, v.domain, lb, ub))
+            v.domain = Reals
+            v.setlb(lb)
+            v.setub(ub)
+    return relaxed
+
+
+def restore_integrality(relaxed):
+    for v, domain, lb, ub in relaxed:
+        v.domain = domain
+        v.setlb(lb)
+        v.setub(ub)
+
+
+def _pipe_flows(om, n):
+    """Returns all flow variables of the in- and outflows of a heatpipe."""
+    flows = [(i, n) for i in n.inputs] + [(n, o) for o in n.outputs]
+    return [om.flow[i, o, t] for i, o in flows for t in om.TIMESTEPS]
+
+
+def fix_pipes(om, nodes):
+    """
+    Fixes the heatpipes to "not built": the investment, binary and flow
+    variables are fixed to zero and the constraints of the heatpipe blocks
+    and the investment flows, which only refer to these heatpipes, are
+    deactivated.
+
+    :param om: solph.Model
+    :param nodes: heatpipes to be fixed
+    """
+    nodes = set(nodes)
+    pipes = invest_pipes(om)
+
+    for n in nodes:
+        invest, y = pipes[n]
+        invest.fix(0)
+        if y is not None:
+            y.fix(0)
+        for v in _pipe_flows(om, n):
+            v.fix(0)
+
+    for name in PIPE_BLOCKS:
+        block = getattr(om, name, None)
+        if block is None:
+            continue
+        for c in block.component_objects(Constraint, descend_into=False):
+            for idx in c:
+                if idx is None:
+                    continue
+                key = idx if isinstance(idx, tuple) else (idx,)
+                if nodes.intersection(key):
+                    c[idx].deactivate()
+
+    # heat loss variables of the fixed pipes
+    for name, pipe_set in [('HeatPipelineInvestBlock', 'INVESTHEATLOSSPIPES'),
+                           ('BidirectionalHeatPipelineBlock',
+                            'BIDIRECTIONALHEATPIPES')]:
+        block = getattr(om, name, None)
+        if block is None:
+            continue
+        for n in nodes.intersection(getattr(block, pipe_set)):
+            for t in om.TIMESTEPS:
+                block.heat_loss[n, t].fix(0)
+
+
+def two_phase_solve(om, solver=None, solve_kwargs=None,
+                    cmdline_options=None, threshold=1e-6, **settings):
+    """
+    Solves the investment model in two phases:
+
+    1. the LP relaxation of the model is solved.
+    2. all heatpipes without relaxed investment and flow are fixed to
+       "not built" and the (smaller) MILP is solved.
+
+    The objective of the LP relaxation is a lower bound of the full MILP, so
+    the gap between both phases is an upper bound of the error caused by the
+    pruning.
+
+    :param om: solph.Model
+    :param solver: name of solver (see run_solver)
+    :param solve_kwargs: kwargs of pyomo's solve method
+    :param cmdline_options: options of the solver
+    :param threshold: pipes with relaxed investment and summed flow below the
+                      threshold are fixed
+    :param settings: uniform solver settings of run_solver (threads,
+                     mip_gap, time_limit, node_limit)
+    :return: dict with 'lp_bound', 'objective', 'gap' (None, if one of the
+             phases has no solution), 'n_pipes', 'pruned' (labels of fixed
+             pipes) and the solver info of both phases
+    """
+
+    pipes = invest_pipes(om)
+
+    # phase 1: LP relaxation
+    logging.info('Two-phase solve: LP relaxation')
+    relaxed = relax_integrality(om)
+    results_lp = run_solver(om, solver=solver, options=cmdline_options,
+                            solve_kwargs=solve_kwargs, **settings)
+    lp_bound = results_lp['objective']
+
+    pruned = []
+    if results_lp['termination'] != 'optimal' or lp_bound is None:
+        # no relaxed solution: the pipes can not be pruned
+        logging.warning('Two-phase solve: LP relaxation not solved, no '
+                        'heatpipes are fixed.')
+        lp_bound = None
+    else:
+        for n, (invest, y) in pipes.items():
+            flow = sum(v.value or 0 for v in _pipe_flows(om, n))
+            if (invest.value or 0) <= threshold and flow <= threshold:
+                pruned.append(n)
+
+    restore_integrality(relaxed)
+
+    # phase 2: MILP without pruned pipes
+    logging.info('Two-phase solve: %s of %s heatpipes fixed to zero',
+                 len(pruned), len(pipes))
+    fix_pipes(om, pruned)
+
+    results_milp = run_solver(om, solver=solver, options=cmdline_options,
+                              solve_kwargs=solve_kwargs, **settings)
+    # None, if the MILP has no solution (e.g. infeasible or time limit)
+    objective = results_milp['objective']
+
+    if objective is None or lp_bound is None:
+        gap = None
+        logging.warning('Two-phase solve: no gap, LP bound %s, objective %s',
+                        lp_bound, objective)
+    else:
+        gap = (objective - lp_bound) / abs(objective) if objective else 0
+        logging.info('Two-phase solve: LP bound %.2f, objective %.2f, gap '
+                     '%.2f %%', lp_bound, objective, gap * 100)
+
+    return {'lp_bound': lp_bound,
+            'objective': objective,
+            'gap': gap,
+            'n_pipes': len(pipes),
+            'pruned': [str(n.label) for n in pruned],
+            'results_lp': results_lp,
+            'results_milp': results_milp}
+
+
+def invest_variables(om):
+    """
+    Returns the investment variables of all investment flows (e.g. heatpipes
+    and boilers) and all bidirectional heatpipes of the model.
+
+    :param om: solph.Model
+    :return: dict {(label string of input, label string of output): (invest
+             variable, binary variable or None)}, components with their own
+             investment (bidirectional heatpipes) have the key (label
+             string, None)
+    """
+    variables = {}
+
+    # the block exists without variables, if there are no investment flows
+    if hasattr(getattr(om, 'InvestmentFlow', None), 'invest'):
+        status = getattr(om.InvestmentFlow, 'invest_status', None)
+        for i, o in om.InvestmentFlow.invest:
+            y = status[i, o] if status is not None and \
+                (i, o) in status else None
+            variables[str(i.label), str(o.label)] = \
+                (om.InvestmentFlow.invest[i, o], y)
+
+    for n, v in invest_pipes(om).items():
+        if isinstance(n, oh.BidirectionalHeatPipeline):
+            variables[str(n.label), None] = v
+
+    return variables
+
+
+def invest_solution(om):
+    """
+    Returns the investment values of a solved model, which can be used as
+    initial solution of a following run.
+
+    :param om: solved solph.Model
+    :return: pd.Series {(label string of input, label string of output):
+             invested capacity}
+    """
+    solution = {k: v.value or 0 for k, (v, y) in invest_variables(om).items()}
+    return pd.Series(list(solution.values()), name='invest',
+                     index=pd.MultiIndex.from_tuples(
+                         list(solution), names=['input', 'output']))
+
+
+def write_invest_solution(om, path):
+    """Writes the investment values of a solved model to a csv file."""
+    invest_solution(om).to_csv(path, header=True)
+
+
+def read_invest_solution(path):
+    """Reads investment values written by write_invest_solution."""
+    df = pd.read_csv(path, dtype={'input': str, 'output': str})
+    return pd.Series(df['invest'].values, name='invest',
+                     index=[(i, None if pd.isnull(o) else o)
+                            for i, o in zip(df['input'], df['output'])])
+
+
+def _flow_key(key):
+    """(input, output) of Labels, tuples or label strings as strings."""
+    def label(x):
+        # None is NaN in the index of invest_solution
+        if x is None or (isinstance(x, float) and pd.isnull(x)):
+            return None
+        return str(oh.Label(*x)) if isinstance(x, tuple) else str(x)
+
+    i, o = key
+    return label(i), label(o)
+
+
+def set_initial_solution(om, solution, threshold=1e-6):
+    """
+    Sets the values of the investment (and binary) variables as initial
+    solution for the solver.
+
+    :param om: solph.Model
+    :param solution: mapping {(input, output): invested capacity}, the
+                     labels can be given as Label, tuple or label string
+                     (e.g. the result of invest_solution or
+                     read_invest_solution), output None for components
+                     with their own investment
+    :param threshold: investments below the threshold are set to "not built"
+    :return: number of variables, which have been initialised
+    """
+    solution = {_flow_key(k): v for k, v in dict(solution).items()}
+
+    count = 0
+    for key, (invest, y) in invest_variables(om).items():
+        if key not in solution:
+            continue
+        p = float(solution[key])
+        built = p > threshold
+        invest.value = p if built else 0
+        if y is not None:
+            y.value = int(built)
+        count += 1
+
+    logging.info('Initial solution: %s of %s investments set.',
+                 count, len(solution))
+
+    return count
+
+
+def warm_start_capable(solver):
+    """Checks, whether the solver interface of pyomo supports warm starts."""
+    try:
+        opt = _solver_factory(solver)
+        return bool(opt.available(exception_flag=False) and
+                    opt.warm_start_capable())
+    except Exception:
+        return False
+
+
+def warm_start_solve(om, solution, solver=None, solve_kwargs=None,
+                     cmdline_options=None, **settings):
+    """
+    Solves the model with an initial solution (e.g. of a previous run of a
+    slightly changed network or of a parameter sweep).
+
+    Only the investment and binary variables are initialised, the solver
+    completes the start with the flows (e.g. CBC fixes the binary variables
+    of the start and solves the remaining LP).
+
+    If the solver interface does not support warm starts (e.g. GLPK or
+    HiGHS via appsi in the supported pyomo versions), the model is solved
+    cold.
+
+    :param om: solph.Model
+    :param solution: initial solution (see set_initial_solution)
+    :param solver: name of solver (default: first available solver, which
+                   supports warm starts)
+    :param solve_kwargs: kwargs of pyomo's solve method
+    :param cmdline_options: options of the solver
+    :param settings: uniform solver settings of run_solver (threads,
+                     mip_gap, time_limit, node_limit)
+    :return: solver info of run_solver
+    """
+    solve_kwargs = dict(solve_kwargs or {})
+
+    if solver is None:
+        solvers = available_solvers()
+        capable = [x for x in solvers if warm_start_capable(x)]
+        solver = (capable or solvers or [None])[0]
+
+    set_initial_solution(om, solution)
+
+    if warm_start_capable(solver):
+        solve_kwargs['warmstart'] = True
+    else:
+        logging.warning('Solver %s does not support warm starts: cold start.',
+                        solver)
+
+    return run_solver(om, solver=solver, options=cmdline_options,
+                      solve_kwargs=solve_kwargs, **settings)
@@ -0,0 +1,247 @@
+"""
+oemof application for research project quarree100.
+
+Generator of synthetic district heating networks (point and line layer,
+demand series) in the schema of the Hombeer example, e.g. for scaling
+benchmarks.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import datetime
+import os
+import shutil
+import struct
+import numpy as np
+import pandas as pd
+
+
+def _find(parent, x):
+    while parent[x] != x:
+        parent[x] = parent[parent[x]]
+        x = parent[x]
+    return x
+
+
+def generate_layers(n_houses, meshing=0.0, houses_per_knot=2, seed=0):
+    """
+    Generates point and line layer of a street grid.
+
+    The infrastructure points (K) are arranged on a square grid. The DL lines
+    form a random spanning tree of the grid, to which a share of the
+    remaining grid edges is added (meshing). Each knot connects up to
+    `houses_per_knot` houses (HL), one generation site (G) is connected to a
+    corner of the grid (GL).
+
+    :param n_houses: number of houses
+    :param meshing: share of the grid edges, which are not part of the
+                    spanning tree, that are added as DL lines (0: tree, 1:
+                    full grid)
+    :param houses_per_knot: number of houses per infrastructure point
+    :param seed: seed of random generator
+    :return: points, lines (pd.DataFrame in the schema of the qgis layers)
+    """
+    rng = np.random.RandomState(seed)
+
+    n_k = max(1, int(np.ceil(n_houses / houses_per_knot)))
+    side = int(np.ceil(np.sqrt(n_k)))
+
+    # grid edges between neighbouring knots
+    idx = np.arange(n_k)
+    x, y = idx % side, idx // side
+    right = idx[(x < side - 1) & (idx + 1 < n_k)]
+    down = idx[idx + side < n_k]
+    edges = np.vstack([np.column_stack([right, right + 1]),
+                       np.column_stack([down, down + side])])
+    edges = edges[rng.permutation(len(edges))]
+
+    # random spanning tree (kruskal with random order)
+    parent = list(range(n_k))
+    tree = np.zeros(len(edges), dtype=bool)
+    for k, (a, b) in enumerate(edges):
+        ra, rb = _find(parent, a), _find(parent, b)
+        if ra != rb:
+            parent[ra] = rb
+            tree[k] = True
+
+    extra = np.flatnonzero(~tree)
+    n_extra = int(round(meshing * len(extra)))
+    dl = edges[np.concatenate([np.flatnonzero(tree), extra[:n_extra]])]
+
+    k_ids = np.array(['K' + str(i) for i in range(n_k)], dtype=object)
+    h_ids = np.array(['H' + str(i) for i in range(n_houses)], dtype=object)
+
+    points = pd.DataFrame({
+        'id': np.concatenate([h_ids, k_ids, ['G0']]),
+        'type': ['H'] * n_houses + ['K'] * n_k + ['G'],
+        'osm_id': '',
+        'ind': np.concatenate([np.full(n_houses, np.nan), np.arange(n_k),
+                               [np.nan]])})
+
+    lines_dl = pd.DataFrame({'type': 'DL',
+                             'id_start': k_ids[dl[:, 0]],
+                             'id_end': k_ids[dl[:, 1]],
+                             'length': rng.uniform(10, 60, len(dl))})
+
+    lines_hl = pd.DataFrame({'type': 'HL',
+                             'id_start': k_ids[np.arange(n_houses) //
+                                               houses_per_knot],
+                             'id_end': h_ids,
+                             'length': rng.uniform(8, 30, n_houses)})
+
+    lines_gl = pd.DataFrame({'type': 'GL', 'id_start': ['K0'],
+                             'id_end': ['G0'], 'length': [20.0]})
+
+    lines = pd.concat([lines_dl, lines_hl, lines_gl], ignore_index=True)
+    lines.insert(0, 'id', '')
+    lines.insert(1, 'hinweis', '')
+
+    return points, lines[['id', 'hinweis', 'type', 'id_start', 'id_end',
+                          'length']]
+
+
+def generate_heat_series(house_ids, n_timesteps, time_res=1, peak=(5, 25),
+                         seed=0):
+    """
+    Generates heat demand series of houses with a seasonal and a daily
+    profile, a random peak load per house and noise.
+
+    :param house_ids: ids of the houses
+    :param n_timesteps: number of timesteps
+    :param time_res: time resolution [1/h]
+    :param peak: range of peak loads [kW]
+    :return: pd.DataFrame with the column 'timestamp' and one column per
+             house (schema of the sheet 'heat' of Timeseries_houses.xlsx)
+    """
+    rng = np.random.RandomState(seed)
+
+    hours = np.arange(n_timesteps) * time_res
+    season = 0.55 + 0.45 * np.cos(2 * np.pi * hours / 8760)
+    daily = 0.8 + 0.2 * np.sin(2 * np.pi * (hours % 24 - 6) / 24)
+    profile = season * daily
+
+    p_peak = rng.uniform(peak[0], peak[1], len(house_ids))
+    noise = 1 + 0.1 * rng.standard_normal((n_timesteps, len(house_ids)))
+    values = np.clip(profile[:, None] * p_peak[None, :] * noise, 0, None)
+
+    df = pd.DataFrame(values, columns=list(house_ids))
+    df.insert(0, 'timestamp', pd.date_range(
+        '1/1/2018', periods=n_timesteps,
+        freq='{}min'.format(int(60 * time_res))))
+
+    return df
+
+
+def synthetic_input_data(template, n_houses, meshing=0.0, n_timesteps=24,
+                         time_res=1, seed=0):
+    """
+    Synthetic input data in the structure of input_data.load_input_data.
+    The general data (technologies, heatpipe options) is taken from the
+    template.
+
+    :param template: input data (see input_data.load_input_data)
+    :param n_houses: number of houses
+    :param meshing: meshing degree (see generate_layers)
+    :param n_timesteps: number of timesteps of the demand series
+    :return: dict of input data
+    """
+    points, lines = generate_layers(n_houses, meshing=meshing, seed=seed)
+    houses = points.loc[points['type'] == 'H'].reset_index(drop=True)
+    generation = points.loc[points['type'] == 'G'].reset_index(drop=True)
+    series = generate_heat_series(houses['id'], n_timesteps,
+                                  time_res=time_res, seed=seed)
+
+    return {
+        'qgis_data': {'points': points, 'lines': lines},
+        'data_houses': {
+            'general_data': template['data_houses']['general_data'],
+            'individual_data': houses,
+            'series_data': {'heat': series}},
+        'data_generation': {
+            'general_data': template['data_generation']['general_data'],
+            'individual_data': generation,
+            'series_data': {}},
+        'gd_infra': template['gd_infra']}
+
+
+def write_dbf(df, path):
+    """
+    Writes a DataFrame as dBASE III table (attribute table of a shapefile),
+    which can be read with simpledbf. Numeric columns are written as N
+    fields, all others as C fields.
+    """
+    fields = []
+    for c in df.columns:
+        if pd.api.types.is_numeric_dtype(df[c]):
+            fields.append((c, 'N', 24, 15))
+        else:
+            fields.append((c, 'C', 80, 0))
+
+    n_records = len(df)
+    header_len = 32 + 32 * len(fields) + 1
+    record_len = 1 + sum(f[2] for f in fields)
+    today = datetime.date.today()
+
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<BBBBIHH20x', 3, today.year - 1900, today.month,
+                            today.day, n_records, header_len, record_len))
+        for name, typ, length, dec in fields:
+            f.write(struct.pack('<11sc4xBB14x', name.encode('ascii')[:10],
+                                typ.encode('ascii'), length, dec))
+        f.write(b'\r')
+
+        columns = [df[c].values for c in df.columns]
+        for k in range(n_records):
+            f.write(b' ')
+            for (name, typ, length, dec), col in zip(fields, columns):
+                v = col[k]
+                if typ == 'N':
+                    s = '' if pd.isnull(v) else '{:.{}f}'.format(v, dec)
+                    s = s[:length].rjust(length)
+                else:
+                    s = ('' if pd.isnull(v) else str(v))[:length].ljust(length)
+                f.write(s.encode('latin-1'))
+        f.write(b'\x1a')
+
+
+def write_input_data(input_data, data_dir, template_dir='data',
+                     name='synthetic'):
+    """
+    Writes synthetic input data in the file structure, which is expected by
+    input_data.load_input_data. The workbooks of the general data are
+    copied from the template directory.
+
+    :param input_data: synthetic input data (see synthetic_input_data)
+    :param data_dir: target directory
+    :param template_dir: directory of the template workbooks
+    :param name: name of the layers (Points_<name>.dbf, Lines_<name>.dbf)
+    :return: dict of kwargs of load_input_data
+    """
+    os.makedirs(os.path.join(data_dir, 'gis'), exist_ok=True)
+
+    files = {'points': 'gis/Points_{}.dbf'.format(name),
+             'lines': 'gis/Lines_{}.dbf'.format(name),
+             'houses': 'data_houses.xlsx',
+             'timeseries': 'Timeseries_houses.xlsx',
+             'generation': 'data_generation.xlsx',
+             'heatpipes': 'data_heatpipes.xlsx'}
+
+    write_dbf(input_data['qgis_data']['points'],
+              os.path.join(data_dir, files['points']))
+    write_dbf(input_data['qgis_data']['lines'],
+              os.path.join(data_dir, files['lines']))
+
+    with pd.ExcelWriter(os.path.join(data_dir, files['timeseries'])) as xls:
+        input_data['data_houses']['series_data']['heat'].to_excel(
+            xls, sheet_name='heat', index=False)
+
+    for key in ['houses', 'generation', 'heatpipes']:
+        shutil.copy(os.path.join(template_dir, files[key]),
+                    os.path.join(data_dir, files[key]))
+
+    return dict(data_dir=data_dir, **files)
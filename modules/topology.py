@@ -0,0 +1,640 @@
+"""
+oemof application for research project quarree100.
+
+Preprocessing of the network topology (point and line layer), which reduces
+the number of buses and heatpipes of the optimization model.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import logging
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+
+
+def _adjacency(lines):
+    """Returns dict {point id: set of line keys}."""
+    adj = defaultdict(set)
+    for k, line in lines.items():
+        adj[line['id_start']].add(k)
+        adj[line['id_end']].add(k)
+    return adj
+
+
+def _prune_dead_ends(lines, adj, point_type):
+    """
+    Removes infrastructure points with only one line (and this line)
+    iteratively, so that whole branches without house or generation are
+    removed.
+
+    :return: set of removed point ids
+    """
+    removed = set()
+    stack = [p for p, ls in adj.items()
+             if point_type.get(p) == 'K' and len(ls) <= 1]
+
+    while stack:
+        p = stack.pop()
+        if p in removed or len(adj[p]) > 1:
+            continue
+        removed.add(p)
+        for k in list(adj[p]):
+            line = lines.pop(k)
+            other = line['id_end'] if line['id_start'] == p else \
+                line['id_start']
+            adj[other].discard(k)
+            if point_type.get(other) == 'K' and len(adj[other]) <= 1:
+                stack.append(other)
+        del adj[p]
+
+    return removed
+
+
+def _contract_serial(lines, adj, point_type):
+    """
+    Contracts infrastructure points, which connect exactly two DL lines, by
+    merging both lines into one line with summed length.
+
+    :return: set of removed point ids
+    """
+    removed = set()
+    # existing connections (to avoid parallel lines with the same label)
+    pairs = {frozenset((x['id_start'], x['id_end'])) for x in lines.values()}
+
+    for p in list(adj):
+        if point_type.get(p) != 'K' or len(adj[p]) != 2:
+            continue
+
+        k1, k2 = sorted(adj[p])
+        l1, l2 = lines[k1], lines[k2]
+        if l1['type'] != 'DL' or l2['type'] != 'DL':
+            continue
+
+        # orient: a -> p -> b
+        a = l1['id_start'] if l1['id_end'] == p else l1['id_end']
+        b = l2['id_end'] if l2['id_start'] == p else l2['id_start']
+        if a == b or frozenset((a, b)) in pairs:
+            continue
+
+        fw1 = l1['id_end'] == p
+        fw2 = l2['id_start'] == p
+        members = [(m, f == fw1) for m, f in l1['members']] + \
+                  [(m, f == fw2) for m, f in l2['members']]
+
+        lines[k1] = {'type': 'DL', 'id_start': a, 'id_end': b,
+                     'length': l1['length'] + l2['length'],
+                     'members': members}
+        del lines[k2]
+
+        adj[b].discard(k2)
+        adj[b].add(k1)
+        del adj[p]
+
+        pairs.discard(frozenset((a, p)))
+        pairs.discard(frozenset((p, b)))
+        pairs.add(frozenset((a, b)))
+        removed.add(p)
+
+    return removed
+
+
+def reduce_network(points, lines, prune=True, contract=True):
+    """
+    Reduces the network topology before the creation of the oemof nodes.
+
+    Dead-end branches, which reach no house or generation site, are removed.
+    Serial chains of DL lines, which are connected by infrastructure points
+    with exactly two neighbours, are merged into one line with the summed
+    length. Since the heat loss of a heatpipe is proportional to its length,
+    the heat loss of the merged line equals the sum of the heat losses of the
+    segments.
+
+    :param points: point layer ('id', 'type')
+    :param lines: line layer ('type', 'id_start', 'id_end', 'length')
+    :param prune: remove dead-end branches
+    :param contract: merge serial chains
+    :return:    points - reduced point layer
+                lines - reduced line layer (new RangeIndex)
+                mapping - pd.DataFrame with the columns 'line' (index of
+                original line), 'reduced' (index of reduced line) and
+                'forward' (orientation of original line equals orientation
+                of reduced line)
+    """
+    point_type = dict(zip(points['id'], points['type']))
+
+    d_lines = {}
+    for k, (t, s, e, length) in enumerate(zip(
+            lines['type'], lines['id_start'], lines['id_end'],
+            lines['length'])):
+        d_lines[k] = {'type': t, 'id_start': s, 'id_end': e,
+                      'length': length, 'members': [(lines.index[k], True)]}
+
+    adj = _adjacency(d_lines)
+
+    removed = set()
+    if prune:
+        removed |= _prune_dead_ends(d_lines, adj, point_type)
+    if contract:
+        removed |= _contract_serial(d_lines, adj, point_type)
+
+    keys = sorted(d_lines)
+    reduced = pd.DataFrame([{c: d_lines[k][c] for c in
+                             ['type', 'id_start', 'id_end', 'length']}
+                            for k in keys],
+                           columns=['type', 'id_start', 'id_end', 'length'])
+
+    mapping = pd.DataFrame(
+        [(m, r, f) for r, k in enumerate(keys)
+         for m, f in d_lines[k]['members']],
+        columns=['line', 'reduced', 'forward'])
+
+    logging.info('Network reduction: %s of %s points and %s of %s lines '
+                 'removed.', len(removed), len(points),
+                 len(lines) - len(reduced), len(lines))
+
+    return points[~points['id'].isin(removed)], reduced, mapping
+
+
+def expand_line_results(reduced_results, mapping, lines,
+                        forward_columns=('size_1',),
+                        reverse_columns=('size_2',)):
+    """
+    Maps results of the reduced line layer back onto the original lines.
+
+    Columns, which refer to a direction of the line (e.g. size_1 for the
+    heatpipe from id_start to id_end and size_2 for the reverse heatpipe),
+    are swapped for segments, which are orientated against the merged line.
+
+    :param reduced_results: pd.DataFrame with results of the reduced lines
+                            (index of reduced line layer)
+    :param mapping: mapping of reduce_network
+    :param lines: original line layer
+    :param forward_columns: result columns of the direction start -> end
+    :param reverse_columns: corresponding columns of the direction end ->
+                            start
+    :return: original line layer with result columns
+    """
+    res = reduced_results.loc[mapping['reduced'].values]
+    res.index = mapping['line'].values
+
+    backward = ~mapping['forward'].values
+    for fw, rv in zip(forward_columns, reverse_columns):
+        a = res[fw].values.copy()
+        b = res[rv].values.copy()
+        a[backward], b[backward] = b[backward], a[backward]
+        res[fw] = a
+        res[rv] = b
+
+    columns = [c for c in res.columns if c not in lines.columns]
+    return lines.join(res[columns])
+
+
+def line_orientation(points, lines):
+    """
+    Flow direction of the lines, which is forced by the network topology.
+
+    A bridge (line, whose removal splits the network) with all generation
+    sites on one side can only carry heat away from them. Lines in meshes
+    and bridges with generation sites on both sides can be used in both
+    directions.
+
+    :param points: point layer ('id', 'type')
+    :param lines: line layer ('id_start', 'id_end')
+    :return: pd.Series with the index of the line layer and the values 1
+             (only from id_start to id_end), -1 (only from id_end to
+             id_start) and 0 (both directions)
+    """
+    gen = set(points.loc[points['type'] == 'G', 'id'])
+
+    adj = defaultdict(list)
+    for k, (s, e) in enumerate(zip(lines['id_start'], lines['id_end'])):
+        adj[s].append((e, k))
+        adj[e].append((s, k))
+
+    starts = lines['id_start'].values
+    orientation = np.zeros(len(lines), dtype=int)
+
+    disc = {}
+    low = {}
+    n_gen = {}
+    counter = 0
+
+    for root in adj:
+        if root in disc:
+            continue
+
+        # iterative depth-first search (tarjan), entries: (point, line to
+        # parent, iterator over neighbours)
+        disc[root] = low[root] = counter
+        counter += 1
+        n_gen[root] = root in gen
+        tree_edges = []
+        stack = [(root, None, iter(adj[root]))]
+
+        while stack:
+            v, k_parent, neighbours = stack[-1]
+            for w, k in neighbours:
+                if k == k_parent:
+                    continue
+                if w in disc:
+                    low[v] = min(low[v], disc[w])
+                else:
+                    disc[w] = low[w] = counter
+                    counter += 1
+                    n_gen[w] = w in gen
+                    stack.append((w, k, iter(adj[w])))
+                    break
+            else:
+                stack.pop()
+                if stack:
+                    u = stack[-1][0]
+                    low[u] = min(low[u], low[v])
+                    n_gen[u] += n_gen[v]
+                    if low[v] > disc[u]:
+                        tree_edges.append((u, v, k_parent))
+
+        # bridges: direction towards the side without generation
+        total = n_gen[root]
+        for u, v, k in tree_edges:
+            if n_gen[v] == 0:
+                orientation[k] = 1 if starts[k] == u else -1
+            elif n_gen[v] == total:
+                orientation[k] = 1 if starts[k] == v else -1
+
+    logging.info('Flow direction of %s of %s lines is fixed.',
+                 (orientation != 0).sum(), len(lines))
+
+    return pd.Series(orientation, index=lines.index)
+
+
+def house_demand(data_houses, label_2='heat', n_timesteps=None):
+    """
+    Heat demand of the houses, which has to be supplied by the heatpipes.
+
+    The demand is only an upper bound of the supply of the houses, if the
+    demand sinks are fixed and the houses have no further sinks (excess) or
+    storages on the bus.
+
+    :param data_houses: input data of the houses (see
+                        input_data.load_input_data)
+    :param label_2: tag2 of the bus of the heatpipes
+    :param n_timesteps: number of timesteps of the model (None: all)
+    :return: pd.DataFrame with one column per house id or None, if the
+             houses can take more than their demand
+    """
+    general = data_houses['general_data']
+
+    buses = general['bus']
+    buses = buses[buses['active'].astype(bool) &
+                  (buses['label_2'] == label_2)]
+    storages = general['storages']
+    storages = storages[storages['active'].astype(bool) &
+                        (storages['bus'] == label_2)]
+
+    if buses['excess'].astype(bool).any() or len(storages) > 0:
+        logging.info('Houses have excess sinks or storages on bus %s, no '
+                     'demand bound.', label_2)
+        return None
+
+    demand = general['demand']
+    demand = demand[demand['active'].astype(bool) &
+                    (demand['label_2'] == label_2)]
+
+    if not demand['fixed'].astype(bool).all():
+        logging.info('Demand of houses is not fixed, no demand bound.')
+        return None
+
+    ids = data_houses['individual_data']['id']
+    series = data_houses['series_data'][label_2][ids]
+    if n_timesteps is not None:
+        series = series.iloc[:n_timesteps]
+
+    return series * demand['scalingfactor'].sum()
+
+
+def pipe_capacity_bounds(points, lines, demand, loss_factor=0.0,
+                         cap_min=0.0):
+    """
+    Upper bounds of the capacity of the heatpipes, which follow from the heat
+    demand of the houses downstream.
+
+    Branches of the network, which are tree-shaped and contain no generation
+    site, are peeled off leaf by leaf. A heatpipe towards a branch never has
+    to carry more than the peak of the summed demand of the branch plus the
+    heat losses of the heatpipes within the branch (with the capacity they
+    can get within their bounds). The heatpipe in the opposite direction is
+    not needed at all.
+    Lines in meshes and between generation sites are not bounded.
+
+    The bounds hold for every optimal solution, if the investment costs of
+    the heatpipes are positive and no heat can be taken by the houses apart
+    from the demand (see house_demand).
+
+    :param points: point layer ('id', 'type')
+    :param lines: line layer ('type', 'id_start', 'id_end', 'length')
+    :param demand: pd.DataFrame of the heat demand with one column per point
+                   id (see house_demand)
+    :param loss_factor: maximal heat loss factor of the heatpipe options
+                        (heat loss per length unit as fraction of capacity)
+    :param cap_min: maximal minimum capacity of the nonconvex heatpipe
+                    options: a heatpipe with a smaller bound can still be
+                    built with this capacity (per merged line, see
+                    add_components.heatpipe_cap_max)
+    :return: pd.DataFrame with the index of the line layer and the columns
+             'size_1' (bound of the heatpipe from id_start to id_end) and
+             'size_2' (bound of the reverse heatpipe), np.inf where no bound
+             is known
+    """
+    point_type = dict(zip(points['id'], points['type']))
+
+    adj = defaultdict(set)
+    for k, (s, e) in enumerate(zip(lines['id_start'], lines['id_end'])):
+        adj[s].add(k)
+        adj[e].add(k)
+
+    starts = lines['id_start'].values
+    ends = lines['id_end'].values
+    lengths = lines['length'].values.astype(float)
+    if 'n_lines' in lines.columns:
+        n_lines = lines['n_lines'].fillna(1).values.astype(float)
+    else:
+        n_lines = np.ones(len(lines))
+
+    demand = {c: demand[c].values.astype(float) for c in demand.columns}
+    loss = defaultdict(float)
+
+    bounds = np.full((len(lines), 2), np.inf)
+
+    stack = [p for p, ls in adj.items()
+             if len(ls) == 1 and point_type.get(p) != 'G']
+
+    while stack:
+        v = stack.pop()
+        if len(adj[v]) != 1:
+            continue
+
+        k = adj[v].pop()
+        forward = ends[k] == v
+        u = starts[k] if forward else ends[k]
+        adj[u].discard(k)
+
+        d = demand.pop(v, None)
+        loss_v = loss.pop(v, 0.0)
+        bound = loss_v + (0.0 if d is None else max(d.max(), 0))
+
+        # heatpipe towards the branch and heatpipe out of the branch
+        bounds[k, 0 if forward else 1] = bound
+        bounds[k, 1 if forward else 0] = 0
+
+        if d is not None:
+            demand[u] = d + demand[u] if u in demand else d
+        # largest capacity of a heatpipe within the bound (nonconvex options
+        # have a minimum capacity)
+        capacity = max(bound, cap_min * n_lines[k]) if bound > 0 else 0.0
+        loss[u] += loss_v + loss_factor * lengths[k] * capacity
+
+        if len(adj[u]) == 1 and point_type.get(u) != 'G':
+            stack.append(u)
+
+    logging.info('Capacity bounds for %s of %s lines.',
+                 np.isfinite(bounds).all(axis=1).sum(), len(lines))
+
+    return pd.DataFrame(bounds, index=lines.index,
+                        columns=['size_1', 'size_2'])
+
+
+# columns of the technology data of the houses, which are absolute limits
+# and are multiplied by the number of houses of an aggregated house (the
+# other columns are specific, e.g. costs per capacity, efficiencies, or
+# relative to the capacity, e.g. in_1_sum_max)
+EXTENSIVE_COLUMNS = {'transformer': ['installed', 'max_invest',
+                                     'min_invest'],
+                     'storages': ['capacity']}
+
+
+def scale_house_data(general_data, n_houses):
+    """
+    Technology data of an aggregated house of n_houses houses.
+
+    :param general_data: general_data of the houses (see
+                         input_data.load_input_data)
+    :param n_houses: number of aggregated houses
+    :return: copy of general_data with the columns of EXTENSIVE_COLUMNS
+             multiplied by n_houses
+    """
+    scaled = dict(general_data)
+    for key, columns in EXTENSIVE_COLUMNS.items():
+        if key not in scaled:
+            continue
+        df = scaled[key].copy()
+        for c in columns:
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c], errors='coerce') * n_houses
+        scaled[key] = df
+    return scaled
+
+
+def aggregate_houses(points, lines, data_houses, label_2='heat',
+                     min_houses=2):
+    """
+    Merges the houses, which are connected to the same infrastructure point,
+    into one aggregated house with the summed demand.
+
+    All houses share the technology data (general_data), so the aggregated
+    house gets the same components as a single house. Their absolute limits
+    are multiplied by the number of houses (column 'n_houses' of the
+    individual data, see scale_house_data). The service lines (HL) of the
+    merged houses are replaced by one service line. Its length is the mean
+    of the lengths weighted by the peak demand (heat loss of the service
+    lines), the fix costs are calculated with the summed length (column
+    'length_fix') and the minimal and maximal capacity of the heatpipe
+    options are multiplied by the number of merged lines (column
+    'n_lines'). The connection of the merged houses is decided jointly.
+
+    :param points: point layer ('id', 'type')
+    :param lines: line layer ('type', 'id_start', 'id_end', 'length')
+    :param data_houses: input data of the houses (see
+                        input_data.load_input_data)
+    :param label_2: series of the demand, which is summed
+    :param min_houses: minimal number of houses of an aggregated house
+    :return:    points - point layer with aggregated houses
+                lines - line layer with aggregated service lines (new
+                RangeIndex)
+                data_houses - input data of the aggregated houses
+                mapping - pd.DataFrame with the columns 'line' (index of
+                original line), 'reduced' (index of new line), 'house' (id
+                of merged house), 'aggregate' (id of aggregated house) and
+                'share' (share of the peak demand of the aggregated house)
+    """
+    series = data_houses['series_data'][label_2]
+
+    hl = lines[lines['type'] == 'HL']
+    h_first = hl['id_start'].str[:1] == 'H'
+    house = hl['id_start'].where(h_first, hl['id_end'])
+    knot = hl['id_end'].where(h_first, hl['id_start'])
+
+    # houses with more than one service line are not merged
+    single = ~house.duplicated(keep=False)
+    house, knot = house[single], knot[single]
+
+    peak = series.max()
+
+    # ids of the aggregated houses must not collide with existing points
+    used = set(points['id'])
+
+    rows = []
+    new_lines = []
+    for k, members in house.groupby(knot, sort=False):
+        if len(members) < min_houses:
+            continue
+
+        agg = '{}_{}'.format(members.iloc[0], len(members))
+        j = 1
+        while agg in used:
+            agg = '{}_{}_{}'.format(members.iloc[0], len(members), j)
+            j += 1
+        used.add(agg)
+
+        p = peak.reindex(members.values).fillna(0).clip(lower=0).values
+        share = p / p.sum() if p.sum() > 0 else \
+            np.full(len(p), 1 / len(p))
+
+        length = lines.loc[members.index, 'length'].values
+        line = lines.loc[members.index[0]].copy()
+        line['id_start'], line['id_end'] = k, agg
+        line['length'] = (share * length).sum()
+        line['length_fix'] = length.sum()
+        line['n_lines'] = len(members)
+        new_lines.append(line)
+
+        rows += [(l, h, agg, s) for l, h, s in
+                 zip(members.index, members.values, share)]
+
+    mapping = pd.DataFrame(rows, columns=['line', 'house', 'aggregate',
+                                          'share'])
+    merged = mapping['house'].values
+
+    # point layer: aggregated houses at the position of the first house
+    first = points.set_index('id').loc[
+        mapping.drop_duplicates('aggregate')['house']].reset_index()
+    first['id'] = mapping['aggregate'].unique()
+    points_agg = pd.concat([points[~points['id'].isin(merged)], first],
+                           ignore_index=True, sort=False)
+
+    # line layer: one service line per aggregated house
+    kept = lines[~lines.index.isin(mapping['line'])]
+    lines_agg = pd.concat([kept, pd.DataFrame(new_lines)], sort=False)
+    if 'length_fix' in lines_agg.columns:
+        lines_agg['length_fix'] = lines_agg['length_fix'].fillna(
+            lines_agg['length'])
+    if 'n_lines' in lines_agg.columns:
+        lines_agg['n_lines'] = lines_agg['n_lines'].fillna(1).astype(int)
+
+    line_map = pd.DataFrame({'line': kept.index,
+                             'reduced': np.arange(len(kept))})
+    mapping['reduced'] = len(kept) + mapping.groupby(
+        'aggregate', sort=False).ngroup()
+    mapping = pd.concat([line_map, mapping], ignore_index=True, sort=False)
+    mapping['share'] = mapping['share'].fillna(1.0)
+    lines_agg = lines_agg.reset_index(drop=True)
+
+    # demand series: summed demand of the aggregated houses
+    agg_series = series.drop(columns=merged)
+    for agg, m in mapping.dropna(subset=['aggregate']).groupby(
+            'aggregate', sort=False):
+        agg_series[agg] = series[m['house']].sum(axis=1)
+
+    data_agg = dict(data_houses)
+    data_agg['individual_data'] = points_agg.loc[
+        points_agg['type'] == 'H'].reset_index(drop=True)
+    n_houses = mapping.dropna(subset=['aggregate'])['aggregate'] \
+        .value_counts()
+    data_agg['individual_data']['n_houses'] = data_agg['individual_data'][
+        'id'].map(n_houses).fillna(1).astype(int).values
+    data_agg['series_data'] = dict(data_houses['series_data'])
+    data_agg['series_data'][label_2] = agg_series
+
+    logging.info('House aggregation: %s houses merged into %s.',
+                 len(merged), mapping['aggregate'].nunique())
+
+    return points_agg, lines_agg, data_agg, mapping
+
+
+def split_line_results(reduced_results, mapping, lines,
+                       columns=('size_1', 'size_2')):
+    """
+    Maps results of the aggregated line layer back onto the original lines.
+    The capacities of the aggregated service lines are split by the share of
+    the peak demand of the houses.
+
+    :param reduced_results: pd.DataFrame with results of the aggregated lines
+    :param mapping: mapping of aggregate_houses
+    :param lines: original line layer
+    :param columns: result columns, which are split
+    :return: original line layer with result columns
+    """
+    res = reduced_results.loc[mapping['reduced'].values]
+    res.index = mapping['line'].values
+
+    for c in columns:
+        res[c] = res[c].values * mapping['share'].values
+
+    columns = [c for c in res.columns if c not in lines.columns]
+    return lines.join(res[columns])
+
+
+def split_house_results(results, mapping, series):
+    """
+    Splits the results of the aggregated houses (see
+    results.extract_results) back onto the merged houses. Investments are
+    split by the share of the peak demand, flows by the share of the demand
+    in each timestep.
+
+    :param results: dict of results.extract_results
+    :param mapping: mapping of aggregate_houses
+    :param series: demand series of the merged houses (columns: house ids,
+                   timesteps of the model)
+    :return: dict with 'invest' and 'flows' of the original houses
+    """
+    members = mapping.dropna(subset=['aggregate'])
+    groups = list(members.groupby('aggregate', sort=False))
+
+    invest = results['invest']
+    tag4 = invest.index.get_level_values('tag4')
+    parts = [invest[~tag4.isin(members['aggregate'])]]
+    for agg, m in groups:
+        rows = invest[tag4 == agg]
+        for h, s in zip(m['house'], m['share']):
+            r = rows.copy()
+            r['invest'] *= s
+            r.index = pd.MultiIndex.from_tuples(
+                [k[:3] + (h,) for k in r.index], names=invest.index.names)
+            parts.append(r)
+    invest = pd.concat(parts)
+
+    flows = results['flows']
+    tag4 = flows.columns.get_level_values('tag4')
+    split = {}
+    for agg, m in groups:
+        d = series[m['house']].values[:len(flows)]
+        total = d.sum(axis=1, keepdims=True)
+        share = np.where(total > 0, d / np.where(total > 0, total, 1),
+                         m['share'].values[None, :])
+        for c in flows.columns[tag4 == agg]:
+            values = flows[c].values
+            for j, h in enumerate(m['house']):
+                split[c[:3] + (h,) + c[4:]] = values * share[:, j]
+
+    if split:
+        split = pd.DataFrame(split, index=flows.index)
+        split.columns.names = flows.columns.names
+        flows = pd.concat([flows.loc[:, ~tag4.isin(members['aggregate'])],
+                           split], axis=1)
+
+    return {'invest': invest, 'flows': flows}
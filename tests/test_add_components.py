@@ -0,0 +1,49 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the heatpipe options of add_components.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('oemof.solph')
+
+from oemof.tools import economics  # noqa: E402
+
+from modules import add_components as ac  # noqa: E402
+
+GD = {'rate': 0.05, 'f_invest': 0.5}
+
+
+@pytest.fixture
+def options():
+    return pd.DataFrame({'label_3': ['DN20', 'DN50', 'DN80'],
+                         'active': [1, 0, 1],
+                         'nonconvex': [1, 1, 0],
+                         'capex_pipes': [100., 200., 300.],
+                         'fix_costs': [50., 60., 70.],
+                         'n_pipes': [40, 40, 30],
+                         'cap_min': [1., 2., 0.],
+                         'cap_max': [10., 20., 30.],
+                         'l_factor': [1e-4, 1e-4, 1e-4]})
+
+
+def test_heatpipe_costs(options):
+    costs = ac.heatpipe_costs(options, GD)
+
+    assert costs['label_3'].tolist() == ['DN20', 'DN80']
+    for row in costs.itertuples():
+        f = economics.annuity(capex=1, n=row.n_pipes, wacc=GD['rate']) * \
+            GD['f_invest']
+        assert row.epc == pytest.approx(row.capex_pipes * f)
+        assert row.epc_fix == pytest.approx(row.fix_costs * f)
+    # the options are not changed
+    assert 'epc' not in options.columns
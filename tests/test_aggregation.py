@@ -0,0 +1,67 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the aggregation of the demand time series into typical periods.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import aggregation as agg
+
+PERIOD = 4
+
+
+@pytest.fixture
+def series():
+    # six periods: three low, two medium and one peak period
+    levels = [1., 1.1, 5., 1.05, 5.2, 20.]
+    values = np.repeat(levels, PERIOD) + np.tile(np.arange(PERIOD), 6)
+    return pd.DataFrame({'H1': values, 'H2': 2 * values},
+                        index=pd.date_range('2019-01-01', periods=24,
+                                            freq='60min'))
+
+
+@pytest.fixture
+def aggregation(series):
+    return agg.aggregate_periods(series, 3, period_length=PERIOD)
+
+
+def test_aggregate_periods(series, aggregation):
+    assert len(aggregation['series']) == 3 * PERIOD
+    # the peak period is kept as extreme period
+    assert aggregation['representatives'][0] == 5
+    assert aggregation['period_weights'][0] == 1
+    assert sorted(aggregation['period_weights'][1:]) == [2, 3]
+    assert aggregation['weights'].sum() == len(series)
+    assert agg.f_summed_max(aggregation) == pytest.approx(0.5)
+
+
+def test_disaggregate_results(series, aggregation):
+    heat = aggregation['series'][['H1']].rename(columns={'H1': 'flow'})
+    # sequences of oemof results might have an additional last timestep
+    heat = pd.concat([heat, heat.iloc[[-1]]], ignore_index=True)
+    scalars = pd.Series({'invest': 2.})
+    results = {('a', 'b'): {'scalars': scalars, 'sequences': heat}}
+
+    disaggregated = agg.disaggregate_results(results, aggregation,
+                                             index=series.index)
+
+    seq = disaggregated[('a', 'b')]['sequences']
+    assert seq.index.equals(series.index)
+    for period, typical in enumerate(aggregation['order']):
+        rows = slice(period * PERIOD, (period + 1) * PERIOD)
+        expected = aggregation['series']['H1'].iloc[
+            typical * PERIOD:(typical + 1) * PERIOD]
+        assert np.allclose(seq['flow'].iloc[rows], expected)
+    assert disaggregated[('a', 'b')]['scalars'] is scalars
+    # the input is not changed
+    assert len(results[('a', 'b')]['sequences']) == 3 * PERIOD + 1
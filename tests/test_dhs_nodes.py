@@ -0,0 +1,62 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the table of the oriented heatpipes of the line layer.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('oemof.solph')
+
+from modules.dhs_nodes import _oriented_pipes  # noqa: E402
+
+
+@pytest.fixture
+def lines():
+    return pd.DataFrame(
+        [('GL', 'K1', 'G0', 10.), ('DL', 'K1', 'K2', 20.),
+         ('HL', 'H1', 'K2', 5.), ('HL', 'K2', 'H2', 6.)],
+        columns=['type', 'id_start', 'id_end', 'length'])
+
+
+def test_orientation(lines):
+    pipes = _oriented_pipes(lines)
+
+    assert pipes['label'].tolist() == ['G0-K1', 'K1-K2', 'K2-K1', 'K2-H1',
+                                       'K2-H2']
+    assert pipes['line'].tolist() == [0, 1, 1, 2, 3]
+    assert pipes['reverse'].tolist() == [True, False, True, True, False]
+    assert pipes['direction'].tolist() == [0, 0, 1, 0, 0]
+    assert pipes['l_1_in'].tolist() == ['generation'] + \
+        ['infrastructure'] * 4
+    assert pipes['l_1_out'].tolist() == ['infrastructure'] * 3 + \
+        ['house'] * 2
+    assert pipes['length'].tolist() == [10., 20., 20., 5., 6.]
+    assert not pipes['bidirectional'].any()
+
+
+def test_bidirectional(lines):
+    pipes = _oriented_pipes(lines, bidirectional=True)
+
+    assert pipes['label'].tolist() == ['G0-K1', 'K1-K2', 'K2-H1', 'K2-H2']
+    assert pipes['bidirectional'].tolist() == [False, True, False, False]
+
+
+def test_forced_direction(lines):
+    # heat can only flow from K2 to K1 on the DL line
+    orientation = pd.Series([0, -1, 0, 0], index=lines.index)
+    pipes = _oriented_pipes(lines, bidirectional=True,
+                            orientation=orientation)
+
+    dl = pipes[pipes['line'] == 1]
+    assert dl['label'].tolist() == ['K2-K1']
+    assert dl['reverse'].tolist() == [True]
+    assert not dl['bidirectional'].any()
@@ -0,0 +1,100 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the dispatch with fixed capacities in overlapping windows.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+solph = pytest.importorskip('oemof.solph')
+
+from oemof.solph.components import GenericStorage  # noqa: E402
+
+from modules import dispatch, oemof_heatpipe as oh  # noqa: E402
+from modules.solve import solver_available  # noqa: E402
+
+if not solver_available('cbc'):
+    pytest.skip('Solver cbc not available.', allow_module_level=True)
+
+N_TIMESTEPS = 12
+DEMAND = 5.
+# energy of the cheap source over the horizon
+LIMIT = 40.
+
+
+def _label(tag3):
+    return oh.Label('generation', 'heat', tag3, 'G0')
+
+
+def _create_nodes(input_data, gd):
+    """
+    Storage and two sources of one bus: the cheap source has a price, which
+    alternates between the timesteps, and a limit of its summed flow.
+    """
+    demand = input_data['data_houses']['series_data']['heat']['H1']
+    costs = input_data['data_generation']['series_data']['costs']['cheap']
+
+    bus = solph.Bus(label=_label('bus'))
+    nodes = [
+        bus,
+        solph.Source(label=_label('cheap'), outputs={bus: solph.Flow(
+            nominal_value=10, summed_max=LIMIT / 10,
+            variable_costs=costs.tolist())}),
+        solph.Source(label=_label('expensive'), outputs={bus: solph.Flow(
+            variable_costs=20)}),
+        solph.Sink(label=_label('demand'), inputs={bus: solph.Flow(
+            actual_value=demand.tolist(), fixed=True, nominal_value=1)}),
+        GenericStorage(label=_label('storage'), nominal_storage_capacity=20,
+                       inputs={bus: solph.Flow(nominal_value=10)},
+                       outputs={bus: solph.Flow(nominal_value=10)})]
+    return nodes, {}
+
+
+@pytest.fixture
+def input_data():
+    return {'data_houses': {'series_data': {'heat': pd.DataFrame(
+                {'H1': np.full(N_TIMESTEPS, DEMAND)})}},
+            'data_generation': {'series_data': {'costs': pd.DataFrame(
+                {'cheap': np.tile([1., 10.], N_TIMESTEPS // 2)})}}}
+
+
+def _flow(flows, tag3, direction):
+    column = flows.xs(tag3, level='tag3', axis=1).xs(
+        direction, level='direction', axis=1)
+    return column.iloc[:, 0].values
+
+
+@pytest.mark.parametrize('split', ['remaining', 'pro_rata'])
+def test_rolling_dispatch(monkeypatch, input_data, split):
+    monkeypatch.setattr(dispatch, 'create_nodes', _create_nodes)
+
+    res = dispatch.rolling_dispatch(
+        input_data, {'time_res': 1}, {'flows': {}, 'components': {}},
+        window=4, overlap=1, split_summed_max=split, solver='cbc')
+
+    flows = res['flows']
+    assert len(flows) == N_TIMESTEPS
+    assert res['windows']['start'].tolist() == [0, 3, 6, 9]
+    assert (res['windows']['termination'] == 'optimal').all()
+
+    # the limit of the summed flow holds for the horizon
+    cheap = _flow(flows, 'cheap', 'out')
+    assert cheap.sum() <= LIMIT + 1e-6
+    if split == 'remaining':
+        assert cheap.sum() == pytest.approx(LIMIT)
+
+    # the storage level continues at the borders of the windows
+    level = res['components'][(str(_label('storage')), 'capacity')].values
+    charge = _flow(flows, 'storage', 'in') - _flow(flows, 'storage', 'out')
+    assert level[0] == pytest.approx(charge[0])
+    assert np.allclose(np.diff(level), charge[1:])
+    assert level.max() > 0
@@ -0,0 +1,104 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the cache of the parsed input files.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import os
+
+import pandas as pd
+import pytest
+
+from modules import input_data
+
+
+def _source(tmp_path, content):
+    path = tmp_path / 'source.csv'
+    path.write_text(content)
+    return str(path)
+
+
+class _Parser:
+    """Parses the csv source and counts the calls."""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {'table': pd.read_csv(self.path)}
+
+
+def test_write_read_table(tmp_path):
+    df = pd.DataFrame({'id': ['H1', 'H2'], 'length': [1.5, 2.],
+                       'n': [1, 2]})
+    name = input_data._write_table(df, str(tmp_path / 'table'))
+
+    res = input_data._read_table(str(tmp_path / name))
+    pd.testing.assert_frame_equal(res, df)
+
+
+def test_cache_hit(tmp_path):
+    path = _source(tmp_path, 'a,b\n1,2\n')
+    cache = str(tmp_path / 'cache')
+    parse = _Parser(path)
+
+    first = input_data._cached(path, parse, cache)
+    second = input_data._cached(path, parse, cache)
+
+    assert parse.calls == 1
+    pd.testing.assert_frame_equal(first['table'], second['table'])
+    # the meta data is written atomically (no temporary files are left)
+    assert not [f for f in os.listdir(cache) if f.endswith('.tmp')]
+
+
+def test_cache_touched_and_changed(tmp_path):
+    path = _source(tmp_path, 'a,b\n1,2\n')
+    cache = str(tmp_path / 'cache')
+    parse = _Parser(path)
+    input_data._cached(path, parse, cache)
+
+    # same content with a new modification time: content hash is checked
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 10))
+    input_data._cached(path, parse, cache)
+    assert parse.calls == 1
+
+    _source(tmp_path, 'a,b\n1,3\n')
+    res = input_data._cached(path, parse, cache)
+    assert parse.calls == 2
+    assert res['table']['b'].tolist() == [3]
+
+
+def test_no_cache(tmp_path):
+    path = _source(tmp_path, 'a,b\n1,2\n')
+    parse = _Parser(path)
+    input_data._cached(path, parse, None)
+    input_data._cached(path, parse, None)
+
+    assert parse.calls == 2
+
+
+def test_read_excel_new_sheets(tmp_path):
+    pytest.importorskip('openpyxl')
+    path = str(tmp_path / 'data.xlsx')
+    cache = str(tmp_path / 'cache')
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'a': [1]}).to_excel(writer, sheet_name='A', index=False)
+        pd.DataFrame({'b': [2]}).to_excel(writer, sheet_name='B', index=False)
+
+    assert list(input_data.read_excel(path, ['A'], cache)) == ['A']
+    # sheet B has not been cached before
+    res = input_data.read_excel(path, ['A', 'B'], cache)
+    assert res['B']['b'].tolist() == [2]
+
+    input_data.clear_cache(cache)
+    assert os.listdir(cache) == []
@@ -0,0 +1,59 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the stage report of the optimization pipeline.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import json
+import time
+import tracemalloc
+
+import pytest
+
+pytest.importorskip('pyomo')
+
+from modules.instrumentation import Report  # noqa: E402
+
+
+@pytest.mark.parametrize('trace_memory', [False, True])
+def test_nested_stages(tmpdir, request, trace_memory):
+    request.addfinalizer(tracemalloc.stop)
+    report = Report(trace_memory=trace_memory, run='test')
+
+    with report.stage('build'):
+        with report.stage('nodes', n=3):
+            data = [0] * 100000
+            time.sleep(0.01)
+        time.sleep(0.01)
+    with report.stage('solve'):
+        time.sleep(0.01)
+    del data
+
+    stages = {s['stage']: s for s in report.stages}
+    assert stages['nodes']['parent'] == 'build'
+    assert stages['nodes']['depth'] == 1
+    assert stages['nodes']['n'] == 3
+    assert stages['build']['parent'] is None
+    assert stages['build']['wall_time'] >= stages['nodes']['wall_time']
+    if trace_memory:
+        # the peak of the nested stage is part of the enclosing stage
+        assert stages['build']['peak_traced_mb'] >= \
+            stages['nodes']['peak_traced_mb'] > 0
+
+    result = report.to_dict()
+    assert result['total_time'] == pytest.approx(
+        stages['build']['wall_time'] + stages['solve']['wall_time'])
+    assert result['meta']['run'] == 'test'
+
+    path = str(tmpdir.join('report.json'))
+    report.write(path)
+    with open(path) as f:
+        assert json.load(f)['total_time'] == pytest.approx(
+            result['total_time'])
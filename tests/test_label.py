@@ -0,0 +1,42 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the interned node labels.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import pickle
+
+import pytest
+
+pytest.importorskip('oemof.solph')
+
+from modules.oemof_heatpipe import LABELS, Label  # noqa: E402
+
+
+def test_label():
+    label = Label('house', 'heat', 'bus', 'H1')
+
+    assert Label('house', 'heat', 'bus', 'H1') is label
+    assert label == ('house', 'heat', 'bus', 'H1')
+    assert hash(label) == hash(('house', 'heat', 'bus', 'H1'))
+    assert {('house', 'heat', 'bus', 'H1'): 1}[label] == 1
+    assert str(label) == 'house_heat_bus_H1'
+    assert label[0] == 'house'
+    assert label[-1] == 'H1'
+    assert label[1:3] == ('heat', 'bus')
+    with pytest.raises(IndexError):
+        label[4]
+    with pytest.raises(AttributeError):
+        label.tag1 = 'generation'
+
+    assert LABELS[label.id] is label
+    assert LABELS.ids([('house', 'heat', 'bus', 'H1')]).tolist() == \
+        [label.id]
+    assert pickle.loads(pickle.dumps(label)) is label
@@ -0,0 +1,323 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the matrix back end: the objective of MatrixModel equals the
+objective of solph.Model for a small network with all supported
+components, the storage levels follow the balance of the storage, the MPS
+file contains the same problem and unsupported flow attributes raise an
+error.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import pytest
+
+solph = pytest.importorskip('oemof.solph')
+pytest.importorskip('scipy.optimize')
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from scipy.optimize import Bounds, LinearConstraint, milp  # noqa: E402
+
+from modules import oemof_heatpipe as oh  # noqa: E402
+from modules.matrix_model import MatrixModel  # noqa: E402
+from modules.results import LABEL_FIELDS  # noqa: E402
+
+DEMAND = [0.5, 1., 0.8, 0.3]
+
+
+def _label(tag1, tag3, tag4):
+    return oh.Label(tag1, 'heat', tag3, tag4)
+
+
+def _network(**source_kwargs):
+    """
+    Generation site with gas source, boiler (investment) and storage, two
+    houses connected by a heatpipe (investment) and a bidirectional heatpipe
+    (investment) and an expensive backup source with summed_max.
+    """
+    n = len(DEMAND)
+    b_gas = solph.Bus(label=_label('generation', 'bus', 'gas'))
+    b_gen = solph.Bus(label=_label('generation', 'bus', 'G0'))
+    b_h1 = solph.Bus(label=_label('consumers', 'bus', 'H1'))
+    b_h2 = solph.Bus(label=_label('consumers', 'bus', 'H2'))
+
+    nodes = [
+        b_gas, b_gen, b_h1, b_h2,
+        solph.Source(label=_label('generation', 'source', 'gas'),
+                     outputs={b_gas: solph.Flow(
+                         variable_costs=[0.05, 0.06, 0.07, 0.05],
+                         **source_kwargs)}),
+        solph.Transformer(
+            label=_label('generation', 'boiler', 'G0'),
+            inputs={b_gas: solph.Flow()},
+            outputs={b_gen: solph.Flow(
+                variable_costs=0.01,
+                investment=solph.Investment(ep_costs=10, maximum=20))},
+            conversion_factors={b_gen: 0.9}),
+        solph.components.GenericStorage(
+            label=_label('generation', 'storage', 'G0'),
+            inputs={b_gen: solph.Flow(nominal_value=3)},
+            outputs={b_gen: solph.Flow(nominal_value=3)},
+            nominal_storage_capacity=6, initial_storage_level=0.5,
+            loss_rate=0.01, inflow_conversion_factor=0.95,
+            outflow_conversion_factor=0.95),
+        oh.HeatPipeline(
+            label=_label('infrastructure', 'heatpipe', 'G0-H1'),
+            inputs={b_gen: solph.Flow()},
+            outputs={b_h1: solph.Flow(
+                investment=solph.Investment(ep_costs=2))},
+            length=100, heat_loss_factor=1e-3),
+        oh.BidirectionalHeatPipeline(
+            label=_label('infrastructure', 'heatpipe', 'H1-H2'),
+            inputs={b_h1: solph.Flow(), b_h2: solph.Flow()},
+            outputs={b_h1: solph.Flow(), b_h2: solph.Flow()},
+            investment=solph.Investment(ep_costs=3),
+            length=50, heat_loss_factor=1e-3),
+        solph.Source(label=_label('consumers', 'backup', 'H2'),
+                     outputs={b_h2: solph.Flow(
+                         nominal_value=10, summed_max=0.5,
+                         variable_costs=1.)}),
+    ]
+    for bus, nominal in [(b_h1, 10), (b_h2, 5)]:
+        nodes.append(solph.Sink(
+            label=_label('consumers', 'demand', bus.label.tag4),
+            inputs={bus: solph.Flow(actual_value=DEMAND, fixed=True,
+                                    nominal_value=nominal)}))
+
+    return nodes, n
+
+
+def _storage_network(**storage_kwargs):
+    """
+    Source with cheap and expensive timesteps, storage and fixed demand at
+    one bus.
+    """
+    b = solph.Bus(label=_label('generation', 'bus', 'G0'))
+    storage = solph.components.GenericStorage(
+        label=_label('generation', 'storage', 'G0'),
+        inputs={b: solph.Flow(nominal_value=2)},
+        outputs={b: solph.Flow(nominal_value=2)},
+        loss_rate=0.01, inflow_conversion_factor=0.95,
+        outflow_conversion_factor=0.9, **storage_kwargs)
+    nodes = [
+        b, storage,
+        solph.Source(label=_label('generation', 'source', 'G0'),
+                     outputs={b: solph.Flow(
+                         nominal_value=3, variable_costs=[1, 1, 5, 5])}),
+        solph.Sink(label=_label('generation', 'demand', 'G0'),
+                   inputs={b: solph.Flow(actual_value=[1, 1, 2, 2],
+                                         fixed=True, nominal_value=1)})]
+    return nodes, storage, b
+
+
+def _read_mps(path):
+    """
+    Reads a free MPS file of MatrixModel.write_mps.
+
+    :return: c, A, row_lo, row_up, lb, ub, integrality as dense arrays
+    """
+    rows, types, entries, rhs, ranges, bounds = [], {}, [], {}, {}, []
+    cols, integer = {}, set()
+    section, marker = None, False
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if not line.startswith(' '):
+                section = parts[0]
+            elif section == 'ROWS' and parts[0] != 'N':
+                types[parts[1]] = parts[0]
+                rows.append(parts[1])
+            elif section == 'COLUMNS' and parts[0] == 'MARKER':
+                marker = parts[2] == "'INTORG'"
+            elif section == 'COLUMNS':
+                cols.setdefault(parts[0], len(cols))
+                if marker:
+                    integer.add(parts[0])
+                entries.append((parts[1], parts[0], float(parts[2])))
+            elif section == 'RHS':
+                rhs[parts[1]] = float(parts[2])
+            elif section == 'RANGES':
+                ranges[parts[1]] = float(parts[2])
+            elif section == 'BOUNDS':
+                bounds.append(parts)
+
+    # columns are named by their index in the model
+    n = 1 + max(int(k[1:]) for k in cols)
+    r = {k: i for i, k in enumerate(rows)}
+    c, A = np.zeros(n), np.zeros((len(rows), n))
+    for row, col, v in entries:
+        if row == 'obj':
+            c[int(col[1:])] = v
+        else:
+            A[r[row], int(col[1:])] = v
+
+    b = np.array([rhs.get(k, 0.) for k in rows])
+    t = np.array([types[k] for k in rows])
+    row_lo = np.where(t == 'L', -np.inf, b)
+    row_up = np.where(t == 'G', np.inf, b)
+    for k, v in ranges.items():
+        row_up[r[k]] = b[r[k]] + v
+
+    lb, ub = np.zeros(n), np.full(n, np.inf)
+    integrality = np.zeros(n, dtype=int)
+    for k in integer:
+        integrality[int(k[1:])] = 1
+    for kind, _, col, *value in bounds:
+        j = int(col[1:])
+        if kind == 'BV':
+            lb[j], ub[j] = 0, 1
+        elif kind == 'FX':
+            lb[j] = ub[j] = float(value[0])
+        elif kind == 'LO':
+            lb[j] = float(value[0])
+        elif kind == 'MI':
+            lb[j] = -np.inf
+        elif kind == 'UP':
+            ub[j] = float(value[0])
+
+    return c, A, row_lo, row_up, lb, ub, integrality
+
+
+def _solph_objective(nodes, n, tmp_path):
+    """Optimum of solph.Model (LP file solved with HiGHS)."""
+    highspy = pytest.importorskip('highspy')
+    es = solph.EnergySystem(
+        timeindex=pd.date_range('2019-01-01', periods=n, freq='H'))
+    es.add(*nodes)
+    om = solph.Model(es)
+    path = str(tmp_path / 'solph.lp')
+    om.write(path, io_options={'symbolic_solver_labels': True})
+
+    h = highspy.Highs()
+    h.setOptionValue('output_flag', False)
+    h.readModel(path)
+    h.run()
+    assert h.getModelStatus() == highspy.HighsModelStatus.kOptimal
+    return h.getInfo().objective_function_value
+
+
+def test_objective_equals_solph(tmp_path):
+    nodes, n = _network()
+    mm = MatrixModel(nodes, n)
+    info = mm.solve()
+
+    assert info['status'] == 0
+    assert info['objective'] == pytest.approx(
+        _solph_objective(nodes, n, tmp_path), rel=1e-6)
+
+
+def test_results_structure():
+    nodes, n = _network()
+    mm = MatrixModel(nodes, n)
+    mm.solve()
+    res = mm.results()
+
+    invest = res['invest']
+    assert list(invest.index.names) == LABEL_FIELDS
+    assert sorted(invest.index.get_level_values('tag4')) == \
+        ['G0', 'G0-H1', 'H1-H2']
+    assert (invest['invest'] >= 0).all()
+
+    demand = res['flows'].xs('demand', level='tag3', axis=1)
+    assert demand.shape == (n, 2)
+    assert demand.iloc[:, 0].tolist() == pytest.approx(
+        [10 * d for d in DEMAND])
+
+
+def test_mps_round_trip(tmp_path):
+    highspy = pytest.importorskip('highspy')
+    nodes, n = _network()
+    mm = MatrixModel(nodes, n)
+    info = mm.solve()
+
+    path = str(tmp_path / 'matrix.mps')
+    mm.write_mps(path)
+    h = highspy.Highs()
+    h.setOptionValue('output_flag', False)
+    h.readModel(path)
+    h.run()
+
+    assert h.getModelStatus() == highspy.HighsModelStatus.kOptimal
+    assert h.getInfo().objective_function_value == pytest.approx(
+        info['objective'], rel=1e-6)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'nominal_storage_capacity': 4, 'initial_storage_level': 0.5},
+    {'nominal_storage_capacity': 4, 'initial_storage_level': 0.5,
+     'balanced': False},
+    {'nominal_storage_capacity': 4},
+    {'investment': solph.Investment(ep_costs=0.1),
+     'initial_storage_level': 0.5},
+])
+def test_storage_levels(kwargs):
+    nodes, storage, b = _storage_network(**kwargs)
+    mm = MatrixModel(nodes, 4)
+    assert mm.solve()['status'] == 0
+
+    x = mm.x
+    level = x[mm.levels[storage] + np.arange(4)]
+    inflow, outflow = x[mm._col(b, storage)], x[mm._col(storage, b)]
+    if 'investment' in kwargs:
+        capacity = x[mm.invest[storage, None]]
+    else:
+        capacity = kwargs['nominal_storage_capacity']
+    initial = kwargs.get('initial_storage_level')
+
+    # first timestep from the initial level, without one from the last level
+    previous = np.append(level[-1] if initial is None
+                         else initial * capacity, level[:-1])
+    assert np.allclose(level, 0.99 * previous + 0.95 * inflow -
+                       outflow / 0.9)
+    # the cheap heat of the first timesteps is stored
+    assert outflow[2:].sum() > 0
+    if initial is not None and kwargs.get('balanced', True):
+        assert level[-1] == pytest.approx(initial * capacity)
+    elif initial is not None:
+        assert level[-1] < initial * capacity
+
+
+def test_write_mps(tmp_path):
+    nodes, n = _network()
+    # nonconvex investment with a binary column (attributes of the
+    # investment of the oemof branch with nonconvex investments)
+    boiler = next(n for n in nodes if n.label.tag3 == 'boiler')
+    investment = next(iter(boiler.outputs.values())).investment
+    investment.nonconvex = True
+    investment.offset = 5
+    mm = MatrixModel(nodes, n)
+    path = str(tmp_path / 'matrix.mps')
+    mm.write_mps(path)
+
+    c, A, row_lo, row_up, lb, ub, integrality = _read_mps(path)
+    assert np.array_equal(c, mm.c)
+    assert np.array_equal(A, mm.A.toarray())
+    assert np.array_equal(row_lo, mm.row_lo)
+    assert np.array_equal(row_up, mm.row_up)
+    assert np.array_equal(lb, mm.lb)
+    assert np.array_equal(ub, mm.ub)
+    assert np.array_equal(integrality, mm.integrality)
+    assert integrality.sum() == 1
+
+    res = milp(c, integrality=integrality, bounds=Bounds(lb, ub),
+               constraints=LinearConstraint(A, row_lo, row_up))
+    assert res.status == 0
+    assert res.fun == pytest.approx(mm.solve()['objective'], rel=1e-6)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'nominal_value': 10, 'summed_min': 0.1},
+    {'nominal_value': 10, 'positive_gradient': {'ub': 0.1, 'costs': 0}},
+    {'investment': solph.Investment(ep_costs=1, existing=2)},
+    {'investment': solph.Investment(ep_costs=1), 'min': 0.2},
+])
+def test_unsupported_attributes(kwargs):
+    nodes, n = _network(**kwargs)
+    with pytest.raises(NotImplementedError):
+        MatrixModel(nodes, n)
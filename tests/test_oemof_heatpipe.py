@@ -0,0 +1,146 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the heatpipe components: the solved flows of the heatpipes follow
+the heat loss equations of their blocks.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+solph = pytest.importorskip('oemof.solph')
+
+from oemof.outputlib import processing  # noqa: E402
+from pyomo.environ import SolverFactory  # noqa: E402
+
+from modules import oemof_heatpipe as oh  # noqa: E402
+from modules.solve import run_solver  # noqa: E402
+
+if not SolverFactory('cbc').available(exception_flag=False):
+    pytest.skip('Solver cbc not available.', allow_module_level=True)
+
+DEMAND = [5., 10., 8.]
+LENGTH = 100.
+LOSS = 1e-3
+
+
+def _bus(tag4):
+    return solph.Bus(label=oh.Label('infrastructure', 'heat', 'bus', tag4))
+
+
+def _source(bus, costs=1.):
+    return solph.Source(
+        label=oh.Label('generation', 'heat', 'source', bus.label.tag4),
+        outputs={bus: solph.Flow(variable_costs=costs)})
+
+
+def _demand(bus, values):
+    return solph.Sink(
+        label=oh.Label('consumers', 'heat', 'demand', bus.label.tag4),
+        inputs={bus: solph.Flow(actual_value=values, fixed=True,
+                                nominal_value=1)})
+
+
+def _pipe(a, b, flow, **kwargs):
+    return oh.HeatPipeline(
+        label=oh.Label('infrastructure', 'heat', 'pipe',
+                       '{}-{}'.format(a.label.tag4, b.label.tag4)),
+        inputs={a: solph.Flow()}, outputs={b: flow},
+        length=LENGTH, **kwargs)
+
+
+def _solve(*nodes):
+    es = solph.EnergySystem(timeindex=pd.date_range(
+        '2019-01-01', periods=len(DEMAND), freq='H'))
+    es.add(*nodes)
+    om = solph.Model(es)
+    assert run_solver(om, solver='cbc')['termination'] == 'optimal'
+    return om
+
+
+def _flows(om, a, b):
+    return np.array([om.flow[a, b, t].value for t in om.TIMESTEPS])
+
+
+@pytest.mark.parametrize('factor', [LOSS, [LOSS, 2 * LOSS, 0.]])
+def test_heatpipe_block(factor):
+    a, b = _bus('a'), _bus('b')
+    pipe = _pipe(a, b, solph.Flow(nominal_value=20),
+                 heat_loss_factor=factor)
+    om = _solve(a, b, _source(a), _demand(b, DEMAND), pipe)
+
+    loss = np.broadcast_to(factor, len(DEMAND)) * LENGTH * 20
+    assert np.allclose(_flows(om, pipe, b), DEMAND)
+    assert np.allclose(_flows(om, a, pipe), np.add(DEMAND, loss))
+    assert len(om.HeatPipelineBlock.relation) == len(DEMAND)
+
+
+def test_heatpipe_invest_block():
+    a, b = _bus('a'), _bus('b')
+    pipe = _pipe(a, b, solph.Flow(investment=solph.Investment(ep_costs=1)),
+                 heat_loss_factor=LOSS)
+    om = _solve(a, b, _source(a), _demand(b, DEMAND), pipe)
+
+    invest = om.InvestmentFlow.invest[pipe, b].value
+    assert invest == pytest.approx(max(DEMAND))
+    assert np.allclose(_flows(om, a, pipe),
+                       np.add(DEMAND, LOSS * LENGTH * invest))
+
+
+@pytest.mark.parametrize('invest', [False, True])
+def test_compact_heatpipe(invest):
+    def flow():
+        if invest:
+            return solph.Flow(investment=solph.Investment(ep_costs=1))
+        return solph.Flow(nominal_value=20)
+
+    a, b = _bus('a'), _bus('b')
+    pipe = _pipe(a, b, flow(), heat_loss_factor=LOSS)
+    om = _solve(a, b, _source(a), _demand(b, DEMAND), pipe)
+
+    c, d = _bus('c'), _bus('d')
+    compact = _pipe(c, d, flow(), heat_loss_factor=LOSS, compact=True)
+    om_c = _solve(c, d, _source(c), _demand(d, DEMAND), compact)
+
+    block = 'HeatPipelineInvestBlock' if invest else 'HeatPipelineBlock'
+    assert len(getattr(om_c, block).heat_loss) == 0
+    assert np.allclose(_flows(om_c, c, compact), _flows(om, a, pipe))
+
+    results = oh.add_heat_loss_results(om_c, processing.results(om_c))
+    loss = results[(compact, None)]['sequences']['heat_loss']
+    expected = processing.results(om)[(pipe, None)]['sequences']['heat_loss']
+    assert np.allclose(loss.values, expected.values)
+
+
+def test_bidirectional_heatpipe():
+    a, b = _bus('a'), _bus('b')
+    pipe = oh.BidirectionalHeatPipeline(
+        label=oh.Label('infrastructure', 'heat', 'pipe', 'a-b'),
+        inputs={a: solph.Flow(), b: solph.Flow()},
+        outputs={a: solph.Flow(), b: solph.Flow()},
+        length=LENGTH, heat_loss_factor=LOSS,
+        investment=solph.Investment(ep_costs=0.1))
+    # the cheap source changes, so does the flow direction of the pipe
+    demand_a, demand_b = [0., 6., 0.], [5., 0., 8.]
+    om = _solve(a, b, pipe, _source(a, costs=[1., 10., 1.]),
+                _source(b, costs=[10., 1., 10.]),
+                _demand(a, demand_a), _demand(b, demand_b))
+
+    invest = om.BidirectionalHeatPipelineBlock.invest[pipe].value
+    assert invest == pytest.approx(8.)
+    assert np.allclose(_flows(om, pipe, a), demand_a)
+    assert np.allclose(_flows(om, pipe, b), demand_b)
+    assert np.allclose(_flows(om, a, pipe) + _flows(om, b, pipe),
+                       np.add(demand_a, demand_b) + LOSS * LENGTH * invest)
+
+    results = oh.add_heat_loss_results(om, processing.results(om))
+    assert np.allclose(results[(pipe, None)]['sequences']['heat_loss'],
+                       LOSS * LENGTH * invest)
@@ -0,0 +1,123 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the investment model with mutable parameters.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+solph = pytest.importorskip('oemof.solph')
+
+from modules import add_components as ac, oemof_heatpipe as oh  # noqa: E402
+from modules.persistent import ParametricModel  # noqa: E402
+from modules.profiles import DemandProfiles  # noqa: E402
+from modules.solve import solver_available  # noqa: E402
+
+if not solver_available('cbc'):
+    pytest.skip('Solver cbc not available.', allow_module_level=True)
+
+LENGTH = 100.
+LOSS = 1e-3
+
+
+def _series(h1, h2):
+    return pd.DataFrame({'H1': h1, 'H2': h2})
+
+
+def _esys(series):
+    """
+    Heat source at K1 and a heatpipe with investment to each house: the
+    demand of H1 is fixed, the demand of H2 is an upper bound.
+    """
+    k1 = solph.Bus(label=oh.Label('infrastructure', 'heat', 'bus', 'K1'))
+    nodes = [k1, solph.Source(
+        label=oh.Label('generation', 'heat', 'source', 'K1'),
+        outputs={k1: solph.Flow(variable_costs=1)})]
+    busd = {}
+    demand = pd.DataFrame({'active': [1], 'label_2': ['heat'],
+                           'scalingfactor': [2.], 'fixed': [1]})
+    profiles = DemandProfiles({'heat': series})
+
+    for house, fixed in [('H1', 1), ('H2', 0)]:
+        labels = {'l_1': 'house', 'l_4': house}
+        nodes, busd = ac.add_buses(pd.DataFrame(
+            {'active': [1], 'label_2': ['heat'], 'excess': [0],
+             'shortage': [0]}), labels, nodes, busd)
+        nodes, busd = ac.add_demand(demand.assign(fixed=fixed), labels, {},
+                                    profiles, nodes, busd)
+        nodes.append(oh.HeatPipeline(
+            label=oh.Label('infrastructure', 'heat', 'pipe', 'K1-' + house),
+            inputs={k1: solph.Flow()},
+            outputs={busd[('house', 'heat', 'bus', house)]: solph.Flow(
+                investment=solph.Investment(ep_costs=1))},
+            length=LENGTH, heat_loss_factor=LOSS))
+
+    es = solph.EnergySystem(timeindex=pd.date_range(
+        '2019-01-01', periods=len(series), freq='60min'))
+    es.add(*nodes)
+    return es
+
+
+def _node(pm, *tags):
+    return next(n for n in pm.om.es.nodes if n.label == tags)
+
+
+def _invest(pm):
+    return {str(i.label): pm.om.InvestmentFlow.invest[i, o].value
+            for i, o in pm.om.InvestmentFlow.invest}
+
+
+def test_set_demand(caplog):
+    pm = ParametricModel(_esys(_series([1., 3., 2.], [1., 1., 1.])),
+                         solver='cbc')
+    assert pm.solve()['termination'] == 'optimal'
+    assert _invest(pm)['infrastructure_heat_pipe_K1-H1'] == \
+        pytest.approx(6.)
+
+    # new demand with another peak: the scale of the profile changes
+    pm.set_demand(_series([4., 1., 5.], [9., 9., 9.]))
+    assert 'Demand of 1 sinks without fixed flow not changed' in caplog.text
+    assert pm.solve()['termination'] == 'optimal'
+
+    sink = _node(pm, 'house', 'heat', 'demand', 'H1')
+    flow = [pm.om.flow[i, sink, t].value for i in sink.inputs
+            for t in pm.om.TIMESTEPS]
+    assert np.allclose(flow, [8., 2., 10.])
+    assert _invest(pm)['infrastructure_heat_pipe_K1-H1'] == \
+        pytest.approx(10.)
+
+    # same model as a rebuilt one with the new demand
+    rebuilt = ParametricModel(_esys(_series([4., 1., 5.], [1., 1., 1.])),
+                              solver='cbc')
+    rebuilt.solve()
+    assert pm.om.objective() == pytest.approx(rebuilt.om.objective())
+
+
+def test_set_costs_and_heat_loss():
+    series = _series([1., 3., 2.], [0., 0., 0.])
+    pm = ParametricModel(_esys(series), solver='cbc')
+    pm.solve()
+    objective = pm.om.objective()
+
+    pm.set_pipe_costs(ep_costs={'infrastructure_heat_pipe_K1-H1': 3})
+    pm.solve()
+    assert pm.pipe_costs()['ep_costs'][
+        'infrastructure_heat_pipe_K1-H1'] == 3
+    assert pm.om.objective() == pytest.approx(objective + 2 * 6.)
+
+    pm.set_heat_loss_factor(2 * LOSS)
+    pm.solve()
+    pipe = _node(pm, 'infrastructure', 'heat', 'pipe', 'K1-H1')
+    k1 = next(iter(pipe.inputs))
+    inflow = [pm.om.flow[k1, pipe, t].value for t in pm.om.TIMESTEPS]
+    assert np.allclose(inflow, 2 * np.array([1., 3., 2.]) +
+                       2 * LOSS * LENGTH * 6.)
@@ -0,0 +1,73 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the shared storage of the demand profiles.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.profiles import DemandProfiles
+
+
+@pytest.fixture
+def series():
+    slp = np.array([1., 2., 4., 3.])
+    return {'heat': pd.DataFrame({'H1': slp, 'H2': 2.5 * slp,
+                                  'H3': [0., 1., 0., 1.],
+                                  'H4': np.zeros(4)}),
+            'electricity': pd.DataFrame({'H1': slp / 3})}
+
+
+def test_deduplication(series):
+    profiles = DemandProfiles(series)
+
+    # H1, H2 and electricity of H1 share one profile
+    assert len(profiles) == 3
+    assert profiles.index['heat', 'H1'][0] == \
+        profiles.index['heat', 'H2'][0] == \
+        profiles.index['electricity', 'H1'][0]
+    assert profiles.get('heat', 'H2')[1] == pytest.approx(10.)
+    assert ('heat', 'H3') in profiles
+    assert ('heat', 'H5') not in profiles
+
+
+def test_series_round_trip(series):
+    profiles = DemandProfiles(series)
+
+    for label_2, df in series.items():
+        for house in df.columns:
+            assert np.allclose(profiles.series(label_2, house), df[house])
+
+    # columns without demand are scaled with 1
+    profile, scale = profiles.get('heat', 'H4')
+    assert scale == 1.
+    assert not profile.any()
+
+
+def test_views_are_read_only(series):
+    profiles = DemandProfiles(series)
+    profile, _ = profiles.get('heat', 'H1')
+
+    assert np.shares_memory(profile, profiles.data)
+    with pytest.raises(ValueError):
+        profile[0] = 0.
+
+
+def test_different_lengths():
+    with pytest.raises(ValueError):
+        DemandProfiles({'heat': pd.DataFrame({'H1': [1., 2.]}),
+                        'electricity': pd.DataFrame({'H1': [1., 2., 3.]})})
+
+
+def test_empty():
+    profiles = DemandProfiles({})
+    assert len(profiles) == 0
@@ -0,0 +1,103 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the on-disk store of processed results.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.result_store import ResultStore, input_hash
+
+
+def _tables():
+    columns = pd.MultiIndex.from_tuples(
+        [('consumers', 'heat', 'demand', 'H1', 'in', 'bus'),
+         ('generation', 'heat', 'boiler', 'G0', 'out', 'bus')],
+        names=['tag1', 'tag2', 'tag3', 'tag4', 'direction', 'bus'])
+    flows = pd.DataFrame(np.arange(8.).reshape(4, 2), columns=columns)
+    invest = pd.DataFrame(
+        {'invest': [1.5, 2.], 'type': ['HeatPipeline', 'Transformer']},
+        index=pd.MultiIndex.from_tuples(
+            [('infrastructure', 'heat', 'heatpipe', 'G0-H1'),
+             ('generation', 'heat', 'boiler', 'G0')],
+            names=['tag1', 'tag2', 'tag3', 'tag4']))
+    return {'flows': flows, 'invest': invest}
+
+
+def test_put_get(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=None)
+    tables = _tables()
+
+    assert store.get('a') is None
+    store.put('a', tables, meta={'objective': 1.})
+
+    assert 'a' in store
+    res = store.get('a')
+    assert res['meta'] == {'objective': 1.}
+    for name, df in tables.items():
+        pd.testing.assert_frame_equal(res[name], df, check_dtype=False)
+
+
+def test_evict_least_recently_used(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=None)
+    for key in ['a', 'b', 'c']:
+        store.put(key, _tables())
+        time.sleep(0.01)
+    store.get('a')
+
+    size = store.entries()['size'].max()
+    store.max_bytes = 2 * size
+    store.evict()
+
+    assert 'a' in store and 'c' in store
+    assert 'b' not in store
+
+
+def test_invalidate(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=None)
+    store.put('a', _tables())
+    store.put('b', _tables())
+
+    store.invalidate('a')
+    assert 'a' not in store and 'b' in store
+
+    store.invalidate()
+    assert store.entries().empty
+    assert os.path.isdir(str(tmp_path))
+
+
+def test_clean_tmp(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=None)
+    old = tmp_path / '.tmp_old'
+    young = tmp_path / '.tmp_young'
+    old.mkdir()
+    young.mkdir()
+    t = time.time() - 2 * 3600
+    os.utime(str(old), (t, t))
+
+    store.clean_tmp(max_age=3600)
+
+    assert not old.exists()
+    assert young.exists()
+
+
+def test_input_hash():
+    gd = {'num_ts': 24, 'rate': 0.01}
+    data = {'lines': pd.DataFrame({'length': [1., 2.]})}
+
+    assert input_hash(data, gd) == input_hash(data, dict(gd))
+    assert input_hash(data, gd) != input_hash(data, dict(gd, num_ts=48))
+    assert input_hash(data, gd) != input_hash(
+        {'lines': pd.DataFrame({'length': [1., 3.]})}, gd)
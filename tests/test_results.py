@@ -0,0 +1,51 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the mapping of the heatpipe investments onto the line layer.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('oemof.solph')
+
+from modules.results import map_line_results, add_size_classes  # noqa: E402
+
+
+@pytest.fixture
+def lines():
+    return pd.DataFrame({'type': ['GL', 'DL', 'DL', 'HL'],
+                         'length': [10., 20., 30., 5.]},
+                        index=[10, 11, 12, 13])
+
+
+def test_map_line_results(lines, caplog):
+    invest = pd.DataFrame(
+        # two heatpipe options in the forward direction of line 10, both
+        # directions of line 11, a bidirectional heatpipe of line 12, a
+        # boiler (no line) and a heatpipe of an unknown line
+        [(5., 10, False), (2., 10, False), (4., 11, False), (3., 11, True),
+         (7., 12, False), (100., np.nan, None), (1., 99, False)],
+        columns=['invest', 'line', 'reverse'])
+
+    df = map_line_results(lines, invest)
+
+    assert df['size_1'].tolist() == [7., 4., 7., 0.]
+    assert df['size_2'].tolist() == [0., 3., 0., 0.]
+    assert df['length'].tolist() == lines['length'].tolist()
+    assert 'size_1' not in lines.columns
+    assert '1 heatpipes refer to unknown lines' in caplog.text
+
+    df = add_size_classes(df)
+    assert df['size'].tolist() == [7., 7., 7., 0.]
+    assert df['size_class'].iloc[:3].tolist() == ['DN 20'] * 3
+    # lines without pipes are outside of the bins of the look-up table
+    assert df['size_class'].isnull().iloc[3]
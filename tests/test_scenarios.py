@@ -0,0 +1,88 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the scenario definitions.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('oemof.solph')
+
+from modules import scenarios  # noqa: E402
+
+
+@pytest.fixture
+def input_data():
+    def data():
+        return {'general_data': {
+                    'transformer': pd.DataFrame({'capex': [100., 200.]})},
+                'individual_data': pd.DataFrame({'id': ['H1']}),
+                'series_data': {'heat': pd.DataFrame({'H1': [1., 2.],
+                                                      'name': ['a', 'b']})}}
+
+    return {'qgis_data': {},
+            'gd_infra': {'heatpipe_options': pd.DataFrame(
+                {'capex_pipes': [10., 20.]})},
+            'data_houses': data(),
+            'data_generation': data()}
+
+
+def test_scenario_grid():
+    grid = scenarios.scenario_grid({'gd.rate': [0.01, 0.05],
+                                    'houses.series.scale': [1, 2, 3]})
+
+    assert len(grid) == 6
+    assert grid[0] == {'gd.rate': 0.01, 'houses.series.scale': 1}
+    assert grid[-1] == {'gd.rate': 0.05, 'houses.series.scale': 3}
+
+
+def test_apply_scenario(input_data):
+    gd = {'rate': 0.01}
+    data, gd_s = scenarios.apply_scenario(input_data, gd, {
+        'gd.rate': 0.05,
+        'heatpipe_options.capex_pipes': 30.,
+        'generation.transformer.capex': 50.,
+        'houses.series.scale': 2})
+
+    assert gd_s['rate'] == 0.05
+    assert data['gd_infra']['heatpipe_options']['capex_pipes'].tolist() == \
+        [30., 30.]
+    assert data['data_generation']['general_data']['transformer'][
+        'capex'].tolist() == [50., 50.]
+    heat = data['data_houses']['series_data']['heat']
+    assert heat['H1'].tolist() == [2., 4.]
+    assert heat['name'].tolist() == ['a', 'b']
+
+    # the base scenario is not changed
+    assert gd['rate'] == 0.01
+    assert input_data['gd_infra']['heatpipe_options'][
+        'capex_pipes'].tolist() == [10., 20.]
+    assert input_data['data_generation']['general_data']['transformer'][
+        'capex'].tolist() == [100., 200.]
+    assert input_data['data_houses']['series_data']['heat'][
+        'H1'].tolist() == [1., 2.]
+
+
+@pytest.mark.parametrize('path', ['foo.bar', 'houses.series.offset'])
+def test_unknown_parameter(input_data, path):
+    with pytest.raises(ValueError):
+        scenarios.apply_scenario(input_data, {}, {path: 1})
+
+
+def test_failed_scenario(input_data):
+    # the incomplete input data can not be built: the error is reported in
+    # the row of the scenario
+    row = scenarios.run_scenario({'gd.rate': 0.05}, {'rate': 0.01},
+                                 input_data=input_data)
+
+    assert row['gd.rate'] == 0.05
+    assert row['status'].startswith('error: ')
+    assert row['time'] >= 0
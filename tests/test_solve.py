@@ -0,0 +1,154 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the solution strategies of the investment model.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import pandas as pd
+import pytest
+
+solph = pytest.importorskip('oemof.solph')
+
+from pyomo.environ import Constraint  # noqa: E402
+
+from modules import oemof_heatpipe as oh, solve  # noqa: E402
+
+if not solve.solver_available('cbc'):
+    pytest.skip('Solver cbc not available.', allow_module_level=True)
+
+DEMAND = [5., 10., 8.]
+
+
+def _model(demand=DEMAND, maximum=float('inf')):
+    """Two candidate heatpipes from a to b, pipe 1 is the cheaper one."""
+    a = solph.Bus(label=oh.Label('infrastructure', 'heat', 'bus', 'a'))
+    b = solph.Bus(label=oh.Label('infrastructure', 'heat', 'bus', 'b'))
+    nodes = [a, b,
+             solph.Source(label=oh.Label('generation', 'heat', 'source', 'a'),
+                          outputs={a: solph.Flow(variable_costs=1)}),
+             solph.Sink(label=oh.Label('consumers', 'heat', 'demand', 'b'),
+                        inputs={b: solph.Flow(actual_value=demand,
+                                              fixed=True, nominal_value=1)})]
+    for i, costs in [(1, 1.), (2, 5.)]:
+        nodes.append(oh.HeatPipeline(
+            label=oh.Label('infrastructure', 'heat', 'pipe', str(i)),
+            inputs={a: solph.Flow()},
+            outputs={b: solph.Flow(investment=solph.Investment(
+                ep_costs=costs, maximum=maximum))},
+            length=100, heat_loss_factor=1e-3))
+
+    es = solph.EnergySystem(timeindex=pd.date_range(
+        '2019-01-01', periods=len(demand), freq='60min'))
+    es.add(*nodes)
+    return solph.Model(es)
+
+
+def test_two_phase_solve():
+    om = _model()
+    info = solve.two_phase_solve(om, solver='cbc')
+
+    reference = _model()
+    solve.run_solver(reference, solver='cbc')
+
+    assert info['pruned'] == ['infrastructure_heat_pipe_2']
+    assert info['n_pipes'] == 2
+    assert info['objective'] == pytest.approx(
+        reference.objective(), rel=1e-6)
+    assert info['gap'] == pytest.approx(0, abs=1e-6)
+    pipes = {str(n.label): v for n, (v, y) in solve.invest_pipes(om).items()}
+    assert pipes['infrastructure_heat_pipe_2'].fixed
+
+
+def test_two_phase_solve_infeasible():
+    # the demand exceeds the maximum capacity of both pipes
+    om = _model(demand=[50., 10., 8.], maximum=10)
+    info = solve.two_phase_solve(om, solver='cbc')
+
+    assert info['lp_bound'] is None
+    assert info['objective'] is None
+    assert info['gap'] is None
+    assert info['pruned'] == []
+
+
+def _bidirectional_model():
+    """Nonconvex bidirectional heatpipe from a to b."""
+    a = solph.Bus(label=oh.Label('infrastructure', 'heat', 'bus', 'a'))
+    b = solph.Bus(label=oh.Label('infrastructure', 'heat', 'bus', 'b'))
+    investment = solph.Investment(ep_costs=1, maximum=20, minimum=2)
+    investment.nonconvex = True
+    investment.offset = 10
+    pipe = oh.BidirectionalHeatPipeline(
+        label=oh.Label('infrastructure', 'heat', 'pipe', 'a-b'),
+        inputs={a: solph.Flow(), b: solph.Flow()},
+        outputs={a: solph.Flow(), b: solph.Flow()},
+        length=100, heat_loss_factor=1e-3, investment=investment)
+
+    es = solph.EnergySystem(timeindex=pd.date_range(
+        '2019-01-01', periods=len(DEMAND), freq='60min'))
+    es.add(a, b, pipe,
+           solph.Source(label=oh.Label('generation', 'heat', 'source', 'a'),
+                        outputs={a: solph.Flow(variable_costs=1)}),
+           solph.Source(label=oh.Label('generation', 'heat', 'source', 'b'),
+                        outputs={b: solph.Flow(variable_costs=10)}),
+           solph.Sink(label=oh.Label('consumers', 'heat', 'demand', 'b'),
+                      inputs={b: solph.Flow(actual_value=DEMAND, fixed=True,
+                                            nominal_value=1)}))
+    return solph.Model(es)
+
+
+def test_warm_start_solve(monkeypatch, capfd):
+    om = _bidirectional_model()
+    solve.run_solver(om, solver='cbc')
+    solution = solve.invest_solution(om)
+    assert solution.loc[('infrastructure_heat_pipe_a-b', None)] == \
+        pytest.approx(max(DEMAND))
+
+    # HiGHS is preferred, but does not support warm starts
+    monkeypatch.setattr(solve, 'available_solvers',
+                        lambda: ['highs', 'cbc'])
+    om = _bidirectional_model()
+    capfd.readouterr()
+    info = solve.warm_start_solve(om, solution, solve_kwargs={'tee': True})
+
+    assert info['solver'] == 'cbc'
+    assert info['objective'] == pytest.approx(om.objective())
+    # cbc completes the initial solution
+    assert 'MIPStart provided solution' in capfd.readouterr().out
+
+
+def test_solver_options(caplog):
+    opts = solve.solver_options('cbc', threads=2, mip_gap=0.01,
+                                time_limit=60, options={'cuts': 'off'})
+    assert opts == {'threads': 2, 'ratioGap': 0.01, 'sec': 60,
+                    'cuts': 'off'}
+
+    assert solve.solver_options('glpk', threads=2, mip_gap=0.01) == \
+        {'mipgap': 0.01}
+    assert 'threads is not supported' in caplog.text
+
+
+def test_run_solver():
+    om = _model()
+    # unknown solvers fall back to the preference list
+    info = solve.run_solver(om, solver='unknown', preference=['cbc'],
+                            time_limit=60)
+
+    assert info['solver'] == 'cbc'
+    assert info['termination'] == 'optimal'
+    assert info['objective'] == pytest.approx(om.objective())
+    assert info['wall_time'] > 0
+    assert om.solver_results is info['results']
+
+    # no objective from the values of the previous solve
+    om.infeasible = Constraint(expr=next(iter(om.flow.values())) <= -1)
+    info = solve.run_solver(om, solver='cbc')
+
+    assert info['termination'] == 'infeasible'
+    assert info['objective'] is None
@@ -0,0 +1,78 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the generator of synthetic district heating networks.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import synthetic
+
+
+def _connected(points, lines):
+    """All points are connected by the lines."""
+    parent = {p: p for p in points['id']}
+    for a, b in zip(lines['id_start'], lines['id_end']):
+        parent[synthetic._find(parent, a)] = synthetic._find(parent, b)
+    return len({synthetic._find(parent, p) for p in parent}) == 1
+
+
+@pytest.mark.parametrize('meshing', [0.0, 0.5, 1.0])
+def test_generate_layers(meshing):
+    points, lines = synthetic.generate_layers(25, meshing=meshing)
+
+    # 13 knots on a 4x4 grid with 18 edges between neighbours
+    n_k = 13
+    assert (points['type'] == 'H').sum() == 25
+    assert (points['type'] == 'K').sum() == n_k
+    assert points['id'].is_unique
+    assert (lines['type'] == 'HL').sum() == 25
+    assert (lines['type'] == 'GL').sum() == 1
+    n_dl = (lines['type'] == 'DL').sum()
+    assert n_dl == n_k - 1 + round(meshing * (18 - (n_k - 1)))
+    assert _connected(points, lines)
+    # each house is connected by one line
+    hl = lines[lines['type'] == 'HL']
+    assert sorted(hl['id_end']) == sorted(
+        points.loc[points['type'] == 'H', 'id'])
+
+
+def test_generate_layers_seed():
+    points, lines = synthetic.generate_layers(30, meshing=0.3, seed=1)
+    points_2, lines_2 = synthetic.generate_layers(30, meshing=0.3, seed=1)
+    _, lines_3 = synthetic.generate_layers(30, meshing=0.3, seed=2)
+
+    pd.testing.assert_frame_equal(lines, lines_2)
+    assert not lines['length'].equals(lines_3['length'])
+
+
+def test_generate_heat_series():
+    df = synthetic.generate_heat_series(['H0', 'H1'], 48, time_res=0.5)
+
+    assert df.columns.tolist() == ['timestamp', 'H0', 'H1']
+    assert len(df) == 48
+    assert (df['timestamp'].diff().dropna() == pd.Timedelta('30min')).all()
+    assert (df[['H0', 'H1']].values >= 0).all()
+
+
+def test_write_dbf(tmpdir):
+    simpledbf = pytest.importorskip('simpledbf')
+
+    points, _ = synthetic.generate_layers(5)
+    path = str(tmpdir.join('points.dbf'))
+    synthetic.write_dbf(points, path)
+
+    df = simpledbf.Dbf5(path).to_dataframe()
+    assert df['id'].tolist() == points['id'].tolist()
+    assert df['type'].tolist() == points['type'].tolist()
+    assert np.allclose(df['ind'].values.astype(float), points['ind'].values,
+                       equal_nan=True)
@@ -0,0 +1,168 @@
+"""
+oemof application for research project quarree100.
+
+Tests of the preprocessing of the network topology: reduction of the line
+layer, flow direction and capacity bounds of the lines, and the aggregation
+of houses.
+
+Copyright (c) 2019 Johannes Röder <jroeder@uni-bremen.de>
+
+SPDX-License-Identifier: GPL-3.0-or-later
+"""
+
+__copyright__ = "Johannes Röder <jroeder@uni-bremen.de>"
+__license__ = "GPLv3"
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules import topology
+
+
+@pytest.fixture
+def network():
+    """
+    G0 - K1 - K2 - K3 with the houses H1 and H2 at K3 and a dead end K1 - K4.
+    The line K2 - K3 is orientated against the chain.
+    """
+    points = pd.DataFrame({
+        'id': ['G0', 'K1', 'K2', 'K3', 'K4', 'H1', 'H2'],
+        'type': ['G', 'K', 'K', 'K', 'K', 'H', 'H']})
+    lines = pd.DataFrame(
+        [('DL', 'G0', 'K1', 10.), ('DL', 'K1', 'K2', 20.),
+         ('DL', 'K3', 'K2', 30.), ('DL', 'K1', 'K4', 5.),
+         ('HL', 'H1', 'K3', 4.), ('HL', 'K3', 'H2', 8.)],
+        columns=['type', 'id_start', 'id_end', 'length'])
+    return points, lines
+
+
+def test_reduce_network(network):
+    points, lines = network
+    points_red, lines_red, mapping = topology.reduce_network(points, lines)
+
+    assert set(points_red['id']) == {'G0', 'K3', 'H1', 'H2'}
+    dl = lines_red[lines_red['type'] == 'DL']
+    assert len(dl) == 1
+    assert dl['length'].iloc[0] == pytest.approx(60.)
+    assert len(lines_red[lines_red['type'] == 'HL']) == 2
+
+    # the dead end is not mapped, the reversed segment is backward
+    assert 3 not in mapping['line'].values
+    forward = mapping.set_index('line')['forward']
+    assert forward[0] and forward[1] and not forward[2]
+
+
+def test_expand_line_results(network):
+    points, lines = network
+    _, lines_red, mapping = topology.reduce_network(points, lines)
+
+    results = pd.DataFrame({'size_1': np.arange(len(lines_red)) + 1.,
+                            'size_2': np.zeros(len(lines_red))})
+    expanded = topology.expand_line_results(results, mapping, lines)
+
+    dl = mapping.loc[mapping['line'] == 0, 'reduced'].iloc[0]
+    assert expanded.loc[0, 'size_1'] == dl + 1
+    # reversed segment: the capacity of the chain is the reverse capacity
+    assert expanded.loc[2, 'size_1'] == 0
+    assert expanded.loc[2, 'size_2'] == dl + 1
+    assert np.isnan(expanded.loc[3, 'size_1'])
+
+
+def test_reduce_network_without_changes(network):
+    points, lines = network
+    points_red, lines_red, mapping = topology.reduce_network(
+        points, lines, prune=False, contract=False)
+
+    assert len(points_red) == len(points)
+    assert lines_red['length'].tolist() == lines['length'].tolist()
+    assert mapping['forward'].all()
+
+
+
+@pytest.mark.parametrize('cap_min, n_lines', [(0., 1), (10., 1), (10., 2)])
+def test_pipe_capacity_bounds(cap_min, n_lines):
+    # G0 - K1 - H1 with a peak demand of H1 below the minimum capacity of
+    # the nonconvex heatpipe options
+    points = pd.DataFrame({'id': ['G0', 'K1', 'H1'],
+                           'type': ['G', 'K', 'H']})
+    lines = pd.DataFrame(
+        [('GL', 'G0', 'K1', 100., 1), ('HL', 'H1', 'K1', 10., n_lines)],
+        columns=['type', 'id_start', 'id_end', 'length', 'n_lines'])
+    demand = pd.DataFrame({'H1': [1., 2., 1.5]})
+
+    bounds = topology.pipe_capacity_bounds(points, lines, demand,
+                                           loss_factor=1e-3, cap_min=cap_min)
+
+    # the house connection is oriented against the flow
+    assert bounds.loc[1].tolist() == [0., 2.]
+    # the built house connection has at least the minimum capacity, so does
+    # its heat loss
+    capacity = max(2., cap_min * n_lines)
+    assert bounds.loc[0, 'size_1'] == pytest.approx(2. + 1e-3 * 10 *
+                                                    capacity)
+    assert bounds.loc[0, 'size_2'] == 0
+
+
+def test_line_orientation(network):
+    points, lines = network
+
+    orientation = topology.line_orientation(points, lines)
+    assert orientation.tolist() == [1, 1, -1, 1, -1, 1]
+
+    # mesh K1 - K2 - K4: both directions possible within the mesh
+    lines = pd.concat([lines, pd.DataFrame(
+        [('DL', 'K4', 'K2', 7.)], columns=lines.columns)], ignore_index=True)
+    orientation = topology.line_orientation(points, lines)
+    assert orientation.tolist() == [1, 0, -1, 0, -1, 1, 0]
+
+
+def test_aggregate_houses(network):
+    points, lines = network
+    # existing point with the id of the aggregated house
+    points = pd.concat([points, pd.DataFrame({'id': ['H1_2'],
+                                              'type': ['K']})],
+                       ignore_index=True)
+    series = pd.DataFrame({'H1': [1., 3., 2.], 'H2': [2., 1., 1.]})
+    data_houses = {'series_data': {'heat': series}}
+
+    points_agg, lines_agg, data_agg, mapping = topology.aggregate_houses(
+        points, lines, data_houses)
+
+    houses = data_agg['individual_data']
+    assert houses['id'].tolist() == ['H1_2_1']
+    assert houses['n_houses'].tolist() == [2]
+    assert 'H1' not in points_agg['id'].values
+    assert points_agg['id'].is_unique
+
+    hl = lines_agg[lines_agg['type'] == 'HL']
+    assert len(hl) == 1
+    assert hl['n_lines'].iloc[0] == 2
+    assert hl['length_fix'].iloc[0] == pytest.approx(12.)
+    # length weighted by the peak demand (3 and 2)
+    assert hl['length'].iloc[0] == pytest.approx(0.6 * 4 + 0.4 * 8)
+    assert (lines_agg.loc[lines_agg['type'] == 'DL', 'n_lines'] == 1).all()
+
+    agg = data_agg['series_data']['heat']['H1_2_1']
+    assert agg.tolist() == [3., 4., 3.]
+    members = mapping.dropna(subset=['aggregate'])
+    assert members['share'].sum() == pytest.approx(1.)
+
+
+def test_scale_house_data():
+    general_data = {
+        'transformer': pd.DataFrame({'installed': [1., 0.],
+                                     'max_invest': [10., 5.],
+                                     'efficiency': [0.9, 0.95]}),
+        'storages': pd.DataFrame({'capacity': [2.], 'loss': [0.01]}),
+        'bus': pd.DataFrame({'label': ['heat']})}
+
+    scaled = topology.scale_house_data(general_data, 3)
+
+    assert scaled['transformer']['installed'].tolist() == [3., 0.]
+    assert scaled['transformer']['max_invest'].tolist() == [30., 15.]
+    assert scaled['transformer']['efficiency'].tolist() == [0.9, 0.95]
+    assert scaled['storages']['capacity'].tolist() == [6.]
+    assert scaled['bus'] is general_data['bus']
+    # the original data is not changed
+    assert general_data['transformer']['installed'].tolist() == [1., 0.]